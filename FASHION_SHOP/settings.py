@@ -39,6 +39,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'my_app.middleware.RequestMetricsMiddleware',  # first, so every query of the request is counted
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,7 +53,7 @@ ROOT_URLCONF = 'FASHION_SHOP.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'my_app.metrics.DjangoTemplates',  # Django's backend + render timing for /metrics
         'DIRS': [
             # Add your project-level templates directory here if you have one
             # os.path.join(BASE_DIR, 'templates'), # Example for project-level templates
@@ -86,6 +87,67 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local-memory cache: works offline and per process. Switch to FileBasedCache
+# (or Redis/Memcached) to share cached pages between several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fashion-shop',
+    }
+}
+
+# Category/Brand snapshots (see my_app/reference_data.py) are invalidated
+# through the cache above; with the per-process LocMemCache other workers only
+# pick up a change once their snapshot is this many seconds old.
+REFERENCE_DATA_MAX_AGE = 60
+
+# Dashboard context cache (see my_app/dashboard_cache.py): seconds an entry is
+# fresh, and how long a stale entry may be served while it is being rebuilt.
+# Set DASHBOARD_CACHE_TTL = 0 to disable caching.
+DASHBOARD_CACHE_TTL = 60
+DASHBOARD_CACHE_STALE_TTL = 600
+
+# Customer detail stats (see my_app/customer_stats.py): customers with at least
+# this many orders get an incrementally maintained CustomerStats summary instead
+# of an aggregate over their order history on every page view. None disables it.
+CUSTOMER_STATS_MIN_ORDERS = 50
+
+# Request metrics (see my_app/metrics.py, served at /metrics)
+# Maximum SQL queries per request for each URL name; views not listed use
+# QUERY_BUDGET_DEFAULT (None = unchecked). Going over budget logs a warning, or
+# raises QueryBudgetExceeded when QUERY_BUDGET_RAISE is True (tests turn it on
+# with override_settings so N+1 regressions fail them).
+QUERY_BUDGETS = {
+    'dashboard': 12,
+    'product_index': 8,
+    'product_view': 12,
+    'order_index': 5,
+    'order_edit': 6,
+    'customer_index': 5,
+    'customer_detail': 12,
+    'inventory_index': 5,
+    'review_index': 5,
+    'promotion_index': 5,
+    'brand_index': 5,
+    'category_index': 5,
+    'member_index': 5,
+    'lookup_customers': 3,
+    'lookup_addresses': 3,
+    'lookup_products': 3,
+    'lookup_variants': 3,
+}
+QUERY_BUDGET_DEFAULT = None
+# Raise QueryBudgetExceeded instead of logging (tests enable it with override_settings)
+QUERY_BUDGET_RAISE = False
+# /metrics is staff-only unless a scraper sends `Authorization: Bearer <METRICS_TOKEN>` (None disables
+# tokens) or connects from one of METRICS_ALLOWED_IPS. Behind nginx every client is 127.0.0.1, so only
+# list addresses that reach Django directly.
+METRICS_TOKEN = None
+METRICS_ALLOWED_IPS = []
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -140,6 +202,44 @@ MEDIA_URL = '/media/' # Added MEDIA_URL
 # Ensure this directory exists and your web server has write permissions to it.
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media') # Added MEDIA_ROOT
 
+# Uploads are stored once per content, under MEDIA_ROOT/blobs/<sha256>, and
+# shared between rows (see my_app/storage.py). Blobs unreferenced for
+# MEDIA_BLOB_PURGE_GRACE seconds are removed by `manage.py purge_media_blobs`.
+STORAGES = {
+    'default': {
+        'BACKEND': 'my_app.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+MEDIA_BLOB_PURGE_GRACE = 60 * 60
+
+# Serving of MEDIA_URL (see my_app/media_serving.py): 'django' streams files
+# from the worker; 'x-accel-redirect' (nginx, with an `internal` location at
+# MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT) or 'x-sendfile'
+# (Apache/lighttpd) lets the front-end server send them. Browser cache lifetime
+# of content-addressed blobs (immutable) and of other media files.
+MEDIA_SERVE_MODE = 'django'
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_BLOB_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+MEDIA_CACHE_MAX_AGE = 24 * 60 * 60
+
+# Where `manage.py clean_orphaned_media --quarantine` moves unreferenced media
+# files (see my_app/media_gc.py); keep it outside MEDIA_ROOT.
+MEDIA_QUARANTINE_DIR = os.path.join(BASE_DIR, 'media_quarantine')
+
+# Product image thumbnails/WebP copies (see my_app/image_derivatives.py): worker
+# threads generating them after an upload; False generates them in the request.
+IMAGE_DERIVATIVES_BACKGROUND = True
+IMAGE_DERIVATIVE_WORKERS = 2
+
+# Resized profile pictures (see my_app/avatars.py): disk cache of the generated
+# squares (outside MEDIA_ROOT; safe to delete) and the browser cache lifetime
+# of versioned avatar URLs.
+AVATAR_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'avatars')
+AVATAR_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings  # Import settings
-from django.conf.urls.static import static  # Import static
+
+from my_app.templates.Views import media_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -9,6 +10,9 @@ urlpatterns = [
     path("", include("my_app.my_app_urls")),  # Assuming your app's urls.py is named 'urls.py' inside 'my_app'
 ]
 
-# Serve media files during development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Uploaded media, in every environment: streamed with range/conditional request
+# support, or handed to nginx/Apache per settings.MEDIA_SERVE_MODE (see
+# my_app/media_serving.py). A front-end server may also serve MEDIA_URL itself.
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", media_views.serve_media, name='media'),
+]
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MyAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'my_app'
+
+    def ready(self):
+        # Register model signal handlers (see my_app/signals.py)
+        from my_app import signals  # noqa: F401
@@ -0,0 +1,135 @@
+"""
+Square, resized profile pictures of members and customers (the avatar
+endpoint, my_app/templates/Views/avatars_views.py).
+
+The first request for a picture at a size crops and resizes the original to a
+square of the next size in AVATAR_SIZES and writes it to a disk cache
+(settings.AVATAR_CACHE_DIR, outside MEDIA_ROOT) as <digest>-<size>.<fmt>, where
+<digest> is the SHA-256 of the original's content. Later requests serve that
+file without touching Pillow. Keying by content rather than by owner means a
+replaced picture never serves a stale copy, and identical uploads share one.
+Content-addressed originals (my_app/storage.py) carry their digest in their
+name. Older files are hashed by streaming them in chunks, and the digest is
+memoized in the default cache per (file name, byte size, modification time),
+so serving a cached avatar costs a stat, not a read of the original.
+
+The `v` parameter of avatar URLs (avatar_version()) is a prefix of the same
+digest, so it changes exactly when the picture's bytes do, even for a file
+overwritten in place under the same name.
+
+Cached files are never invalidated, only orphaned: delete the directory (or
+old files in it) to reclaim space; they are regenerated on demand.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageOps
+
+from my_app.image_derivatives import encode, open_image
+from my_app.models import AVATAR_SIZES, Customer, Member
+from my_app.storage import blob_digest, is_blob_original
+
+# URL `kind` -> model with a `profile_picture` ImageField
+AVATAR_MODELS = {
+    'member': Member,
+    'customer': Customer,
+}
+
+CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'webp': 'image/webp',
+}
+
+DEFAULT_CACHE_DIR = os.path.join(settings.BASE_DIR, 'cache', 'avatars')
+DIGEST_CACHE_TIMEOUT = 24 * 60 * 60
+READ_CHUNK_SIZE = 64 * 1024
+VERSION_LENGTH = 12
+
+
+def cache_dir():
+    return getattr(settings, 'AVATAR_CACHE_DIR', DEFAULT_CACHE_DIR)
+
+
+def snap_size(size):
+    """The smallest AVATAR_SIZES entry at least `size`, or the largest one."""
+    return next((allowed for allowed in AVATAR_SIZES if allowed >= size), AVATAR_SIZES[-1])
+
+
+def preferred_format(request):
+    return 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpg'
+
+
+# --- Hashing ---
+
+def _file_stamp(storage, name):
+    try:
+        return storage.size(name), storage.get_modified_time(name).timestamp()
+    except NotImplementedError:  # storages without stat: the name alone
+        return None
+
+
+def file_digest(storage, name):
+    """SHA-256 hex digest of the stored file `name`, read in chunks (memoized, see module docstring)."""
+    if is_blob_original(name):
+        return blob_digest(name)
+    stamp = _file_stamp(storage, name)  # also raises FileNotFoundError for a missing file
+    key = 'avatar-digest:' + hashlib.sha1(f'{name}:{stamp}'.encode()).hexdigest()
+    digest = cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with storage.open(name, 'rb') as f:
+            for chunk in f.chunks(READ_CHUNK_SIZE):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        cache.set(key, digest, DIGEST_CACHE_TIMEOUT)
+    return digest
+
+
+def avatar_version(picture):
+    """Token for the `v` query parameter of avatar URLs: the start of the picture's content digest."""
+    try:
+        return file_digest(picture.storage, picture.name)[:VERSION_LENGTH]
+    except OSError:  # missing file: the endpoint answers 404 whatever the token
+        return ''
+
+
+# --- Rendering / caching ---
+
+def cached_path(digest, size, fmt):
+    return os.path.join(cache_dir(), digest[:2], f'{digest}-{size}.{fmt}')
+
+
+def render(storage, name, size, fmt):
+    """Encoded bytes of the stored image `name` cropped to its centre and resized to a `size` px square."""
+    image = open_image(storage, name, (size, size))
+    return encode(ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS), fmt)
+
+
+def _write_atomically(path, data):
+    """Concurrent first requests each render, and the last rename wins; readers never see a partial file."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def get_avatar(picture, size, fmt):
+    """
+    (path of the cached file, content digest) for the ImageField value `picture`
+    at `size` (one of AVATAR_SIZES) in `fmt`, rendering it on the first request.
+    Raises OSError if the original is missing or not an image.
+    """
+    digest = file_digest(picture.storage, picture.name)
+    path = cached_path(digest, size, fmt)
+    if not os.path.exists(path):
+        _write_atomically(path, render(picture.storage, picture.name, size, fmt))
+    return path, digest
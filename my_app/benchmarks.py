@@ -0,0 +1,348 @@
+"""
+HTTP benchmark of every page in my_app/my_app_urls.py (`python manage.py benchmark_http`).
+
+For each requested scale the shop is regenerated with fake_shop (same seed, so
+runs are comparable) in a separate benchmark database, then every GET route is
+driven through Django's test client by `threads` concurrent clients logged in
+as a staff user. Per route the report records:
+  - latency p50/p95/p99/mean/max (ms) and throughput over `requests` timed
+    requests, after `warmup` untimed ones (template and cache warm-up);
+  - SQL queries per request (min/mean/max);
+  - peak Python allocation of a single request, measured in a separate
+    tracemalloc pass so tracing doesn't distort the latencies.
+Routes that take an id are called with the heaviest object of their kind (the
+customer with most orders, the order with most lines, ...), so the numbers are
+the worst pages a real admin would open. Delete and logout routes are skipped.
+
+The report is JSON with sorted keys and no timestamps inside the per-route
+data, so two reports can be diffed between commits (compare() prints the
+changes). BUDGETS holds fixed p95/query limits for the pages that matter most;
+check_budgets() lists the violations and the command fails the run on any.
+"""
+import json
+import logging
+import math
+import platform
+import subprocess
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from my_app import fake_shop, my_app_urls
+from my_app.models import (
+    Brand, Category, Customer, Member, Order, OrderItem, Product, ProductVariant, Promotion, Review,
+)
+
+DEFAULT_SCALES = ('tiny', 'small')
+DEFAULT_REQUESTS = 40
+DEFAULT_THREADS = 4
+DEFAULT_WARMUP = 2
+DEFAULT_SEED = fake_shop.DEFAULT_SEED
+
+# Fixed budgets for the heaviest pages, checked at every scale. Latencies are
+# measured with DEFAULT_THREADS clients sharing one interpreter, so they include
+# GIL contention; the query budgets must not grow with scale.
+BUDGETS = {
+    'product_index': {'p95_ms': 400, 'max_queries': 8},
+    'order_create': {'p95_ms': 150, 'max_queries': 4},
+    'customer_detail': {'p95_ms': 250, 'max_queries': 12},
+    'dashboard': {'p95_ms': 300, 'max_queries': 12},
+}
+
+SKIPPED = ('logout', 'password_reset')  # password_reset is an alias of login
+BENCHMARK_USERNAME = 'benchmark-admin'
+QUIET_LOGGERS = ('django.request', 'my_app.metrics')
+
+# URL prefix of a route name -> model its `pk` argument refers to
+PK_MODELS = {
+    'product': Product, 'inventory': ProductVariant, 'brand': Brand, 'order': Order, 'customer': Customer,
+    'promotion': Promotion, 'review': Review, 'member': Member, 'category': Category,
+}
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _heaviest():
+    """Object ids used for detail/edit routes: the largest instance of each kind."""
+    samples = {model: model.objects.order_by('pk').values_list('pk', flat=True).first() for model in PK_MODELS.values()}
+    samples[Customer] = (Customer.objects.annotate(n=Count('orders')).order_by('-n', 'pk')
+                         .values_list('pk', flat=True).first())
+    samples[Order] = (Order.objects.annotate(n=Count('items')).order_by('-n', 'pk')
+                      .values_list('pk', flat=True).first())
+    samples[Product] = (Product.objects.annotate(n=Count('variants')).order_by('-n', 'pk')
+                        .values_list('pk', flat=True).first())
+    return samples
+
+
+def _kwargs(name, pattern, samples):
+    """URL arguments for route `name`, or None if there is no object to point it at."""
+    values = {
+        'pk': lambda: samples.get(PK_MODELS.get(name.split('_')[0])),
+        'category_id': lambda: samples[Category],
+        'order_pk': lambda: samples[Order],
+        'item_pk': lambda: OrderItem.objects.filter(order_id=samples[Order]).values_list('pk', flat=True).first(),
+        'name': lambda: 'orders',  # exports/<name>/
+    }
+    kwargs = {}
+    for argument in pattern.pattern.converters:
+        value = values[argument]() if argument in values else None
+        if value is None:
+            return None
+        kwargs[argument] = value
+    return kwargs
+
+
+def _query_string(name, samples):
+    week_ago = (timezone.localdate() - timedelta(days=7)).isoformat()
+    return {
+        'export': f'?from={week_ago}',
+        'lookup_customers': '?q=a',
+        'lookup_products': '?q=c',
+        'lookup_variants': '?q=c',
+        'lookup_addresses': f'?customer={samples[Customer]}',
+        'product_index': '?q=cotton',
+    }.get(name, '')
+
+
+def routes():
+    """(name, path) of every benchmarked GET route of my_app_urls, in URLconf order."""
+    samples = _heaviest()
+    result = []
+    for pattern in my_app_urls.urlpatterns:
+        name = pattern.name if isinstance(pattern, URLPattern) else None
+        if not name or name in SKIPPED or 'delete' in name:
+            continue
+        kwargs = _kwargs(name, pattern, samples)
+        if kwargs is None:  # nothing to point the route at
+            continue
+        result.append((name, reverse(name, kwargs=kwargs) + _query_string(name, samples)))
+    return result
+
+
+def _staff_user():
+    user, _created = get_user_model().objects.get_or_create(
+        username=BENCHMARK_USERNAME, defaults={'is_staff': True, 'is_superuser': True},
+    )
+    return user
+
+
+def _client(user):
+    client = Client(raise_request_exception=False)  # a failing page is reported by its 500 status
+    client.force_login(user)
+    return client
+
+
+def _get(client, path):
+    """One request; returns (status, seconds, queries)."""
+    queries = [0]
+
+    def count(execute, sql, params, many, context):
+        queries[0] += 1
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    with connection.execute_wrapper(count):
+        response = client.get(path)
+        if response.streaming:
+            for _chunk in response.streaming_content:
+                pass
+    return response.status_code, time.perf_counter() - started, queries[0]
+
+
+def _run_threads(path, user, requests, threads, warmup):
+    samples = []
+    statuses = {}
+    lock = threading.Lock()
+    per_thread = [requests // threads + (1 if index < requests % threads else 0) for index in range(threads)]
+
+    def worker(count):
+        try:
+            client = _client(user)
+            for _ in range(warmup):
+                _get(client, path)
+            for _ in range(count):
+                status, seconds, queries = _get(client, path)
+                with lock:
+                    samples.append((seconds, queries))
+                    statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            connections.close_all()
+
+    workers = [threading.Thread(target=worker, args=(count,)) for count in per_thread if count]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return samples, statuses, time.perf_counter() - started
+
+
+def _peak_allocation(path, user):
+    client = _client(user)
+    tracemalloc.start()
+    try:
+        _get(client, path)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_route(path, user, requests=DEFAULT_REQUESTS, threads=DEFAULT_THREADS, warmup=DEFAULT_WARMUP):
+    samples, statuses, elapsed = _run_threads(path, user, requests, max(threads, 1), warmup)
+    latencies = sorted(seconds * 1000 for seconds, _queries in samples)
+    queries = [count for _seconds, count in samples]
+    return {
+        'path': path,
+        'requests': len(samples),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'max_ms': round(latencies[-1], 2),
+        'requests_per_second': round(len(samples) / elapsed, 1),
+        'queries': {'min': min(queries), 'mean': round(sum(queries) / len(queries), 1), 'max': max(queries)},
+        'peak_alloc_kb': round(_peak_allocation(path, user) / 1024, 1),
+    }
+
+
+def _peak_rss_kb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=settings.BASE_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales=DEFAULT_SCALES, requests=DEFAULT_REQUESTS, threads=DEFAULT_THREADS, warmup=DEFAULT_WARMUP,
+        seed=DEFAULT_SEED, only=None, log=None):
+    """
+    Seeds and benchmarks each scale in the current database, which is emptied
+    first: callers point the default connection at a scratch database.
+    `only` restricts the run to the given route names.
+    """
+    log = log or (lambda message: None)
+    report = {
+        'commit': _git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'options': {'requests': requests, 'threads': threads, 'warmup': warmup, 'seed': seed},
+    }
+    # Server errors and query-budget warnings end up in the report; don't log them per request.
+    loggers = [logging.getLogger(name) for name in QUIET_LOGGERS]
+    levels = [logger.level for logger in loggers]
+    for logger in loggers:
+        logger.setLevel(logging.CRITICAL)
+    try:
+        report['scales'] = _run_scales(scales, requests, threads, warmup, seed, only, log)
+    finally:
+        for logger, level in zip(loggers, levels):
+            logger.setLevel(level)
+    report['peak_rss_kb'] = _peak_rss_kb()
+    return report
+
+
+def _run_scales(scales, requests, threads, warmup, seed, only, log):
+    results_by_scale = {}
+    # DEBUG = False as in production (no query log); the test client talks to 'testserver'.
+    with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+        for scale in scales:
+            log(f'[{scale}] generating data')
+            fake_shop.flush()
+            started = time.perf_counter()
+            rows = fake_shop.generate(**fake_shop.SCALES[scale], seed=seed, end_date=timezone.localdate())
+            seconds = time.perf_counter() - started
+            user = _staff_user()
+            close_old_connections()
+
+            results = {}
+            for name, path in routes():
+                if only and name not in only:
+                    continue
+                if _get(_client(user), path)[0] == 405:  # POST-only endpoint
+                    continue
+                results[name] = benchmark_route(path, user, requests, threads, warmup)
+                log(f"[{scale}] {name:<28} p50 {results[name]['p50_ms']:>8.1f}ms  "
+                    f"p95 {results[name]['p95_ms']:>8.1f}ms  queries {results[name]['queries']['max']}")
+            results_by_scale[scale] = {'rows': rows, 'seed_seconds': round(seconds, 1), 'routes': results}
+    return results_by_scale
+
+
+def check_budgets(report, budgets=None):
+    """Budget violations in a report, as readable strings."""
+    budgets = BUDGETS if budgets is None else budgets
+    failures = []
+    for scale, data in report['scales'].items():
+        for name, budget in budgets.items():
+            result = data['routes'].get(name)
+            if result is None:
+                continue
+            if 'p95_ms' in budget and result['p95_ms'] > budget['p95_ms']:
+                failures.append(f"[{scale}] {name}: p95 {result['p95_ms']}ms > {budget['p95_ms']}ms")
+            if 'max_queries' in budget and result['queries']['max'] > budget['max_queries']:
+                failures.append(f"[{scale}] {name}: {result['queries']['max']} queries > {budget['max_queries']}")
+    return failures
+
+
+def errors(report):
+    """Routes that answered with anything but 2xx/3xx (reported, but not a budget failure)."""
+    return [
+        f"[{scale}] {name}: responses {result['statuses']}"
+        for scale, data in report['scales'].items()
+        for name, result in data['routes'].items()
+        if any(not status.startswith(('2', '3')) for status in result['statuses'])
+    ]
+
+
+def compare(baseline, report, threshold=0.10):
+    """
+    Lines describing routes whose p95 moved by more than `threshold` (relative)
+    or whose max query count changed, between two reports.
+    """
+    lines = []
+    for scale, data in report['scales'].items():
+        old_routes = baseline.get('scales', {}).get(scale, {}).get('routes', {})
+        for name, result in data['routes'].items():
+            old = old_routes.get(name)
+            if old is None:
+                continue
+            change = (result['p95_ms'] - old['p95_ms']) / old['p95_ms'] if old['p95_ms'] else 0
+            if abs(change) > threshold:
+                lines.append(f"[{scale}] {name}: p95 {old['p95_ms']}ms -> {result['p95_ms']}ms ({change:+.0%})")
+            if result['queries']['max'] != old['queries']['max']:
+                lines.append(f"[{scale}] {name}: queries {old['queries']['max']} -> {result['queries']['max']}")
+    return lines
+
+
+def write_report(report, path):
+    with open(path, 'w', encoding='utf-8') as stream:
+        json.dump(report, stream, indent=2, sort_keys=True)
+        stream.write('\n')
@@ -0,0 +1,416 @@
+"""
+Streaming CSV import of the product catalog (supplier feeds of 100k+ rows).
+
+One CSV row describes one variant of a product:
+
+    product_name, brand, category, gender, price, description, material,
+    care_instructions, is_active, sku, color, size, quantity_in_stock
+
+Only product_name and price are required; rows without a sku only create or
+update the product. Products are matched on (product_name, brand) and
+variants on sku, so re-importing a feed updates rows instead of duplicating
+them.
+
+The file is read row by row and processed in chunks of `chunk_size` rows:
+  - Brand and Category names resolve through in-memory name -> id maps
+    loaded once. Missing ones are created on first use inside the chunk's
+    transaction, so a failed chunk leaves none behind.
+  - A variant whose color/size is already taken by another SKU of the same
+    product rejects its whole row, product fields included.
+  - Each chunk looks up its existing products and variants in one query each,
+    then writes with bulk_create/bulk_update inside its own transaction, skipping
+    rows whose stored values are unchanged. A failing chunk is rolled back and
+    reported without stopping the import.
+  - bulk writes bypass model signals, so the chunk's products are re-indexed
+    for search and the dashboard cache is invalidated explicitly.
+Only the current chunk is held in memory; row errors and progress are
+reported as they happen (iter_import yields them, import_catalog passes them
+to callbacks) and the first MAX_KEPT_ERRORS are kept on the result.
+"""
+import csv
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.validators import DecimalValidator
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from my_app import dashboard_cache, search
+from my_app.models import Brand, Category, GENDER_CHOICES, Product, ProductVariant
+
+DEFAULT_CHUNK_SIZE = 1000
+# bulk_update builds one CASE WHEN per field and row; keep its statements small.
+BULK_BATCH_SIZE = 250
+MAX_KEPT_ERRORS = 1000
+
+REQUIRED_COLUMNS = ('product_name', 'price')
+KNOWN_COLUMNS = (
+    'product_name', 'brand', 'category', 'gender', 'price', 'description', 'material',
+    'care_instructions', 'is_active', 'sku', 'color', 'size', 'quantity_in_stock',
+)
+PRODUCT_UPDATE_FIELDS = [
+    'description', 'category', 'gender', 'price', 'material', 'care_instructions', 'is_active', 'updated_at',
+]
+# Stored values compared with the row to skip unchanged products.
+PRODUCT_COMPARE_FIELDS = [
+    'description', 'category_id', 'gender', 'price', 'material', 'care_instructions', 'is_active',
+]
+VARIANT_UPDATE_FIELDS = ['product', 'color', 'size', 'quantity_in_stock']
+
+GENDERS = {code.lower(): code for code, _label in GENDER_CHOICES}
+
+# Prices must fit Product.price: one value too long for the column would fail its whole chunk.
+_PRICE_FIELD = Product._meta.get_field('price')
+PRICE_VALIDATOR = DecimalValidator(_PRICE_FIELD.max_digits, _PRICE_FIELD.decimal_places)
+GENDERS.update({label.lower(): code for code, label in GENDER_CHOICES})
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on', 'active'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'off', 'inactive'}
+
+
+class CatalogRowError(Exception):
+    """A row (or the header) that can't be imported; row errors are reported with their line number."""
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.products_created = 0
+        self.products_updated = 0
+        self.variants_created = 0
+        self.variants_updated = 0
+        self.products_unchanged = 0
+        self.variants_unchanged = 0
+        self.error_count = 0
+        self.rejected_rows = 0
+        self.errors = []  # [(line number, message)], at most MAX_KEPT_ERRORS
+
+    def add_error(self, line, message, rows=1):
+        self.error_count += 1
+        self.rejected_rows += rows
+        if len(self.errors) < MAX_KEPT_ERRORS:
+            self.errors.append((line, message))
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'products_created': self.products_created,
+            'products_updated': self.products_updated,
+            'variants_created': self.variants_created,
+            'variants_updated': self.variants_updated,
+            'products_unchanged': self.products_unchanged,
+            'variants_unchanged': self.variants_unchanged,
+            'error_count': self.error_count,
+            'rejected_rows': self.rejected_rows,
+        }
+
+
+class NameMap:
+    """Case-insensitive name -> id map for Brand/Category, loaded once per import."""
+
+    def __init__(self, model, name_field, create_missing=True):
+        self.model = model
+        self.name_field = name_field
+        self.create_missing = create_missing
+        self.ids = {name.lower(): pk for pk, name in model.objects.values_list('pk', name_field)}
+
+    def check(self, name):
+        """Rejects an unknown name when missing ones aren't created (parse time, no writes)."""
+        if name and not self.create_missing and name.lower() not in self.ids:
+            raise CatalogRowError(f'Unknown {self.model._meta.verbose_name.lower()} "{name}".')
+
+    def resolve(self, name):
+        """The id of `name`, creating the row if needed: call inside the chunk's transaction."""
+        if not name:
+            return None
+        key = name.lower()
+        if key not in self.ids:
+            obj, _created = self.model.objects.get_or_create(**{self.name_field: name})
+            self.ids[key] = obj.pk
+        return self.ids[key]
+
+    def snapshot(self):
+        return dict(self.ids)
+
+    def restore(self, ids):
+        """Forgets the ids of rows created by a chunk that was rolled back."""
+        self.ids = ids
+
+
+def _parse_row(row, brands, categories):
+    """
+    Validates one CSV row; returns (product fields, variant fields or None).
+    The product fields carry the brand/category names, not ids.
+    """
+    value = {column: (row.get(column) or '').strip() for column in KNOWN_COLUMNS}
+
+    if not value['product_name']:
+        raise CatalogRowError('product_name is required.')
+    if len(value['product_name']) > 255:
+        raise CatalogRowError('product_name can be at most 255 characters.')
+    try:
+        price = Decimal(value['price'])
+    except InvalidOperation:
+        raise CatalogRowError(f'Invalid price "{value["price"]}".')
+    if not price.is_finite():
+        raise CatalogRowError(f'Invalid price "{value["price"]}".')
+    try:
+        PRICE_VALIDATOR(price)
+    except ValidationError:
+        raise CatalogRowError(
+            f'Price "{value["price"]}" must have at most {_PRICE_FIELD.max_digits - _PRICE_FIELD.decimal_places} '
+            f'digits before and {_PRICE_FIELD.decimal_places} after the decimal point.'
+        )
+    if price <= 0:
+        raise CatalogRowError('Price must be positive.')
+
+    gender = GENDERS.get(value['gender'].lower(), None) if value['gender'] else 'U'
+    if gender is None:
+        raise CatalogRowError(f'Invalid gender "{value["gender"]}".')
+
+    is_active = True
+    if value['is_active']:
+        flag = value['is_active'].lower()
+        if flag not in TRUE_VALUES | FALSE_VALUES:
+            raise CatalogRowError(f'Invalid is_active "{value["is_active"]}".')
+        is_active = flag in TRUE_VALUES
+
+    brands.check(value['brand'])
+    categories.check(value['category'])
+    product = {
+        'product_name': value['product_name'],
+        'brand': value['brand'],  # names: resolved to ids by _write_chunk, in its transaction
+        'category': value['category'],
+        'gender': gender,
+        'price': price,
+        'description': value['description'],
+        'material': value['material'],
+        'care_instructions': value['care_instructions'],
+        'is_active': is_active,
+    }
+
+    if not value['sku']:
+        return product, None
+    if not value['color'] or not value['size']:
+        raise CatalogRowError('color and size are required when a sku is given.')
+    if len(value['sku']) > 100 or len(value['color']) > 50 or len(value['size']) > 50:
+        raise CatalogRowError('sku/color/size too long (100/50/50 characters).')
+    try:
+        quantity = int(value['quantity_in_stock'] or 0)
+    except ValueError:
+        raise CatalogRowError(f'Invalid quantity_in_stock "{value["quantity_in_stock"]}".')
+    if quantity < 0:
+        raise CatalogRowError('quantity_in_stock must be a non-negative number.')
+    variant = {'sku': value['sku'], 'color': value['color'], 'size': value['size'], 'quantity_in_stock': quantity}
+    return product, variant
+
+
+def _resolve_names(rows, brands, categories):
+    """The rows with brand/category names replaced by ids (creating missing ones)."""
+    resolved = []
+    for line, product, variant in rows:
+        fields = dict(product)
+        fields['brand_id'] = brands.resolve(fields.pop('brand'))
+        fields['category_id'] = categories.resolve(fields.pop('category'))
+        resolved.append((line, fields, variant))
+    return resolved
+
+
+def _product_key(product):
+    return product['product_name'], product['brand_id']
+
+
+def _write_chunk(rows, report, brands, categories):
+    """
+    Upserts one chunk of parsed rows: [(line, product fields, variant fields)].
+    Rows whose stored values already match are left alone, so re-importing an
+    unchanged feed only costs the lookups. Returns (ids of the products created
+    or changed, {counter: count}).
+    """
+    counts = {}
+    now = timezone.now()
+    rows = _resolve_names(rows, brands, categories)
+
+    # --- Existing products: match on (product_name, brand_id) ---
+    product_ids = {}
+    stored_products = {}
+    for pk, name, brand_id, *values in Product.objects.filter(
+        product_name__in={product['product_name'] for _line, product, _variant in rows}
+    ).order_by('-pk').values_list('pk', 'product_name', 'brand_id', *PRODUCT_COMPARE_FIELDS):
+        # lowest pk wins for duplicates already in the table
+        product_ids[(name, brand_id)] = pk
+        stored_products[pk] = tuple(values)
+
+    # --- Variants: match on sku; (product, color, size) must stay unique ---
+    # Checked before anything is written, so a rejected row changes nothing.
+    # A product is identified by its id, or by its key while it doesn't exist yet.
+    variant_rows = {}  # sku -> (line, product identity, variant fields); the last row of the chunk wins
+    for line, product, variant in rows:
+        if variant is not None:
+            key = _product_key(product)
+            variant_rows[variant['sku']] = (line, product_ids.get(key, key), variant)
+
+    stored_variants = {}
+    taken_cells = {}
+    rejected_lines = set()
+    if variant_rows:
+        for pk, sku, product_id, color, size, quantity in ProductVariant.objects.filter(
+            Q(product_id__in={product for _line, product, _variant in variant_rows.values()
+                              if not isinstance(product, tuple)}) |
+            Q(sku__in=variant_rows)
+        ).values_list('pk', 'sku', 'product_id', 'color', 'size', 'quantity_in_stock'):
+            stored_variants[sku] = (pk, (product_id, color, size, quantity))
+            taken_cells[(product_id, color, size)] = sku
+        for sku, (line, product, variant) in variant_rows.items():
+            cell = (product, variant['color'], variant['size'])
+            owner = taken_cells.get(cell)
+            if owner is not None and owner != sku:
+                report(line, f'{variant["color"]} / {variant["size"]} already exists for this product '
+                             f'with SKU "{owner}".')
+                rejected_lines.add(line)
+                continue
+            taken_cells[cell] = sku
+
+    # --- Products of the accepted rows; the last row of the chunk wins ---
+    product_rows = {}
+    for line, product, _variant in rows:
+        if line not in rejected_lines:
+            product_rows[_product_key(product)] = product
+
+    to_update, to_create = [], []
+    for key, fields in product_rows.items():
+        if key not in product_ids:
+            to_create.append(Product(**fields))
+        elif stored_products[product_ids[key]] != tuple(fields[name] for name in PRODUCT_COMPARE_FIELDS):
+            to_update.append(Product(pk=product_ids[key], updated_at=now, **fields))
+    if to_update:
+        Product.objects.bulk_update(to_update, PRODUCT_UPDATE_FIELDS, batch_size=BULK_BATCH_SIZE)
+    if to_create:
+        for product in Product.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE):
+            product_ids[(product.product_name, product.brand_id)] = product.pk
+    counts['products_updated'] = len(to_update)
+    counts['products_created'] = len(to_create)
+    counts['products_unchanged'] = len(product_rows) - len(to_update) - len(to_create)
+    written = {product.pk for product in to_update + to_create}
+
+    if variant_rows:
+        to_update, to_create = [], []
+        by_quantity = defaultdict(list)  # stock-only changes: new quantity -> variant ids
+        for sku, (line, product, variant) in variant_rows.items():
+            if line in rejected_lines:
+                continue
+            fields = dict(variant, product_id=product_ids[product] if isinstance(product, tuple) else product)
+            if sku not in stored_variants:
+                to_create.append(ProductVariant(**fields))
+            else:
+                pk, stored = stored_variants[sku]
+                if stored[:3] != (fields['product_id'], fields['color'], fields['size']):
+                    to_update.append(ProductVariant(pk=pk, **fields))
+                elif stored[3] != fields['quantity_in_stock']:
+                    by_quantity[fields['quantity_in_stock']].append(pk)
+        if to_update:
+            ProductVariant.objects.bulk_update(to_update, VARIANT_UPDATE_FIELDS, batch_size=BULK_BATCH_SIZE)
+        # Stock levels repeat a lot: one plain UPDATE per distinct quantity is far
+        # cheaper than bulk_update's per-row CASE expressions.
+        for quantity, pks in by_quantity.items():
+            for start in range(0, len(pks), BULK_BATCH_SIZE * 4):
+                ProductVariant.objects.filter(pk__in=pks[start:start + BULK_BATCH_SIZE * 4]).update(
+                    quantity_in_stock=quantity
+                )
+        if to_create:
+            ProductVariant.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+        counts['variants_updated'] = len(to_update) + sum(len(pks) for pks in by_quantity.values())
+        counts['variants_created'] = len(to_create)
+        counts['variants_unchanged'] = (len(variant_rows) - len(rejected_lines) - len(to_create)
+                                        - counts['variants_updated'])
+
+    return written, counts
+
+
+def iter_import(text_stream, chunk_size=DEFAULT_CHUNK_SIZE, create_missing=True):
+    """
+    Imports a CSV catalog from an iterable of text lines (an open file,
+    io.TextIOWrapper around an upload, ...), yielding events as it goes:
+      ('error', line, message)  for every rejected row
+      ('progress', result)      after every chunk
+    The ImportResult is the generator's return value.
+    """
+    result = ImportResult()
+
+    reader = csv.DictReader(text_stream)
+    if reader.fieldnames is None:
+        raise CatalogRowError('The file is empty.')
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    missing = [column for column in REQUIRED_COLUMNS if column not in reader.fieldnames]
+    if missing:
+        raise CatalogRowError(f'Missing required column(s): {", ".join(missing)}.')
+
+    pending = []
+
+    def report(line, message, rows=1):
+        result.add_error(line, message, rows)
+        pending.append(('error', line, message))
+
+    brands = NameMap(Brand, 'brand_name', create_missing)
+    categories = NameMap(Category, 'category_name', create_missing)
+
+    def flush(chunk):
+        known_brands, known_categories = brands.snapshot(), categories.snapshot()
+        rejected = []  # reported once the chunk commits; a failed chunk is reported as a whole
+        try:
+            with transaction.atomic():
+                product_ids, counts = _write_chunk(chunk, lambda *error: rejected.append(error), brands, categories)
+                search.reindex_products(product_ids)
+            transaction.on_commit(dashboard_cache.invalidate)
+            for line, message in rejected:
+                report(line, message)
+            for counter, count in counts.items():
+                setattr(result, counter, getattr(result, counter) + count)
+        except DatabaseError as e:
+            brands.restore(known_brands)  # names created by the chunk were rolled back with it
+            categories.restore(known_categories)
+            first, last = chunk[0][0], chunk[-1][0]
+            report(first, f'Lines {first}-{last} were not imported: {e}', rows=len(chunk))
+        pending.append(('progress', result))
+
+    chunk = []
+    for row in reader:
+        result.rows += 1
+        line = reader.line_num
+        try:
+            product, variant = _parse_row(row, brands, categories)
+        except CatalogRowError as e:
+            report(line, str(e))
+        else:
+            chunk.append((line, product, variant))
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        yield from pending
+        pending.clear()
+    if chunk:
+        flush(chunk)
+    else:
+        pending.append(('progress', result))
+    yield from pending
+    return result
+
+
+def import_catalog(text_stream, chunk_size=DEFAULT_CHUNK_SIZE, create_missing=True,
+                   on_progress=None, on_error=None):
+    """
+    Runs iter_import() to completion and returns the ImportResult.
+    `on_progress(result)` is called after every chunk, `on_error(line, message)`
+    for every rejected row.
+    """
+    events = iter_import(text_stream, chunk_size, create_missing)
+    while True:
+        try:
+            event = next(events)
+        except StopIteration as done:
+            return done.value
+        if event[0] == 'error' and on_error:
+            on_error(event[1], event[2])
+        elif event[0] == 'progress' and on_progress:
+            on_progress(event[1])
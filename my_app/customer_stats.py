@@ -0,0 +1,209 @@
+"""
+Per-customer order totals (CustomerStats) for the customer detail page.
+
+Customers with a short history are summarized on the fly with one aggregate
+over their orders (served by order_customer_date_idx). Once a customer reaches
+settings.CUSTOMER_STATS_MIN_ORDERS orders (None disables the summary), the
+first page view stores the aggregate in a CustomerStats row. From then on every
+Order save/delete moves that row by a signed delta with a single F() UPDATE, as
+my_app/rollups.py does for the daily rollup: an edit subtracts the order's
+previous (customer, date, total) and adds the new one, so reassigning an order
+to another customer moves it between both summaries. Removing an order
+recomputes `last_order_date` from the customer's remaining orders in the same
+UPDATE; adding one only compares dates.
+
+Deltas for customers without a row are skipped (the aggregate is still exact),
+so an order written while a row is being created can be missed; run
+`python manage.py rebuild_customer_stats` after bulk loads or to repair drift.
+Queryset updates of Order.total_amount must call record_total_delta().
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Case, Count, DecimalField, F, Max, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from my_app.models import CustomerStats, Order
+
+DEFAULT_MIN_ORDERS = 50
+
+# Order fields that determine a customer's totals.
+TRACKED_FIELDS = ('customer_id', 'order_date', 'total_amount')
+
+SNAPSHOT_ATTR = '_customer_stats_snapshot'
+
+ZERO = Decimal('0.00')
+
+
+def min_orders():
+    return getattr(settings, 'CUSTOMER_STATS_MIN_ORDERS', DEFAULT_MIN_ORDERS)
+
+
+def enabled():
+    return min_orders() is not None
+
+
+def snapshot(order):
+    """Tracked field values of an Order, or None if any of them is deferred/unset."""
+    values = order.__dict__
+    if any(name not in values for name in TRACKED_FIELDS) or values.get('order_date') is None:
+        return None
+    return tuple(values[name] for name in TRACKED_FIELDS)
+
+
+# --- Incremental maintenance ---
+
+def _last_order_date(customer_id):
+    return Subquery(
+        Order.objects.filter(customer_id=customer_id).order_by('-order_date').values('order_date')[:1]
+    )
+
+
+def _apply(state, sign):
+    customer_id, order_date, total_amount = state
+    if customer_id is None:  # guest order
+        return
+    changes = {
+        'order_count': F('order_count') + sign,
+        'total_spent': F('total_spent') + sign * Decimal(total_amount or 0),
+    }
+    if sign > 0:
+        changes['last_order_date'] = Case(
+            When(Q(last_order_date__isnull=True) | Q(last_order_date__lt=order_date), then=Value(order_date)),
+            default=F('last_order_date'),
+        )
+    else:
+        changes['last_order_date'] = _last_order_date(customer_id)
+    CustomerStats.objects.filter(pk=customer_id).update(**changes)
+
+
+def apply_order_change(old_state, new_state):
+    """Moves an order from `old_state` to `new_state` (either may be None) in the customers' summaries."""
+    if old_state == new_state or not enabled():
+        return
+    with transaction.atomic():
+        if old_state is not None:
+            _apply(old_state, -1)
+        if new_state is not None:
+            _apply(new_state, 1)
+
+
+def record_total_delta(order, amount_delta):
+    """
+    Applies a change of `order.total_amount` made with a queryset UPDATE (no
+    signals) and keeps the instance's snapshot in step.
+    """
+    state = snapshot(order)
+    if state is None or not amount_delta:
+        return
+    customer_id, order_date, total_amount = state
+    if customer_id is not None and enabled():
+        CustomerStats.objects.filter(pk=customer_id).update(total_spent=F('total_spent') + amount_delta)
+    setattr(order, SNAPSHOT_ATTR, (customer_id, order_date, Decimal(total_amount or 0) + amount_delta))
+
+
+# --- Signal handlers (connected in my_app/signals.py) ---
+
+def remember_order_state(sender, instance, **kwargs):
+    setattr(instance, SNAPSHOT_ATTR, snapshot(instance) if instance.pk else None)
+
+
+def capture_previous_state(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk or getattr(instance, SNAPSHOT_ATTR, None) is not None:
+        return
+    previous = Order.objects.filter(pk=instance.pk).values_list(*TRACKED_FIELDS).first()
+    setattr(instance, SNAPSHOT_ATTR, tuple(previous) if previous else None)
+
+
+def order_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_state = snapshot(instance)
+    if new_state is None:  # saved with update_fields on a partially loaded row
+        instance.refresh_from_db(fields=TRACKED_FIELDS)
+        new_state = snapshot(instance)
+    old_state = None if created else getattr(instance, SNAPSHOT_ATTR, None)
+    apply_order_change(old_state, new_state)
+    setattr(instance, SNAPSHOT_ATTR, new_state)
+
+
+def order_deleted(sender, instance, **kwargs):
+    apply_order_change(getattr(instance, SNAPSHOT_ATTR, None) or snapshot(instance), None)
+
+
+# --- Reading / rebuilding ---
+
+def aggregate(customer):
+    """The customer's order totals in one aggregate query over their orders."""
+    totals = Order.objects.filter(customer=customer).order_by().aggregate(
+        total_orders=Count('order_id'),
+        total_spent=Sum('total_amount'),
+        average_order=Avg('total_amount'),
+        last_order=Max('order_date'),
+    )
+    totals['total_spent'] = totals['total_spent'] or ZERO
+    totals['average_order'] = totals['average_order'] or ZERO
+    return totals
+
+
+def _from_row(row):
+    return {
+        'total_orders': row.order_count,
+        'total_spent': row.total_spent,
+        'average_order': row.total_spent / row.order_count if row.order_count else ZERO,
+        'last_order': row.last_order_date,
+    }
+
+
+def for_customer(customer):
+    """
+    {'total_orders', 'total_spent', 'average_order', 'last_order'} for the
+    customer page: from the CustomerStats row when there is one (load it with
+    select_related('stats') to save the query), otherwise from aggregate(),
+    storing the result once the customer has enough orders.
+    """
+    if not enabled():
+        return aggregate(customer)
+    row = getattr(customer, 'stats', None)
+    if row is not None:
+        return _from_row(row)
+    totals = aggregate(customer)
+    if totals['total_orders'] >= min_orders():
+        CustomerStats.objects.bulk_create([CustomerStats(
+            customer_id=customer.pk,
+            order_count=totals['total_orders'],
+            total_spent=totals['total_spent'],
+            last_order_date=totals['last_order'],
+        )], ignore_conflicts=True)  # a concurrent request may have stored it first
+    return totals
+
+
+def rebuild(stdout=None):
+    """
+    Recomputes every summary from Order history with one GROUP BY customer
+    query: rows for customers at or above the threshold, none for the others.
+    Returns the number of rows written.
+    """
+    with transaction.atomic():
+        CustomerStats.objects.all().delete()
+        threshold = min_orders()
+        if threshold is None:
+            return 0
+        totals = (
+            Order.objects.filter(customer__isnull=False)
+            .order_by()
+            .values('customer_id')
+            .annotate(
+                order_count=Count('order_id'),
+                total_spent=Coalesce(Sum('total_amount'), Value(ZERO),
+                                     output_field=DecimalField(max_digits=14, decimal_places=2)),
+                last_order_date=Max('order_date'),
+            )
+            .filter(order_count__gte=threshold)
+        )
+        rows = [CustomerStats(**row) for row in totals.iterator(chunk_size=2000)]
+        CustomerStats.objects.bulk_create(rows, batch_size=1000)
+    if stdout is not None:
+        stdout.write(f'{len(rows)} customer(s) with at least {threshold} orders')
+    return len(rows)
@@ -0,0 +1,114 @@
+"""
+Cache layer for the dashboard context.
+
+Every admin lands on the dashboard after login, so the KPI/recent-activity part
+of its context is built once and shared through Django's cache framework
+(settings.CACHES; a local-memory backend by default, so no external service is
+needed).
+
+Entries are served with stale-while-revalidate semantics:
+  - An entry is fresh for DASHBOARD_CACHE_TTL seconds and is kept in the cache
+    for DASHBOARD_CACHE_STALE_TTL more seconds after that.
+  - When a request finds a stale entry, it tries to take a short-lived lock
+    with `cache.add()` (atomic). Only the lock holder rebuilds the context;
+    every other request keeps serving the stale copy in the meantime.
+  - Invalidation (Order/ProductVariant/Product/Category changes, see
+    my_app/signals.py) bumps a generation counter instead of deleting the entry,
+    so a burst of writes marks the cached context stale but never turns into a
+    stampede of recomputations.
+
+Only shared data is cached; per-user values such as the SweetAlert session
+flags are added by the views after the cached part is fetched.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+DEFAULT_TTL = 60  # seconds an entry is considered fresh
+DEFAULT_STALE_TTL = 600  # extra seconds a stale entry may still be served
+LOCK_TIMEOUT = 30  # upper bound for one recomputation; the lock expires on its own after that
+
+KEY_PREFIX = 'dashboard'
+GENERATION_KEY = f'{KEY_PREFIX}:generation'
+
+
+def _cache():
+    return caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')]
+
+
+def _ttl():
+    return getattr(settings, 'DASHBOARD_CACHE_TTL', DEFAULT_TTL)
+
+
+def _stale_ttl():
+    return getattr(settings, 'DASHBOARD_CACHE_STALE_TTL', DEFAULT_STALE_TTL)
+
+
+def _generation(cache):
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 0, timeout=None)
+        generation = cache.get(GENERATION_KEY, 0)
+    return generation
+
+
+def _store(cache, key, generation, builder):
+    context = builder()
+    cache.set(
+        key,
+        {'context': context, 'generation': generation, 'expires_at': time.time() + _ttl()},
+        timeout=_ttl() + _stale_ttl(),
+    )
+    return context
+
+
+def get_context(name, builder):
+    """
+    Returns the cached context for dashboard `name`, calling `builder()` to
+    (re)compute it when it is missing, or stale and this request won the
+    recompute lock.
+    """
+    ttl = _ttl()
+    if not ttl:
+        return builder()
+
+    cache = _cache()
+    key = f'{KEY_PREFIX}:{name}'
+    lock_key = f'{key}:lock'
+    generation = _generation(cache)
+    entry = cache.get(key)
+
+    if entry is not None and entry['generation'] == generation and entry['expires_at'] > time.time():
+        return entry['context']
+
+    if not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        # Another worker is recomputing: serve what we have.
+        if entry is not None:
+            return entry['context']
+        # Cold cache (first request or evicted): nothing to serve, so compute
+        # without storing; the lock holder will populate the cache.
+        return builder()
+
+    try:
+        return _store(cache, key, generation, builder)
+    finally:
+        cache.delete(lock_key)
+
+
+def invalidate():
+    """Marks every cached dashboard context stale (served until one request rebuilds it)."""
+    cache = _cache()
+    cache.add(GENERATION_KEY, 0, timeout=None)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:  # evicted between add() and incr()
+        cache.set(GENERATION_KEY, 1, timeout=None)
+
+
+def invalidate_on_commit(sender=None, raw=False, **kwargs):
+    """Signal handler: invalidates once the surrounding transaction has committed."""
+    if raw:
+        return
+    transaction.on_commit(invalidate)
@@ -0,0 +1,203 @@
+"""
+Streaming CSV exports of orders, products, inventory, customers and reviews.
+
+Every export is a `values_list` projection (no model instances) read with
+`QuerySet.iterator(chunk_size=...)` (a server-side cursor on PostgreSQL) and
+written out in ~64 KB CSV chunks, optionally gzip-compressed on the fly, so
+memory stays flat no matter how many rows are exported. One-to-many data
+(order items, product variants) is flattened with a LEFT JOIN: one row per
+item/variant, and one row with empty item columns for orders/products that
+have none.
+
+Filters map onto indexed columns: the date range is a half-open
+`[from 00:00, to + 1 day 00:00)` range on the export's date column and the
+status filter is an equality on a status/flag column.
+"""
+import csv
+import zlib
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from my_app.models import Customer, LOW_STOCK_THRESHOLD, Order, Product, ProductVariant, Review, flag_is
+from my_app.rollups import day_start
+
+DEFAULT_CHUNK_SIZE = 2000
+FLUSH_BYTES = 64 * 1024
+
+
+class ExportError(ValueError):
+    """Invalid export name or filter value."""
+
+
+class Export:
+    def __init__(self, model, columns, date_field=None, statuses=None, order_by=None):
+        self.model = model
+        self.columns = columns  # [(CSV header, field path)]
+        self.date_field = date_field
+        self.statuses = statuses or {}  # status filter value -> Q
+        self.order_by = order_by or ['pk']
+
+    @property
+    def headers(self):
+        return [header for header, _field in self.columns]
+
+    def queryset(self, date_from=None, date_to=None, status=None):
+        rows = self.model.objects.all()
+        if date_from is not None or date_to is not None:
+            if not self.date_field:
+                raise ExportError('This export has no date filter.')
+            if date_from is not None:
+                rows = rows.filter(**{f'{self.date_field}__gte': day_start(date_from)})
+            if date_to is not None:
+                rows = rows.filter(**{f'{self.date_field}__lt': day_start(date_to + timedelta(days=1))})
+        if status:
+            if status not in self.statuses:
+                choices = ', '.join(sorted(self.statuses)) or 'none'
+                raise ExportError(f'Unknown status "{status}" (choices: {choices}).')
+            rows = rows.filter(self.statuses[status])
+        return rows.order_by(*self.order_by).values_list(*[field for _header, field in self.columns])
+
+
+def _choices(field, values):
+    return {value.lower(): Q(**{field: value}) for value in values}
+
+
+EXPORTS = {
+    'orders': Export(
+        Order,
+        [
+            ('order_id', 'order_id'), ('order_date', 'order_date'), ('order_status', 'order_status'),
+            ('payment_status', 'payment_status'), ('customer_id', 'customer_id'),
+            ('customer_email', 'customer__email'), ('total_amount', 'total_amount'),
+            ('shipping_method', 'shipping_method'), ('tracking_number', 'tracking_number'),
+            ('order_item_id', 'items__order_item_id'), ('sku', 'items__variant__sku'),
+            ('product_name', 'items__variant__product__product_name'), ('quantity', 'items__quantity'),
+            ('price_at_purchase', 'items__price_at_purchase'),
+        ],
+        date_field='order_date',
+        statuses={
+            **_choices('order_status', ['PENDING', 'PROCESSING', 'SHIPPED', 'DELIVERED', 'CANCELLED']),
+            **{f'payment_{value.lower()}': Q(payment_status=value)
+               for value in ['PAID', 'PENDING', 'REFUNDED', 'FAILED']},
+        },
+        order_by=['order_id', 'items__order_item_id'],
+    ),
+    'products': Export(
+        Product,
+        [
+            ('product_id', 'product_id'), ('product_name', 'product_name'), ('brand', 'brand__brand_name'),
+            ('category', 'category__category_name'), ('gender', 'gender'), ('price', 'price'),
+            ('material', 'material'), ('is_active', 'is_active'), ('created_at', 'created_at'),
+            ('variant_id', 'variants__variant_id'), ('sku', 'variants__sku'), ('color', 'variants__color'),
+            ('size', 'variants__size'), ('quantity_in_stock', 'variants__quantity_in_stock'),
+        ],
+        date_field='created_at',
+        statuses={'active': flag_is('is_active', True), 'inactive': flag_is('is_active', False)},
+        order_by=['product_id', 'variants__variant_id'],
+    ),
+    'inventory': Export(
+        ProductVariant,
+        [
+            ('variant_id', 'variant_id'), ('sku', 'sku'), ('product_id', 'product_id'),
+            ('product_name', 'product__product_name'), ('color', 'color'), ('size', 'size'),
+            ('quantity_in_stock', 'quantity_in_stock'),
+        ],
+        statuses={
+            'low': Q(quantity_in_stock__lte=LOW_STOCK_THRESHOLD),
+            'out': Q(quantity_in_stock__lte=0),
+        },
+        order_by=['variant_id'],
+    ),
+    'customers': Export(
+        Customer,
+        [
+            ('customer_id', 'customer_id'), ('first_name', 'first_name'), ('last_name', 'last_name'),
+            ('email', 'email'), ('phone_number', 'phone_number'),
+            ('registration_date', 'registration_date'), ('last_login', 'last_login'),
+        ],
+        date_field='registration_date',
+        order_by=['customer_id'],
+    ),
+    'reviews': Export(
+        Review,
+        [
+            ('review_id', 'review_id'), ('review_date', 'review_date'), ('product_id', 'product_id'),
+            ('product_name', 'product__product_name'), ('customer_email', 'customer__email'),
+            ('rating', 'rating'), ('is_approved', 'is_approved'), ('review_text', 'review_text'),
+        ],
+        date_field='review_date',
+        statuses={'approved': flag_is('is_approved', True), 'pending': flag_is('is_approved', False)},
+        order_by=['review_id'],
+    ),
+}
+
+
+def get_export(name):
+    try:
+        return EXPORTS[name]
+    except KeyError:
+        raise ExportError(f'Unknown export "{name}" (choices: {", ".join(sorted(EXPORTS))}).')
+
+
+def parse_filter_date(value, label):
+    """'YYYY-MM-DD' -> date (None for an empty value)."""
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ExportError(f'Invalid {label} date "{value}" (expected YYYY-MM-DD).')
+    return parsed
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+class _LineBuffer:
+    """File-like target for csv.writer that just returns each written line."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(export, queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields the CSV text of the export in chunks of roughly FLUSH_BYTES."""
+    writer = csv.writer(_LineBuffer())
+    pending = [writer.writerow(export.headers)]
+    size = len(pending[0])
+    for row in queryset.iterator(chunk_size=chunk_size):
+        line = writer.writerow([_cell(value) for value in row])
+        pending.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield ''.join(pending)
+            pending, size = [], 0
+    if pending:
+        yield ''.join(pending)
+
+
+def iter_bytes(text_chunks, compress=False):
+    """UTF-8 encodes the chunks, gzip-compressing them as a single stream if asked."""
+    if not compress:
+        for chunk in text_chunks:
+            yield chunk.encode('utf-8')
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    for chunk in text_chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def filename(name, compress=False):
+    return f"{name}.csv{'.gz' if compress else ''}"
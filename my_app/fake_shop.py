@@ -0,0 +1,646 @@
+"""
+Deterministic synthetic shop data for benchmarking at production scale
+(`python manage.py generate_fake_shop`).
+
+The same seed, scale and end date always produce the same rows. Distributions
+aim to look like a real store rather than uniform noise:
+  - product popularity and customer purchase frequency are Zipfian (a few
+    best sellers and loyal customers account for most order lines);
+  - orders per day follow a growth trend, a monthly season (holiday peak in
+    November/December, Black Friday week, a summer sale, a quiet February),
+    busier weekends and a daily hour curve;
+  - order/payment status depends on the order's age (recent orders are still
+    pending or in transit, old ones delivered, a few cancelled or refunded);
+  - order lines mostly carry the list price, some a markdown, and promotions
+    running on the order day are applied with pricing.discount_for().
+Customers only place orders after they registered, and reviews only come from
+customers who bought the product.
+
+Rows are written with bulk_create in batches of `batch_size` (one transaction
+per batch), holding only ids and prices of the catalog in memory, so a million
+orders load in minutes on SQLite or PostgreSQL. bulk_create bypasses model
+signals, so the search index, the daily sales rollup and the caches are rebuilt
+at the end. Product images are not generated: there are no files to point at.
+"""
+import bisect
+import itertools
+import math
+import random
+from collections import Counter
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from my_app import customer_stats, dashboard_cache, preferences, pricing, reference_data, rfm, rollups, search
+from my_app.models import (
+    Address, AppliedPromotion, Brand, Cart, CartItem, Category, Customer, CustomerPreferenceProfile, CustomerStats,
+    CustomerValueScore, DailySalesRollup, LOW_STOCK_THRESHOLD, Member, Order, OrderItem, Product, ProductImage, ProductVariant,
+    Promotion, Review, Wishlist,
+)
+from my_app.variants import generate_sku
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_SEED = 42
+DEFAULT_DAYS = 730
+
+# products / customers / orders; variants and order items follow from the
+# per-product and per-order averages (6 and 3 by default).
+SCALES = {
+    'tiny': {'products': 200, 'customers': 500, 'orders': 2_000},
+    'small': {'products': 2_000, 'customers': 10_000, 'orders': 50_000},
+    'medium': {'products': 10_000, 'customers': 50_000, 'orders': 200_000},
+    'large': {'products': 50_000, 'customers': 200_000, 'orders': 1_000_000},
+}
+DEFAULT_VARIANTS_PER_PRODUCT = 6
+DEFAULT_ITEMS_PER_ORDER = 3
+
+# Every model filled by generate(), children first (the order tables are emptied in).
+MODELS = [
+    Wishlist, CartItem, Cart, Review, AppliedPromotion, OrderItem, Order, Promotion, CustomerStats,
+    CustomerPreferenceProfile, CustomerValueScore, Address, Customer, ProductImage, ProductVariant, Product, Category, Brand, Member,
+    DailySalesRollup,
+]
+
+PRODUCT_ZIPF_S = 1.1
+CUSTOMER_ZIPF_S = 0.9
+BRAND_ZIPF_S = 1.0
+
+# --- Vocabulary ---
+
+FIRST_NAMES = [
+    'Sophea', 'Dara', 'Emma', 'Liam', 'Olivia', 'Noah', 'Ava', 'Lucas', 'Mia', 'Ethan', 'Chloe', 'Mason',
+    'Sreyneang', 'Vibol', 'Isabella', 'James', 'Amelia', 'Leo', 'Harper', 'Daniel', 'Grace', 'Henry', 'Lily',
+    'Samuel', 'Zoe', 'Jack', 'Nora', 'Owen', 'Hannah', 'Ryan', 'Layla', 'Nathan', 'Sokha', 'Visal', 'Mai',
+    'Kenji', 'Aiko', 'Mateo', 'Lucia', 'Omar', 'Fatima', 'Arjun', 'Priya', 'Chen', 'Wei', 'Anna', 'Tom',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Chan', 'Sok', 'Kim', 'Nguyen', 'Garcia', 'Brown', 'Lee', 'Martin', 'Davis', 'Lopez',
+    'Wilson', 'Anderson', 'Taylor', 'Thomas', 'Moore', 'Jackson', 'White', 'Harris', 'Clark', 'Lewis', 'Young',
+    'Walker', 'Hall', 'Allen', 'Wright', 'King', 'Scott', 'Green', 'Baker', 'Adams', 'Nelson', 'Hill', 'Ramirez',
+    'Meas', 'Heng', 'Tan', 'Wong', 'Sato', 'Tanaka', 'Rossi', 'Muller', 'Dubois', 'Silva', 'Khan', 'Patel',
+]
+CITIES = [
+    ('Phnom Penh', 'Phnom Penh', 'Cambodia'), ('Siem Reap', 'Siem Reap', 'Cambodia'),
+    ('Battambang', 'Battambang', 'Cambodia'), ('Bangkok', 'Bangkok', 'Thailand'),
+    ('Ho Chi Minh City', None, 'Vietnam'), ('Singapore', None, 'Singapore'),
+    ('Kuala Lumpur', 'Federal Territory', 'Malaysia'), ('Seattle', 'WA', 'United States'),
+    ('Los Angeles', 'CA', 'United States'), ('New York', 'NY', 'United States'),
+    ('London', None, 'United Kingdom'), ('Paris', None, 'France'), ('Sydney', 'NSW', 'Australia'),
+]
+STREETS = ['Main St', 'Norodom Blvd', 'Sihanouk Blvd', 'Riverside', 'Market St', 'Park Ave', 'Station Rd',
+           'Monivong Blvd', 'Oak St', 'Hill Rd', 'Lake View', 'Garden Lane']
+
+BRAND_PREFIXES = ['Urban', 'North', 'Blue', 'Silk', 'Stone', 'Wild', 'Golden', 'Nova', 'Pure', 'Coast', 'Velvet',
+                  'Iron', 'Lotus', 'Amber', 'Echo', 'Maple', 'Luna', 'Sol', 'Cedar', 'Mono']
+BRAND_SUFFIXES = ['Thread', 'Wear', 'Atelier', 'Supply', 'Line', 'Studio', 'Works', 'Label', 'House', 'Denim',
+                  'Knit', 'Loom', 'Outfitters', 'Tailors', 'Mode', 'Co', 'Goods', 'Garment', 'Collective', 'Apparel']
+
+APPAREL_SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+SHOE_SIZES = ['36', '37', '38', '39', '40', '41', '42', '43', '44', '45']
+ONE_SIZE = ['One Size']
+COLORS = ['Black', 'White', 'Navy', 'Gray', 'Beige', 'Red', 'Olive', 'Blue', 'Brown', 'Pink', 'Green', 'Cream',
+          'Burgundy', 'Mustard', 'Lavender', 'Teal']
+
+# top category -> (leaf categories with their product nouns, sizes, base price in cents)
+CATEGORY_TREE = {
+    'Tops': ([('T-Shirts', 'Tee'), ('Shirts', 'Shirt'), ('Blouses', 'Blouse'), ('Sweaters', 'Sweater'),
+              ('Hoodies', 'Hoodie')], APPAREL_SIZES, 2500),
+    'Bottoms': ([('Jeans', 'Jeans'), ('Trousers', 'Trousers'), ('Shorts', 'Shorts'), ('Skirts', 'Skirt')],
+                APPAREL_SIZES, 3500),
+    'Dresses': ([('Casual Dresses', 'Day Dress'), ('Evening Dresses', 'Gown'), ('Maxi Dresses', 'Maxi Dress')],
+                APPAREL_SIZES, 4500),
+    'Outerwear': ([('Jackets', 'Jacket'), ('Coats', 'Coat'), ('Blazers', 'Blazer')], APPAREL_SIZES, 7500),
+    'Activewear': ([('Leggings', 'Leggings'), ('Sports Bras', 'Sports Bra'), ('Track Pants', 'Track Pants')],
+                   APPAREL_SIZES, 3000),
+    'Shoes': ([('Sneakers', 'Sneakers'), ('Boots', 'Boots'), ('Sandals', 'Sandals'), ('Heels', 'Heels')],
+              SHOE_SIZES, 6000),
+    'Accessories': ([('Bags', 'Tote Bag'), ('Belts', 'Belt'), ('Hats', 'Cap'), ('Scarves', 'Scarf')],
+                    ONE_SIZE, 2000),
+}
+ADJECTIVES = ['Classic', 'Relaxed', 'Slim', 'Oversized', 'Cropped', 'Essential', 'Vintage', 'Tailored', 'Soft',
+              'Everyday', 'Premium', 'Lightweight', 'Textured', 'Ribbed', 'Pleated', 'Washed', 'Organic', 'Linen']
+MATERIALS = ['Cotton', 'Organic Cotton', 'Linen', 'Wool', 'Silk', 'Denim', 'Polyester', 'Leather', 'Viscose',
+             'Cashmere', 'Nylon']
+CARE_INSTRUCTIONS = ['Machine wash cold, tumble dry low.', 'Hand wash only. Dry flat.', 'Dry clean only.',
+                     'Machine wash 30°C. Do not bleach.', 'Wipe clean with a damp cloth.']
+GENDER_WEIGHTS = [('W', 45), ('M', 35), ('U', 12), ('K', 8)]
+REVIEW_TEXTS = {
+    1: ['Poor quality, returned it.', 'Did not match the photos.'],
+    2: ['Runs small and the fabric feels cheap.', 'Color faded after one wash.'],
+    3: ['Okay for the price.', 'Fits fine, nothing special.'],
+    4: ['Good fit and comfortable.', 'Nice fabric, would buy again.'],
+    5: ['Love it! Perfect fit.', 'Excellent quality, highly recommend.', 'My new favourite.'],
+}
+RATING_WEIGHTS = [5, 7, 13, 30, 45]
+SHIPPING_METHODS = [('Standard', 70), ('Express', 22), ('Next Day', 8)]
+
+# Seasonality: relative order volume per calendar month (Jan..Dec), per weekday
+# (Mon..Sun) and per hour of the day.
+MONTH_FACTORS = [0.85, 0.75, 0.9, 0.95, 1.0, 0.95, 1.15, 1.05, 0.95, 1.0, 1.45, 1.75]
+WEEKDAY_FACTORS = [0.95, 0.9, 0.95, 1.0, 1.05, 1.2, 1.15]
+HOUR_WEIGHTS = [2, 1, 1, 1, 1, 1, 2, 3, 4, 5, 6, 7, 9, 8, 7, 6, 6, 7, 8, 10, 11, 10, 7, 4]
+GROWTH = 1.5  # the last day sees GROWTH x the volume of the first one (before seasonality)
+
+
+def _weighted(pairs):
+    values, weights = zip(*pairs)
+    return list(values), list(itertools.accumulate(weights))
+
+
+def _zipf_cum_weights(n, s):
+    return list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def _cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+class _ExplicitTimestamps:
+    """
+    Lets bulk_create store the generated dates of auto_now/auto_now_add fields
+    (their pre_save() would otherwise overwrite them with the current time).
+    """
+
+    def __init__(self, *fields):
+        self.fields = fields
+        self.saved = []
+
+    def __enter__(self):
+        self.saved = [(field, field.auto_now, field.auto_now_add) for field in self.fields]
+        for field in self.fields:
+            field.auto_now = field.auto_now_add = False
+
+    def __exit__(self, *exc_info):
+        for field, auto_now, auto_now_add in self.saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _timestamp_fields():
+    return [model._meta.get_field(name) for model, name in [
+        (Product, 'created_at'), (Product, 'updated_at'), (Customer, 'registration_date'),
+        (Order, 'order_date'), (Review, 'review_date'), (AppliedPromotion, 'applied_at'),
+        (Cart, 'created_at'), (Cart, 'updated_at'), (CartItem, 'added_at'), (Wishlist, 'added_date'),
+    ]]
+
+
+def existing_rows():
+    """Models of MODELS that already contain rows."""
+    return [model for model in MODELS if model.objects.exists()]
+
+
+def flush():
+    """Empties every shop table (TRUNCATE/DELETE with sequence reset; auth tables are untouched)."""
+    tables = [model._meta.db_table for model in MODELS]
+    if search.is_supported():
+        tables.append(search.PG_SEARCH_TABLE if connection.vendor == 'postgresql' else search.FTS_TABLE)
+    statements = connection.ops.sql_flush(no_style(), tables, reset_sequences=True, allow_cascade=True)
+    connection.ops.execute_sql_flush(statements)
+    dashboard_cache.invalidate()
+    reference_data.invalidate()
+
+
+class FakeShopGenerator:
+    """
+    Builds the data set table by table; see generate(). Only ids, prices and
+    dates needed to link later tables are kept between steps.
+    """
+
+    def __init__(self, products, customers, orders, variants_per_product=DEFAULT_VARIANTS_PER_PRODUCT,
+                 items_per_order=DEFAULT_ITEMS_PER_ORDER, days=DEFAULT_DAYS, seed=DEFAULT_SEED, end_date=None,
+                 batch_size=DEFAULT_BATCH_SIZE, log=None):
+        self.n_products = products
+        self.n_customers = max(customers, 1)
+        self.n_orders = orders
+        self.variants_per_product = max(variants_per_product, 1)
+        self.items_per_order = max(items_per_order, 1)
+        self.days = max(days, 1)
+        self.rng = random.Random(seed)
+        end_date = end_date or timezone.localdate()
+        self.end = timezone.make_aware(datetime.combine(end_date, time.min)) + timedelta(days=1)
+        self.start = self.end - timedelta(days=self.days)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.counts = Counter()
+        self._logged = {}
+
+    # --- helpers ---
+
+    def _bulk_create(self, model, objects):
+        """Inserts one batch in its own transaction; the objects get their primary keys."""
+        with transaction.atomic():
+            created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.counts[model.__name__] += len(created)
+        return created
+
+    def _random_datetime(self, day_start):
+        hour = self.rng.choices(range(24), cum_weights=self._hour_weights)[0]
+        return day_start + timedelta(hours=hour, seconds=self.rng.randrange(3600))
+
+    def _day(self, index):
+        return self.start + timedelta(days=index)
+
+    def _progress(self, label, done, total):
+        """Logs every ~20 batches and at the end."""
+        step = self.batch_size * 20
+        if done == total or done // step != self._logged.get(label, 0):
+            self._logged[label] = done // step
+            self.log(f'{label}: {done:,}/{total:,}')
+
+    # --- steps ---
+
+    def run(self):
+        self._hour_weights = list(itertools.accumulate(HOUR_WEIGHTS))
+        with _ExplicitTimestamps(*_timestamp_fields()):
+            self.members()
+            self.brands_and_categories()
+            self.products()
+            self.variants()
+            self.customers()
+            self.promotions()
+            self.orders()
+            self.carts_and_wishlists()
+        self.rebuild_derived_data()
+        return dict(self.counts)
+
+    def members(self):
+        members = [
+            Member(first_name=first, last_name=last, email=f'{first}.{last}.{index}@staff.example.com'.lower(),
+                   phone_number=f'+855 12 {index:06d}')
+            for index, (first, last) in enumerate(zip(FIRST_NAMES[:12], LAST_NAMES[:12]))
+        ]
+        self._bulk_create(Member, members)
+
+    def brands_and_categories(self):
+        n_brands = min(max(self.n_products // 250, 20), len(BRAND_PREFIXES) * len(BRAND_SUFFIXES))
+        names = [f'{prefix} {suffix}' for prefix in BRAND_PREFIXES for suffix in BRAND_SUFFIXES]
+        self.rng.shuffle(names)
+        brands = self._bulk_create(Brand, [
+            Brand(brand_name=name, description=f'{name} clothing and accessories.') for name in sorted(names[:n_brands])
+        ])
+        self.brand_ids = [brand.pk for brand in brands]
+        self.rng.shuffle(self.brand_ids)  # popularity rank independent of the name
+        self.brand_weights = _zipf_cum_weights(len(self.brand_ids), BRAND_ZIPF_S)
+
+        tops = self._bulk_create(Category, [
+            Category(category_name=name, description=f'All {name.lower()}.') for name in CATEGORY_TREE
+        ])
+        leaves = []
+        for top in tops:
+            children, sizes, base_price = CATEGORY_TREE[top.category_name]
+            for name, noun in children:
+                leaves.append((Category(category_name=name, parent_category=top), noun, sizes, base_price))
+        self._bulk_create(Category, [category for category, *_rest in leaves])
+        self.leaf_categories = [(category.pk, noun, sizes, base_price) for category, noun, sizes, base_price in leaves]
+
+    def products(self):
+        """Products with log-normal prices around their category's base price."""
+        genders, gender_weights = _weighted(GENDER_WEIGHTS)
+        created_from = self.start - timedelta(days=365)
+        span = (self.end - created_from).total_seconds()
+        self.product_ids = []
+        self.product_prices = []  # cents, parallel to product_ids
+        self.product_sizes = []
+        for batch_start in range(0, self.n_products, self.batch_size):
+            batch = []
+            sizes_of_batch = []
+            for _ in range(min(self.batch_size, self.n_products - batch_start)):
+                category_id, noun, sizes, base_price = self.rng.choice(self.leaf_categories)
+                material = self.rng.choice(MATERIALS)
+                price = max(500, int(base_price * self.rng.lognormvariate(0, 0.45)) // 100 * 100 - 1)
+                created_at = created_from + timedelta(seconds=self.rng.random() * span)
+                batch.append(Product(
+                    product_name=f'{self.rng.choice(ADJECTIVES)} {material} {noun}',
+                    description=f'{self.rng.choice(ADJECTIVES)} {noun.lower()} in {material.lower()}.',
+                    brand_id=self.brand_ids[bisect.bisect_left(
+                        self.brand_weights, self.rng.random() * self.brand_weights[-1])],
+                    category_id=category_id,
+                    gender=self.rng.choices(genders, cum_weights=gender_weights)[0],
+                    price=_cents(price),
+                    material=material,
+                    care_instructions=self.rng.choice(CARE_INSTRUCTIONS),
+                    is_active=self.rng.random() < 0.92,
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+                sizes_of_batch.append(sizes)
+            for product, sizes in zip(self._bulk_create(Product, batch), sizes_of_batch):
+                self.product_ids.append(product.pk)
+                self.product_prices.append(int(product.price * 100))
+                self.product_sizes.append(sizes)
+            self._progress('products', len(self.product_ids), self.n_products)
+
+        # Popularity rank: a shuffled permutation, so best sellers are spread over the catalog.
+        self.popularity = list(range(len(self.product_ids)))
+        self.rng.shuffle(self.popularity)
+        self.product_weights = _zipf_cum_weights(len(self.product_ids), PRODUCT_ZIPF_S)
+
+    def _stock(self):
+        roll = self.rng.random()
+        if roll < 0.02:
+            return 0
+        if roll < 0.07:
+            return self.rng.randint(1, LOW_STOCK_THRESHOLD)
+        return self.rng.randint(LOW_STOCK_THRESHOLD + 1, 250)
+
+    def variants(self):
+        """Color x size cells per product, `variants_per_product` on average."""
+        self.product_variants = [[] for _ in self.product_ids]  # product index -> variant ids
+        pending = []
+        owners = []
+        total = 0
+
+        def flush_batch():
+            for variant, owner in zip(self._bulk_create(ProductVariant, pending), owners):
+                self.product_variants[owner].append(variant.pk)
+            pending.clear()
+            owners.clear()
+
+        for index, product_id in enumerate(self.product_ids):
+            sizes = self.product_sizes[index]
+            target = max(1, round(self.rng.triangular(1, 2 * self.variants_per_product - 1, self.variants_per_product)))
+            n_colors = min(len(COLORS), math.ceil(target / len(sizes)))
+            cells = [(color, size) for color in self.rng.sample(COLORS, n_colors) for size in sizes][:target]
+            for color, size in cells:
+                pending.append(ProductVariant(
+                    product_id=product_id, color=color, size=size,
+                    sku=generate_sku(product_id, color, size), quantity_in_stock=self._stock(),
+                ))
+                owners.append(index)
+            total += len(cells)
+            if len(pending) >= self.batch_size:
+                flush_batch()
+                self._progress('variants', index + 1, len(self.product_ids))
+        if pending:
+            flush_batch()
+        self.log(f'variants: {total:,}')
+        del self.product_sizes
+
+    def _day_weights(self, growth=GROWTH):
+        weights = []
+        for index in range(self.days):
+            day = (self.start + timedelta(days=index)).date()
+            weight = (1 + (growth - 1) * index / self.days) * MONTH_FACTORS[day.month - 1] * WEEKDAY_FACTORS[day.weekday()]
+            if day.month == 11 and 22 <= day.day <= 30:  # Black Friday week
+                weight *= 2.2
+            weights.append(weight)
+        return weights
+
+    def customers(self):
+        """
+        Customers sorted by registration date, each with a default shipping
+        address and sometimes a separate billing address. 2% registered before
+        the order history starts, so there is always someone to order.
+        """
+        day_weights = list(itertools.accumulate(self._day_weights(growth=2.0)))
+        early = max(1, self.n_customers // 50)
+        registrations = sorted(
+            [self.start - timedelta(days=self.rng.randint(1, 365), seconds=self.rng.randrange(86400))
+             for _ in range(early)]
+            + [self._random_datetime(self._day(self.rng.choices(range(self.days), cum_weights=day_weights)[0]))
+               for _ in range(self.n_customers - early)]
+        )
+        self.customer_ids = []
+        self.registered_at = registrations
+        self.shipping_address = []
+        self.billing_address = []
+        for batch_start in range(0, self.n_customers, self.batch_size):
+            batch = []
+            for offset, registered in enumerate(registrations[batch_start:batch_start + self.batch_size]):
+                number = batch_start + offset
+                first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+                last_login = registered + timedelta(days=self.rng.random() * max((self.end - registered).days, 1))
+                batch.append(Customer(
+                    first_name=first, last_name=last,
+                    email=f'{first}.{last}.{number}@example.com'.lower(),
+                    password_hash='!',  # unusable password
+                    phone_number=f'+855 {self.rng.randint(10, 99)} {self.rng.randrange(10 ** 6):06d}'
+                    if self.rng.random() < 0.6 else None,
+                    registration_date=registered,
+                    last_login=last_login if self.rng.random() < 0.8 else None,
+                ))
+            customers = self._bulk_create(Customer, batch)
+
+            addresses = []
+            for customer in customers:
+                city, state, country = self.rng.choice(CITIES)
+                addresses.append(self._address(customer.pk, city, state, country, 'S'))
+                if self.rng.random() < 0.3:
+                    addresses.append(self._address(customer.pk, city, state, country, 'B'))
+            addresses = self._bulk_create(Address, addresses)
+            by_customer = {}
+            for address in addresses:
+                by_customer.setdefault(address.customer_id, {})[address.address_type] = address.pk
+            for customer in customers:
+                own = by_customer[customer.pk]
+                self.customer_ids.append(customer.pk)
+                self.shipping_address.append(own['S'])
+                self.billing_address.append(own.get('B', own['S']))
+            self._progress('customers', len(self.customer_ids), self.n_customers)
+        self.customer_weights = _zipf_cum_weights(self.n_customers, CUSTOMER_ZIPF_S)
+
+    def _address(self, customer_id, city, state, country, address_type):
+        return Address(
+            customer_id=customer_id,
+            address_line1=f'{self.rng.randint(1, 999)} {self.rng.choice(STREETS)}',
+            address_line2=f'Apt {self.rng.randint(1, 40)}' if self.rng.random() < 0.2 else None,
+            city=city, state_province=state, postal_code=f'{self.rng.randrange(10 ** 5):05d}', country=country,
+            address_type=address_type, is_default=True,
+        )
+
+    def promotions(self):
+        """A promotion every ~2 weeks, 3-21 days long; 10% were switched off."""
+        n_promotions = max(12, self.days // 14)
+        types = ['PERCENTAGE'] * 6 + ['FIXED_AMOUNT'] * 3 + ['FREE_SHIPPING']
+        promotions = []
+        for index in range(n_promotions):
+            start = self._day(self.rng.randrange(self.days))
+            discount_type = self.rng.choice(types)
+            value = {'PERCENTAGE': self.rng.choice([5, 10, 15, 20, 25, 30]),
+                     'FIXED_AMOUNT': self.rng.choice([5, 10, 15, 20]),
+                     'FREE_SHIPPING': 0}[discount_type]
+            promotions.append(Promotion(
+                promo_code=f'PROMO{index + 1:04d}',
+                description=f'{discount_type.replace("_", " ").title()} campaign #{index + 1}',
+                discount_type=discount_type,
+                discount_value=Decimal(value),
+                start_date=start,
+                end_date=start + timedelta(days=self.rng.randint(3, 21)) - timedelta(seconds=1),
+                min_order_amount=Decimal(self.rng.choice([0, 0, 25, 50, 100])) or None,
+                usage_limit=self.rng.choice([None, None, 1000, 5000]),
+                per_customer_limit=self.rng.choice([None, 1, 3]),
+                is_active=self.rng.random() < 0.9,
+            ))
+        promotions = self._bulk_create(Promotion, promotions)
+        self.promotions_by_day = [[] for _ in range(self.days)]
+        for promotion in promotions:
+            if not promotion.is_active:
+                continue
+            first = max(0, (promotion.start_date - self.start).days)
+            last = min(self.days - 1, (promotion.end_date - self.start).days)
+            for index in range(first, last + 1):
+                self.promotions_by_day[index].append(promotion)
+
+    def _status(self, age_days):
+        roll = self.rng.random()
+        if roll < 0.05:
+            order_status = 'CANCELLED'
+            payment = self.rng.choices(['REFUNDED', 'FAILED', 'PENDING'], weights=[60, 25, 15])[0]
+            return order_status, payment
+        if age_days < 2:
+            order_status = 'PENDING' if roll < 0.65 else 'PROCESSING'
+        elif age_days < 7:
+            order_status = self.rng.choices(['PENDING', 'PROCESSING', 'SHIPPED'], weights=[5, 30, 65])[0]
+        else:
+            order_status = 'DELIVERED' if roll < 0.98 else 'SHIPPED'
+        if order_status == 'PENDING':
+            payment = self.rng.choices(['PENDING', 'PAID', 'FAILED'], weights=[70, 25, 5])[0]
+        else:
+            payment = 'REFUNDED' if order_status == 'DELIVERED' and self.rng.random() < 0.01 else 'PAID'
+        return order_status, payment
+
+    def _customer_for(self, ordered_at):
+        """Zipfian customer among those registered before `ordered_at`."""
+        eligible = max(1, bisect.bisect_right(self.registered_at, ordered_at))
+        rank = bisect.bisect_left(self.customer_weights, self.rng.random() * self.customer_weights[-1])
+        return rank if rank < eligible else self.rng.randrange(eligible)
+
+    def _variant(self):
+        rank = bisect.bisect_left(self.product_weights, self.rng.random() * self.product_weights[-1])
+        product_index = self.popularity[rank]
+        return product_index, self.rng.choice(self.product_variants[product_index])
+
+    def orders(self):
+        """
+        Orders in chronological order (ids grow with the order date), with their
+        lines, applied promotions and the reviews of delivered lines.
+        """
+        day_weights = list(itertools.accumulate(self._day_weights()))
+        per_day = Counter(self.rng.choices(range(self.days), cum_weights=day_weights, k=self.n_orders))
+        shipping_methods, shipping_weights = _weighted(SHIPPING_METHODS)
+        # floor(Exp(rate)) is geometric with mean 1 / (e^rate - 1) = items_per_order - 1
+        self._extra_lines_rate = math.log(1 + 1 / max(self.items_per_order - 1, 0.01))
+        self.reviewed = set()
+        pending = []  # (order, lines, promotion, day index)
+        done = 0
+        for day_index in range(self.days):
+            day_start = self._day(day_index)
+            age_days = self.days - 1 - day_index
+            for ordered_at in sorted(self._random_datetime(day_start) for _ in range(per_day[day_index])):
+                customer = self._customer_for(ordered_at)
+                lines = {}
+                n_lines = 1 + min(int(self.rng.expovariate(self._extra_lines_rate)), 11)
+                for _ in range(n_lines):
+                    product_index, variant_id = self._variant()
+                    price = self.product_prices[product_index]
+                    if self.rng.random() < 0.15:  # markdown
+                        price = price * self.rng.choice([70, 80, 90]) // 100
+                    lines.setdefault(variant_id, (product_index, 1 if self.rng.random() < 0.85 else 2, price))
+                subtotal = sum((pricing.line_total(quantity, _cents(price))
+                                for _product, quantity, price in lines.values()), Decimal('0.00'))
+                promotion = None
+                running = self.promotions_by_day[day_index]
+                if running and self.rng.random() < 0.12:
+                    promotion = self.rng.choice(running)
+                discount = pricing.discount_for(promotion, subtotal) if promotion else Decimal('0.00')
+                order_status, payment_status = self._status(age_days)
+                shipped = order_status in ('SHIPPED', 'DELIVERED')
+                order = Order(
+                    customer_id=self.customer_ids[customer],
+                    order_date=ordered_at,
+                    total_amount=max(subtotal - discount, Decimal('0.00')),
+                    shipping_address_id=self.shipping_address[customer],
+                    billing_address_id=self.billing_address[customer],
+                    order_status=order_status,
+                    payment_status=payment_status,
+                    shipping_method=self.rng.choices(shipping_methods, cum_weights=shipping_weights)[0],
+                    tracking_number=f'TRK{done + len(pending) + 1:010d}' if shipped else None,
+                )
+                pending.append((order, lines, promotion, discount, customer))
+                if len(pending) >= self.batch_size:
+                    done += self._write_orders(pending)
+                    pending = []
+                    self._progress('orders', done, self.n_orders)
+        if pending:
+            done += self._write_orders(pending)
+            self._progress('orders', done, self.n_orders)
+        del self.reviewed
+
+    def _write_orders(self, pending):
+        orders = self._bulk_create(Order, [order for order, *_rest in pending])
+        items, applied, reviews = [], [], []
+        for order, (_order, lines, promotion, discount, customer) in zip(orders, pending):
+            for variant_id, (product_index, quantity, price) in lines.items():
+                items.append(OrderItem(order_id=order.pk, variant_id=variant_id, quantity=quantity,
+                                       price_at_purchase=_cents(price)))
+                if order.order_status == 'DELIVERED' and self.rng.random() < 0.04:
+                    review = self._review(order, product_index, customer)
+                    if review:
+                        reviews.append(review)
+            if promotion is not None:
+                applied.append(AppliedPromotion(order_id=order.pk, promotion_id=promotion.pk,
+                                                discount_applied=discount, applied_at=order.order_date))
+        self._bulk_create(OrderItem, items)
+        if applied:
+            self._bulk_create(AppliedPromotion, applied)
+        if reviews:
+            self._bulk_create(Review, reviews)
+        return len(orders)
+
+    def _review(self, order, product_index, customer):
+        product_id = self.product_ids[product_index]
+        key = (product_id, customer)
+        if key in self.reviewed:  # one review per product and customer
+            return None
+        self.reviewed.add(key)
+        rating = self.rng.choices(range(1, 6), weights=RATING_WEIGHTS)[0]
+        reviewed_at = min(order.order_date + timedelta(days=self.rng.randint(3, 30), seconds=self.rng.randrange(86400)),
+                          self.end - timedelta(seconds=1))
+        return Review(
+            product_id=product_id, customer_id=self.customer_ids[customer], rating=rating,
+            review_text=self.rng.choice(REVIEW_TEXTS[rating]) if self.rng.random() < 0.7 else None,
+            review_date=reviewed_at,
+            is_approved=(self.end - reviewed_at).days > 3 and self.rng.random() < 0.9,
+        )
+
+    def carts_and_wishlists(self):
+        """Open carts for ~5% of customers and wishlists for ~10%, both from the last 30 days."""
+        recent = max(1, min(30, self.days))
+        carts, cart_lines, wishlists = [], [], []
+        for customer_id in self.customer_ids:
+            roll = self.rng.random()
+            if roll < 0.05:
+                created = self._random_datetime(self._day(self.days - self.rng.randint(1, recent)))
+                carts.append(Cart(customer_id=customer_id, created_at=created, updated_at=created))
+                cart_lines.append(dict(self._variant() for _ in range(self.rng.randint(1, 4))))
+            if roll < 0.10:
+                chosen = {variant_id for _product, variant_id in (self._variant() for _ in range(self.rng.randint(1, 6)))}
+                added = self._random_datetime(self._day(self.days - self.rng.randint(1, recent)))
+                wishlists.extend(Wishlist(customer_id=customer_id, variant_id=variant_id, added_date=added)
+                                 for variant_id in chosen)
+        carts = self._bulk_create(Cart, carts)
+        items = [
+            CartItem(cart_id=cart.pk, variant_id=variant_id, quantity=1, added_at=cart.created_at)
+            for cart, lines in zip(carts, cart_lines) for variant_id in set(lines.values())
+        ]
+        self._bulk_create(CartItem, items)
+        self._bulk_create(Wishlist, wishlists)
+
+    def rebuild_derived_data(self):
+        self.log('rebuilding the daily sales rollup, the customer stats/profiles and the search index')
+        rollups.rebuild()
+        customer_stats.rebuild()
+        preferences.update(full=True)
+        if rfm.is_available():
+            rfm.score_customers()
+        if search.is_supported():
+            search.rebuild_index()
+        dashboard_cache.invalidate()
+        reference_data.invalidate()
+
+
+def generate(**options):
+    """Generates a fake shop (see FakeShopGenerator for the options); returns rows created per model."""
+    return FakeShopGenerator(**options).run()
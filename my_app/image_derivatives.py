@@ -0,0 +1,196 @@
+"""
+Resized JPEG and WebP copies ("derivatives") of product images, so list and
+detail pages don't download multi-megabyte originals.
+
+Saving a ProductImage with a new file queues generation once the transaction
+commits (signal handlers below, connected in my_app/signals.py). A small thread
+pool (settings.IMAGE_DERIVATIVE_WORKERS) runs the work; Pillow releases the GIL
+while decoding, resizing and encoding, so the request thread returns at once.
+With IMAGE_DERIVATIVES_BACKGROUND = False the work runs inline, after the commit.
+
+Each size in IMAGE_DERIVATIVE_SIZES is written in every IMAGE_DERIVATIVE_FORMATS
+next to the original (products/shirt.jpg -> products/shirt.thumb.jpg,
+products/shirt.thumb.webp, ...). Then ProductImage.derivatives_status becomes
+READY. Until then, and when generation FAILED, ProductImage.thumbnail_url and
+friends return the original image URL. `manage.py build_image_derivatives`
+(re)generates the copies of existing images.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from my_app.models import IMAGE_DERIVATIVE_FORMATS, IMAGE_DERIVATIVE_SIZES, ProductImage, derivative_name
+from my_app.storage import ContentAddressedStorage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+
+# Extension -> (Pillow format, save options)
+ENCODERS = {
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+JPEG_BACKGROUND = (255, 255, 255)  # transparent areas of PNG/WebP uploads, flattened for JPEG
+
+SOURCE_ATTR = '_derivative_source'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', DEFAULT_WORKERS),
+                thread_name_prefix='image-derivatives',
+            )
+        return _executor
+
+
+# --- Rendering ---
+
+def open_image(storage, name, largest):
+    """
+    The stored image `name`, upright and in RGB(A). `largest` is the biggest
+    (width, height) it will be resized to: JPEGs are decoded at a reduced scale
+    that still covers it.
+    """
+    with storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        image.draft('RGB', largest)
+        image.load()
+    image = ImageOps.exif_transpose(image)  # phone photos carry their rotation in EXIF
+    return image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+
+def _resize(image, width, height, crop):
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+    resized = image.copy()
+    resized.thumbnail((width, height), Image.Resampling.LANCZOS)  # never enlarges
+    return resized
+
+
+def encode(image, fmt):
+    pil_format, options = ENCODERS[fmt]
+    if pil_format == 'JPEG' and image.mode == 'RGBA':
+        flattened = Image.new('RGB', image.size, JPEG_BACKGROUND)
+        flattened.paste(image, mask=image.getchannel('A'))
+        image = flattened
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def render(storage, name):
+    """{derivative storage name: encoded bytes} for the original stored as `name`."""
+    largest = max((width, height) for width, height, _crop in IMAGE_DERIVATIVE_SIZES.values())
+    source = open_image(storage, name, largest)
+    files = {}
+    for size, (width, height, crop) in IMAGE_DERIVATIVE_SIZES.items():
+        resized = _resize(source, width, height, crop)
+        for fmt in IMAGE_DERIVATIVE_FORMATS:
+            files[derivative_name(name, size, fmt)] = encode(resized, fmt)
+    return files
+
+
+# --- Building ---
+
+def save(storage, name, content):
+    """Stores a derivative under exactly `name`, replacing the previous one."""
+    if isinstance(storage, ContentAddressedStorage):
+        storage.save_exact(name, content)  # save() would hash originals from before the blobs into blobs/
+        return
+    if storage.exists(name):  # the storage would otherwise pick a new, suffixed name
+        storage.delete(name)
+    if storage.save(name, content) != name:
+        raise ValueError(f'the storage saved {name} under another name')
+
+
+def build(image_id):
+    """Generates the derivatives of one ProductImage and records the outcome. Returns the new status."""
+    row = ProductImage.objects.filter(pk=image_id).only('image_id', 'image').first()
+    if row is None or not row.image:
+        return None
+    name, storage = row.image.name, row.image.storage
+    try:
+        files = render(storage, name)
+        if ProductImage.objects.filter(image__in=list(files)).exists():
+            raise ValueError('a derivative name is taken by another uploaded original')
+        for target, data in files.items():
+            save(storage, target, ContentFile(data))
+        status = 'READY'
+    except Exception:
+        logger.exception('Could not generate derivatives of product image %s (%s)', image_id, name)
+        status = 'FAILED'
+    # Only if the row still points at the file that was processed.
+    ProductImage.objects.filter(pk=image_id, image=name).update(derivatives_status=status)
+    return status
+
+
+def _build_in_background(image_id):
+    try:
+        build(image_id)
+    finally:
+        connections.close_all()  # this worker thread's own connections
+
+
+def submit(image_id):
+    if getattr(settings, 'IMAGE_DERIVATIVES_BACKGROUND', True):
+        _pool().submit(_build_in_background, image_id)
+    else:
+        build(image_id)
+
+
+def delete_derivatives(storage, name):
+    for size in IMAGE_DERIVATIVE_SIZES:
+        for fmt in IMAGE_DERIVATIVE_FORMATS:
+            storage.delete(derivative_name(name, size, fmt))
+
+
+# --- Signal handlers (connected in my_app/signals.py) ---
+
+def _image_name(instance):
+    value = instance.__dict__.get('image')
+    return getattr(value, 'name', value) or None
+
+
+def remember_image(sender, instance, **kwargs):
+    setattr(instance, SOURCE_ATTR, _image_name(instance) if instance.pk else None)
+
+
+def image_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    name = _image_name(instance)
+    if not created and name == getattr(instance, SOURCE_ATTR, None):
+        return
+    setattr(instance, SOURCE_ATTR, name)
+    if not name:
+        return
+    if not created and instance.derivatives_status != 'PENDING':  # the file was replaced
+        ProductImage.objects.filter(pk=instance.pk).update(derivatives_status='PENDING')
+        instance.derivatives_status = 'PENDING'
+    image_id = instance.pk
+    transaction.on_commit(lambda: submit(image_id))
+
+
+def _delete_unless_shared(storage, name):
+    if not ProductImage.objects.filter(image=name).exists():  # identical uploads share one file (my_app/storage.py)
+        delete_derivatives(storage, name)
+
+
+def image_deleted(sender, instance, **kwargs):
+    name = _image_name(instance)
+    if name:
+        storage = instance.image.storage
+        transaction.on_commit(lambda: _delete_unless_shared(storage, name))
@@ -0,0 +1,150 @@
+"""
+Inventory allocation service: reserves and releases ProductVariant stock for
+order items.
+
+Reservations are a single conditional UPDATE
+
+    UPDATE my_app_productvariant
+       SET quantity_in_stock = quantity_in_stock - n
+     WHERE variant_id = %s AND quantity_in_stock >= n
+
+so the check and the decrement happen atomically in the database: two
+concurrent orders can never both take the last units, and no read-then-write
+race is possible. The row stays locked until the caller's transaction ends, so
+callers must run these functions inside `transaction.atomic()` together with
+the OrderItem/Order writes they belong to. When several variants are touched
+at once they are updated in primary-key order to avoid lock-order deadlocks.
+
+Cancelled orders don't hold stock: cancelling an order releases its items and
+re-opening it reserves them again. These functions write with
+`QuerySet.update()`, which bypasses model signals, so the dashboard cache is
+invalidated explicitly on commit.
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from my_app import dashboard_cache
+from my_app.models import Order, OrderItem, ProductVariant
+
+# Order statuses whose items do not hold stock.
+RELEASED_STATUSES = ('CANCELLED',)
+
+
+class InsufficientStock(Exception):
+    """Raised when a variant doesn't have enough stock for a reservation."""
+
+    def __init__(self, variant_id, requested, available):
+        self.variant_id = variant_id
+        self.requested = requested
+        self.available = available
+        super().__init__(f'Not enough stock. Only {available} available.')
+
+
+def holds_stock(order_status):
+    return order_status not in RELEASED_STATUSES
+
+
+def _changed():
+    transaction.on_commit(dashboard_cache.invalidate)
+
+
+def reserve(variant_id, quantity):
+    """Takes `quantity` units of the variant, or raises InsufficientStock without changing anything."""
+    if quantity <= 0:
+        return
+    updated = ProductVariant.objects.filter(pk=variant_id, quantity_in_stock__gte=quantity).update(
+        quantity_in_stock=F('quantity_in_stock') - quantity
+    )
+    if not updated:
+        available = ProductVariant.objects.filter(pk=variant_id).values_list('quantity_in_stock', flat=True).first()
+        raise InsufficientStock(variant_id, quantity, available or 0)
+    _changed()
+
+
+def release(variant_id, quantity):
+    """Puts `quantity` units of the variant back into stock."""
+    if quantity <= 0 or variant_id is None:
+        return
+    ProductVariant.objects.filter(pk=variant_id).update(quantity_in_stock=F('quantity_in_stock') + quantity)
+    _changed()
+
+
+def reserve_many(quantities):
+    """Reserves {variant_id: quantity} in primary-key order; all-or-nothing inside the caller's transaction."""
+    with transaction.atomic():
+        for variant_id in sorted(quantities):
+            reserve(variant_id, quantities[variant_id])
+
+
+def release_many(quantities):
+    """Puts {variant_id: quantity} back into stock with one UPDATE."""
+    quantities = {pk: qty for pk, qty in quantities.items() if pk is not None and qty > 0}
+    if not quantities:
+        return
+    ProductVariant.objects.filter(pk__in=quantities).update(
+        quantity_in_stock=F('quantity_in_stock') + Case(
+            *[When(pk=pk, then=Value(qty)) for pk, qty in quantities.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+    _changed()
+
+
+def change_reservation(old_variant_id, old_quantity, new_variant_id, new_quantity):
+    """
+    Moves an order line's reservation from (old_variant_id, old_quantity) to
+    (new_variant_id, new_quantity): only the difference is taken or released
+    when the variant stays the same.
+    """
+    if old_variant_id == new_variant_id:
+        delta = new_quantity - old_quantity
+        if delta > 0:
+            reserve(new_variant_id, delta)
+        elif delta < 0:
+            release(new_variant_id, -delta)
+        return
+    # Take the new stock first: if it fails nothing has been released yet.
+    reserve(new_variant_id, new_quantity)
+    release(old_variant_id, old_quantity)
+
+
+def order_quantities(order):
+    """{variant_id: quantity} of the order's items."""
+    return dict(OrderItem.objects.filter(order=order).values_list('variant_id', 'quantity'))
+
+
+def _locked_status(order):
+    """The order's stored status, read with a row lock held until the transaction ends."""
+    return Order.objects.select_for_update().filter(pk=order.pk).values_list('order_status', flat=True).first()
+
+
+def order_holds_stock(order):
+    """Locks the order row and tells whether its items currently hold stock (i.e. it isn't cancelled)."""
+    status = _locked_status(order)
+    return status is not None and holds_stock(status)
+
+
+def release_order(order):
+    """
+    Returns the stock held by the items of `order` before it is deleted (nothing
+    if it is cancelled). Call inside `transaction.atomic()`.
+    """
+    if order_holds_stock(order):
+        release_many(order_quantities(order))
+
+
+def change_order_status(order, new_status):
+    """
+    Reserves or releases the order's stock for a status change, based on the
+    status currently stored in the database (the order row is locked so two
+    concurrent edits can't both release the same items). Call inside
+    `transaction.atomic()` before saving `order` with its new status.
+    """
+    current_status = _locked_status(order)
+    if current_status is None or holds_stock(current_status) == holds_stock(new_status):
+        return
+    if holds_stock(new_status):
+        reserve_many(order_quantities(order))
+    else:
+        release_many(order_quantities(order))
@@ -0,0 +1,137 @@
+"""
+Dashboard KPI service.
+
+Order metrics are read from the DailySalesRollup table (see my_app/rollups.py)
+in a single conditional-aggregation query (`Sum` with `filter=`) over at most
+one row per day, so their cost is O(days) instead of O(orders).
+get_order_kpis_from_orders() computes the same numbers straight from Order,
+with every time window a half-open `[start, end)` range on the raw
+`order_date` column. Filters such as `order_date__date=today` wrap the column
+in a cast and can't use an index; comparing against precomputed aware
+datetimes can.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from my_app.models import Category, DailySalesRollup, LOW_STOCK_THRESHOLD, Order, Product, ProductVariant
+from my_app.rollups import day_start
+
+SALES_WINDOW_DAYS = 30
+
+
+def sales_windows(today=None, days=SALES_WINDOW_DAYS):
+    """
+    Returns the half-open datetime ranges used by the dashboard:
+      - today:    [today 00:00, tomorrow 00:00)
+      - current:  the last `days` days up to and including today
+      - previous: the `days` days before that
+    """
+    today = today or timezone.localdate()
+    tomorrow_start = day_start(today + timedelta(days=1))
+    current_start = day_start(today - timedelta(days=days))
+    previous_start = day_start(today - timedelta(days=2 * days))
+    return {
+        'today': (day_start(today), tomorrow_start),
+        'current': (current_start, tomorrow_start),
+        'previous': (previous_start, current_start),
+    }
+
+
+def _in_range(bounds):
+    start, end = bounds
+    return Q(order_date__gte=start, order_date__lt=end)
+
+
+def _money_sum(condition, field='total_amount'):
+    return Coalesce(
+        Sum(field, filter=condition),
+        Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def percentage_change(current, previous, from_zero=Decimal('100.00')):
+    """Period-over-period change in percent; `from_zero` when growing from zero."""
+    if previous > 0:
+        return ((current - previous) / previous) * 100
+    if current > 0:
+        return from_zero
+    return Decimal('0.00')
+
+
+def get_order_kpis(today=None):
+    """
+    Order metrics for the dashboard in ONE query over DailySalesRollup:
+      sales_last_30_days / sales_prev_30_days                (all orders)
+      paid_sales_last_30_days / paid_sales_prev_30_days      (payment_status PAID)
+      new_orders_today, pending_orders, shipped_orders
+    """
+    today = today or timezone.localdate()
+    current = Q(date__gte=today - timedelta(days=SALES_WINDOW_DAYS), date__lte=today)
+    previous = Q(date__gte=today - timedelta(days=2 * SALES_WINDOW_DAYS),
+                 date__lt=today - timedelta(days=SALES_WINDOW_DAYS))
+
+    def count(field, condition=None):
+        return Coalesce(Sum(field, filter=condition), Value(0))
+
+    return DailySalesRollup.objects.aggregate(
+        sales_last_30_days=_money_sum(current, 'gross_sales'),
+        sales_prev_30_days=_money_sum(previous, 'gross_sales'),
+        paid_sales_last_30_days=_money_sum(current, 'paid_sales'),
+        paid_sales_prev_30_days=_money_sum(previous, 'paid_sales'),
+        new_orders_today=count('order_count', Q(date=today)),
+        pending_orders=count('pending_count'),
+        shipped_orders=count('shipped_count'),
+    )
+
+
+def get_order_kpis_from_orders(today=None):
+    """
+    The same metrics as get_order_kpis(), computed from Order in ONE query
+    (used to cross-check the rollup):
+      sales_last_30_days / sales_prev_30_days                (all orders)
+      paid_sales_last_30_days / paid_sales_prev_30_days      (payment_status PAID)
+      new_orders_today, pending_orders, shipped_orders
+    """
+    windows = sales_windows(today)
+    paid = Q(payment_status='PAID')
+    return Order.objects.aggregate(
+        sales_last_30_days=_money_sum(_in_range(windows['current'])),
+        sales_prev_30_days=_money_sum(_in_range(windows['previous'])),
+        paid_sales_last_30_days=_money_sum(_in_range(windows['current']) & paid),
+        paid_sales_prev_30_days=_money_sum(_in_range(windows['previous']) & paid),
+        new_orders_today=Count('order_id', filter=_in_range(windows['today'])),
+        pending_orders=Count('order_id', filter=Q(order_status='PENDING')),
+        shipped_orders=Count('order_id', filter=Q(order_status='SHIPPED')),
+    )
+
+
+def get_stock_kpis(threshold=LOW_STOCK_THRESHOLD):
+    """
+    Low-stock metrics in one query over ProductVariant:
+      low_stock_variants_count: variants at or below the threshold
+      low_stock_products_count: active products with at least one such variant
+    """
+    # Filtering (rather than Count(filter=...)) lets the partial variant_low_stock_idx
+    # serve the query for the default threshold instead of a full table scan.
+    return ProductVariant.objects.filter(quantity_in_stock__lte=threshold).aggregate(
+        low_stock_variants_count=Count('variant_id'),
+        low_stock_products_count=Count('product', filter=Q(product__is_active=True), distinct=True),
+    )
+
+
+def get_dashboard_kpis(today=None, low_stock_threshold=LOW_STOCK_THRESHOLD):
+    """All numeric dashboard KPIs (order metrics, stock alerts and catalog counts)."""
+    kpis = get_order_kpis(today)
+    kpis.update(get_stock_kpis(low_stock_threshold))
+    kpis['sales_percentage_change'] = percentage_change(kpis['sales_last_30_days'], kpis['sales_prev_30_days'])
+    kpis['paid_sales_percentage_change'] = percentage_change(
+        kpis['paid_sales_last_30_days'], kpis['paid_sales_prev_30_days']
+    )
+    kpis['total_products_count'] = Product.objects.count()
+    kpis['total_categories_count'] = Category.objects.count()
+    return kpis
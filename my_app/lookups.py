@@ -0,0 +1,175 @@
+"""
+Bounded prefix-search lookups used by the autocomplete fields of the order,
+review and inventory forms (pages/lookup_field.html). They replace
+<select> dropdowns that rendered every customer, address, product or variant.
+
+Every lookup compares UPPER(column) with the upper-cased term as a prefix. The
+expression indexes from migration 0012_lookup_indexes serve that comparison:
+  - PostgreSQL: `UPPER(col) LIKE 'TERM%'` on a varchar_pattern_ops index.
+  - SQLite: a range seek `UPPER(col) >= 'TERM' AND UPPER(col) < 'TERM' || U+10FFFF`.
+    The LIKE ... ESCAPE that Django emits can't use an index there.
+Addresses are only searched within one customer (the customer_id FK index).
+Results are capped at MAX_LIMIT rows.
+"""
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Upper
+
+from my_app.models import Address, Customer, Product, ProductVariant
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 25
+
+
+def clamp_limit(value):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _upper_alias(field):
+    return f"{field.replace('__', '_')}_upper"
+
+
+def _with_upper(queryset, *fields):
+    return queryset.alias(**{_upper_alias(field): Upper(field) for field in fields})
+
+
+def _prefix(field, term):
+    """Q for UPPER(field) starting with `term` (already upper-cased); see _with_upper()."""
+    alias = _upper_alias(field)
+    if connection.vendor == 'sqlite':
+        return Q(**{f'{alias}__gte': term, f'{alias}__lt': term + '\U0010ffff'})
+    return Q(**{f'{alias}__startswith': term})
+
+
+def _normalize(term):
+    return ' '.join((term or '').split()).upper()
+
+
+# --- Labels (shared by the JSON results and the forms' pre-selected values) ---
+
+def customer_label(customer):
+    return f"{customer.first_name} {customer.last_name} ({customer.email})"
+
+
+def address_label(address):
+    return f"{address.address_line1}, {address.city} ({address.get_address_type_display()})"
+
+
+def product_label(product):
+    return product.product_name
+
+
+def variant_label(variant):
+    return f"{variant.product.product_name} - {variant.color} / {variant.size} ({variant.sku})"
+
+
+def choice(instance):
+    """{'id', 'label'} for a model instance."""
+    label = {
+        Customer: customer_label,
+        Address: address_label,
+        Product: product_label,
+        ProductVariant: variant_label,
+    }[type(instance)](instance)
+    return {'id': instance.pk, 'label': label}
+
+
+def selection(*instances):
+    """The current value of a lookup field: choices for the instances that aren't None."""
+    return [choice(instance) for instance in instances if instance is not None]
+
+
+def selection_for(model, pks):
+    """
+    selection() for submitted form value(s) `pks` (one value or a list), in the
+    given order; values that aren't an existing primary key are dropped.
+    """
+    if not isinstance(pks, (list, tuple)):
+        pks = [pks]
+    ids = []
+    for pk in pks:
+        try:
+            ids.append(int(pk))
+        except (TypeError, ValueError):
+            continue
+    if not ids:
+        return []
+    queryset = model.objects.select_related('product') if model is ProductVariant else model.objects.all()
+    by_pk = queryset.in_bulk(ids)
+    return [choice(by_pk[pk]) for pk in dict.fromkeys(ids) if pk in by_pk]
+
+
+# --- Lookups ---
+
+def search_customers(term, limit=DEFAULT_LIMIT):
+    """Customers whose email, first name or last name starts with `term` ("first last" also works)."""
+    term = _normalize(term)
+    if not term:
+        return []
+    customers = _with_upper(Customer.objects.all(), 'email', 'first_name', 'last_name')
+    condition = _prefix('email', term) | _prefix('first_name', term) | _prefix('last_name', term)
+    first, _, last = term.partition(' ')
+    if last:
+        condition |= _prefix('first_name', first) & _prefix('last_name', last)
+    customers = customers.filter(condition).order_by('email')[:clamp_limit(limit)]
+    return [
+        {'id': c.pk, 'label': customer_label(c), 'email': c.email}
+        for c in customers.only('customer_id', 'first_name', 'last_name', 'email')
+    ]
+
+
+def search_addresses(customer_id, term='', limit=DEFAULT_LIMIT):
+    """Addresses of one customer, optionally narrowed by a street/city/postal code prefix."""
+    addresses = Address.objects.filter(customer_id=customer_id)
+    term = _normalize(term)
+    if term:
+        addresses = _with_upper(addresses, 'address_line1', 'city', 'postal_code').filter(
+            _prefix('address_line1', term) | _prefix('city', term) | _prefix('postal_code', term)
+        )
+    addresses = addresses.order_by('-is_default', 'address_type', 'address_id')[:clamp_limit(limit)]
+    return [
+        {'id': a.pk, 'label': address_label(a), 'meta': 'Default' if a.is_default else ''}
+        for a in addresses
+    ]
+
+
+def search_products(term, limit=DEFAULT_LIMIT):
+    """Products whose name starts with `term`."""
+    term = _normalize(term)
+    if not term:
+        return []
+    products = _with_upper(Product.objects.all(), 'product_name').filter(_prefix('product_name', term))
+    # Ordered by the indexed expression so the index scan can stop at `limit`
+    products = products.order_by(_upper_alias('product_name'), 'product_id')[:clamp_limit(limit)]
+    return [
+        {'id': p.pk, 'label': product_label(p), 'meta': f'${p.price}' + ('' if p.is_active else ' · inactive')}
+        for p in products.only('product_id', 'product_name', 'price', 'is_active')
+    ]
+
+
+def search_variants(term, limit=DEFAULT_LIMIT):
+    """Variants whose SKU or product name starts with `term`."""
+    term = _normalize(term)
+    if not term:
+        return []
+    matching_products = _with_upper(Product.objects.all(), 'product_name').filter(
+        _prefix('product_name', term)
+    ).values('product_id')
+    variants = _with_upper(ProductVariant.objects.select_related('product'), 'sku').filter(
+        _prefix('sku', term) | Q(product_id__in=matching_products)
+    ).order_by('sku')[:clamp_limit(limit)]
+    return [
+        {
+            'id': v.pk,
+            'label': variant_label(v),
+            'meta': f'{v.quantity_in_stock} in stock · ${v.product.price}',
+            'sku': v.sku,
+            'price': str(v.product.price),
+            'quantity_in_stock': v.quantity_in_stock,
+        }
+        for v in variants
+    ]
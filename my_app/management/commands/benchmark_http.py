@@ -0,0 +1,83 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from my_app import benchmarks, fake_shop
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks every page of my_app_urls.py at one or more data scales and writes a JSON "
+        "report (latency percentiles, queries per request, peak memory); see my_app/benchmarks.py. "
+        "Runs against a separate test database; fails when a page exceeds its budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default=','.join(benchmarks.DEFAULT_SCALES),
+                            help=f"Comma-separated fake_shop scales ({', '.join(fake_shop.SCALES)}).")
+        parser.add_argument('--requests', type=int, default=benchmarks.DEFAULT_REQUESTS,
+                            help='Timed requests per route.')
+        parser.add_argument('--threads', type=int, default=benchmarks.DEFAULT_THREADS,
+                            help='Concurrent clients per route.')
+        parser.add_argument('--warmup', type=int, default=benchmarks.DEFAULT_WARMUP,
+                            help='Untimed requests per client before measuring.')
+        parser.add_argument('--seed', type=int, default=benchmarks.DEFAULT_SEED)
+        parser.add_argument('--route', action='append', dest='routes', help='Only benchmark this URL name (repeatable).')
+        parser.add_argument('--output', '-o', default='benchmark-report.json', help='JSON report path.')
+        parser.add_argument('--baseline', help='Previous report to compare with.')
+        parser.add_argument('--no-budgets', action='store_true', help='Report budget violations without failing.')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the benchmark database afterwards.')
+
+    def handle(self, *args, **options):
+        scales = [scale.strip() for scale in options['scales'].split(',') if scale.strip()]
+        unknown = [scale for scale in scales if scale not in fake_shop.SCALES]
+        if unknown or not scales:
+            raise CommandError(f"Unknown scale(s): {', '.join(unknown) or '(none)'}")
+        if options['requests'] < 1:
+            raise CommandError('--requests must be positive.')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as stream:
+                    baseline = json.load(stream)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Can't read the baseline: {e}")
+
+        # A scratch database, as the test runner does. SQLite's default in-memory
+        # test database can't be shared by the client threads, so use a file.
+        if connection.vendor == 'sqlite' and not connection.settings_dict['TEST'].get('NAME'):
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'fashion_shop_benchmark.sqlite3')
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            report = benchmarks.run(
+                scales=scales,
+                requests=options['requests'],
+                threads=options['threads'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+                only=options['routes'],
+                log=self.stdout.write,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        failures = benchmarks.check_budgets(report)
+        report['budget_failures'] = failures
+        report['errors'] = benchmarks.errors(report)
+        benchmarks.write_report(report, options['output'])
+        self.stdout.write(f"Report written to {options['output']}")
+
+        if baseline is not None:
+            changes = benchmarks.compare(baseline, report)
+            self.stdout.write('\n'.join(changes) if changes else 'No significant change against the baseline.')
+        for error in report['errors']:
+            self.stderr.write(self.style.WARNING(error))
+        for failure in failures:
+            self.stderr.write(failure)
+        if failures and not options['no_budgets']:
+            raise CommandError(f'{len(failures)} budget violation(s).')
+        self.stdout.write(self.style.SUCCESS('All pages within budget.'))
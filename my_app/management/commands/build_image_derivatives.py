@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from my_app import image_derivatives
+from my_app.models import ProductImage
+
+
+class Command(BaseCommand):
+    help = "Generates the thumbnail/WebP copies of product images that don't have them yet (or all with --all)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate the copies of every product image.')
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            images = images.exclude(derivatives_status='READY')
+        counts = {}
+        for image_id in images.order_by('pk').values_list('pk', flat=True).iterator():
+            status = image_derivatives.build(image_id)
+            counts[status] = counts.get(status, 0) + 1
+        summary = ', '.join(f'{count} {status.lower()}' for status, count in sorted(counts.items()) if status)
+        self.stdout.write(self.style.SUCCESS(f'Product images processed: {summary or "none"}.'))
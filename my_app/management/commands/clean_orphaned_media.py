@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from my_app import media_gc
+
+
+class Command(BaseCommand):
+    help = ("Deletes (or quarantines) files under MEDIA_ROOT that no ProductImage, Member or Customer refers to, "
+            "including the thumbnails of deleted product images.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only list the files that would be removed.')
+        parser.add_argument('--quarantine', action='store_true',
+                            help='Move the files under settings.MEDIA_QUARANTINE_DIR instead of deleting them.')
+        parser.add_argument('--grace', type=int, default=None,
+                            help='Skip files modified in the last N seconds (default: settings.MEDIA_BLOB_PURGE_GRACE).')
+        parser.add_argument('--batch-size', type=int, default=media_gc.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        files, reclaimed = media_gc.collect(
+            dry_run=options['dry_run'], quarantine=options['quarantine'], grace=options['grace'],
+            batch_size=options['batch_size'], stdout=self.stdout,
+        )
+        if options['dry_run']:
+            verb = 'Would remove'
+        else:
+            verb = 'Quarantined' if options['quarantine'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {files} orphaned file(s), {reclaimed / 1024 / 1024:.1f} MiB.'))
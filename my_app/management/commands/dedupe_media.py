@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from my_app import media_blobs
+
+
+class Command(BaseCommand):
+    help = ("Moves images uploaded before the content-addressed storage into it (identical files become one blob) "
+            "and recounts the references of every blob.")
+
+    def handle(self, *args, **options):
+        moved, missing = media_blobs.adopt_legacy_files(stdout=self.stdout)
+        in_use = media_blobs.recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} file(s) into blobs ({missing} missing); {in_use} blob(s) in use.'
+        ))
@@ -0,0 +1,57 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from my_app import exports
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams an export (orders, products, inventory, customers, reviews) to a CSV "
+        "file or stdout without loading the rows into memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--output', '-o', default='-', help='Output file ("-" for stdout).')
+        parser.add_argument('--from', dest='date_from', help='First day to include (YYYY-MM-DD).')
+        parser.add_argument('--to', dest='date_to', help='Last day to include (YYYY-MM-DD).')
+        parser.add_argument('--status', help='Status filter, e.g. delivered, payment_paid, active, low, approved.')
+        parser.add_argument('--gzip', action='store_true', help='gzip-compress the output.')
+        parser.add_argument('--chunk-size', type=int, default=exports.DEFAULT_CHUNK_SIZE,
+                            help='Rows fetched from the database per round trip.')
+
+    def handle(self, *args, **options):
+        try:
+            export_def = exports.get_export(options['name'])
+            queryset = export_def.queryset(
+                date_from=exports.parse_filter_date(options['date_from'], '--from'),
+                date_to=exports.parse_filter_date(options['date_to'], '--to'),
+                status=(options['status'] or '').lower() or None,
+            )
+        except exports.ExportError as e:
+            raise CommandError(str(e))
+
+        chunks = exports.iter_bytes(
+            exports.iter_csv(export_def, queryset, chunk_size=options['chunk_size']),
+            compress=options['gzip'],
+        )
+        try:
+            if options['output'] == '-':
+                written = self._write(sys.stdout.buffer, chunks)
+            else:
+                with open(options['output'], 'wb') as output:
+                    written = self._write(output, chunks)
+        except OSError as e:
+            raise CommandError(str(e))
+
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} byte(s) to {options['output']}."))
+
+    def _write(self, output, chunks):
+        written = 0
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+        output.flush()
+        return written
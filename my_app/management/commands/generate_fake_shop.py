@@ -0,0 +1,66 @@
+from datetime import date
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from my_app import fake_shop
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills every shop table with deterministic synthetic data (Zipfian popularity, seasonal "
+        "order dates) for benchmarking; see my_app/fake_shop.py. Refuses to run on a non-empty "
+        "database unless --flush is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(fake_shop.SCALES), default='small',
+                            help='Preset for --products/--customers/--orders '
+                                 '(large = 50k products, 200k customers, 1M orders).')
+        parser.add_argument('--products', type=int, help='Overrides the preset.')
+        parser.add_argument('--customers', type=int, help='Overrides the preset.')
+        parser.add_argument('--orders', type=int, help='Overrides the preset.')
+        parser.add_argument('--variants-per-product', type=float, default=fake_shop.DEFAULT_VARIANTS_PER_PRODUCT,
+                            help='Average variants (color x size) per product.')
+        parser.add_argument('--items-per-order', type=float, default=fake_shop.DEFAULT_ITEMS_PER_ORDER,
+                            help='Average order lines per order.')
+        parser.add_argument('--days', type=int, default=fake_shop.DEFAULT_DAYS, help='Days of order history.')
+        parser.add_argument('--end-date', type=date.fromisoformat,
+                            help='Last day of the order history, YYYY-MM-DD (default: today).')
+        parser.add_argument('--seed', type=int, default=fake_shop.DEFAULT_SEED)
+        parser.add_argument('--batch-size', type=int, default=fake_shop.DEFAULT_BATCH_SIZE,
+                            help='Rows per bulk_create transaction.')
+        parser.add_argument('--flush', action='store_true', help='Empty the shop tables first.')
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            fake_shop.flush()
+        else:
+            non_empty = fake_shop.existing_rows()
+            if non_empty:
+                raise CommandError(
+                    f"{', '.join(model.__name__ for model in non_empty)} already contain rows; "
+                    "use --flush to replace them."
+                )
+
+        scale = dict(fake_shop.SCALES[options['scale']])
+        for name in ('products', 'customers', 'orders'):
+            if options[name] is not None:
+                scale[name] = options[name]
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        started = time.perf_counter()
+        counts = fake_shop.generate(
+            **scale,
+            variants_per_product=options['variants_per_product'],
+            items_per_order=options['items_per_order'],
+            days=options['days'],
+            end_date=options['end_date'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        for model, count in counts.items():
+            self.stdout.write(f'{model}: {count:,}')
+        self.stdout.write(self.style.SUCCESS(f'Generated the shop in {time.perf_counter() - started:.1f}s.'))
@@ -0,0 +1,52 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from my_app import catalog_import
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports products and variants from a CSV catalog, streaming the file and "
+        "writing in batched transactions (see my_app/catalog_import.py for the columns)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import ("-" for stdin).')
+        parser.add_argument('--chunk-size', type=int, default=catalog_import.DEFAULT_CHUNK_SIZE,
+                            help='Rows written per transaction.')
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--no-create-missing', action='store_true',
+                            help='Reject rows with unknown brand/category names instead of creating them.')
+
+    def handle(self, *args, **options):
+        def progress(result):
+            self.stdout.write(
+                f"{result.rows} row(s): {result.products_created} product(s) created, "
+                f"{result.products_updated} updated, {result.variants_created} variant(s) created, "
+                f"{result.variants_updated} updated, {result.error_count} error(s)"
+            )
+
+        def error(line, message):
+            self.stderr.write(f'line {line}: {message}')
+
+        try:
+            if options['path'] == '-':
+                result = self._import(sys.stdin, options, progress, error)
+            else:
+                with open(options['path'], newline='', encoding=options['encoding']) as stream:
+                    result = self._import(stream, options, progress, error)
+        except (OSError, catalog_import.CatalogRowError) as e:
+            raise CommandError(str(e))
+
+        style = self.style.SUCCESS if not result.error_count else self.style.WARNING
+        self.stdout.write(style(f'Imported {result.rows - result.rejected_rows} of {result.rows} row(s).'))
+
+    def _import(self, stream, options, progress, error):
+        return catalog_import.import_catalog(
+            stream,
+            chunk_size=options['chunk_size'],
+            create_missing=not options['no_create_missing'],
+            on_progress=progress,
+            on_error=error,
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from my_app import media_blobs
+
+
+class Command(BaseCommand):
+    help = "Deletes media blobs (and their thumbnails) that no image field has referenced for the grace period."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=None,
+                            help='Seconds a blob must have been unreferenced (default: settings.MEDIA_BLOB_PURGE_GRACE).')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted.')
+
+    def handle(self, *args, **options):
+        deleted, reclaimed = media_blobs.purge_unreferenced(grace=options['grace'], dry_run=options['dry_run'],
+                                                            stdout=self.stdout)
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {deleted} blob(s), {reclaimed} byte(s).'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from my_app import customer_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the CustomerStats summaries from the full Order history."
+
+    def handle(self, *args, **options):
+        written = customer_stats.rebuild(stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} customer stats row(s).'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from my_app import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the DailySalesRollup table from the full Order history, in chunks of days."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-days', type=int, default=31, help='Days recomputed per transaction.')
+
+    def handle(self, *args, **options):
+        written = rollups.rebuild(chunk_days=options['chunk_days'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} daily rollup row(s).'))
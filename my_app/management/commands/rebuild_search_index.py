@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from my_app import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the product full-text search index (PostgreSQL tsvector table or SQLite FTS5). "
+        "Run after bulk imports that bypass model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Products re-indexed per statement.')
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(self.style.WARNING('This database backend has no search index; nothing to do.'))
+            return
+        total = search.rebuild_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Re-indexed {total} product(s).'))
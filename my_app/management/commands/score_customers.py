@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from my_app import rfm
+
+
+class Command(BaseCommand):
+    help = "Recomputes RFM scores, segments and lifetime-value estimates of all customers (requires NumPy)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=rfm.DEFAULT_CHUNK_SIZE,
+                            help='Orders loaded per query.')
+
+    def handle(self, *args, **options):
+        try:
+            scored = rfm.score_customers(chunk_size=options['chunk_size'], stdout=self.stdout)
+        except rfm.NumPyUnavailable as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Scored {scored} customer(s).'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from my_app import preferences
+
+
+class Command(BaseCommand):
+    help = ("Recomputes customer preference profiles from purchase history: customers with new orders "
+            "(run nightly), or everyone with --full.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every customer with orders.')
+        parser.add_argument('--chunk-size', type=int, default=preferences.DEFAULT_CHUNK_SIZE,
+                            help='Customers computed per query/transaction.')
+
+    def handle(self, *args, **options):
+        written = preferences.update(full=options['full'], chunk_size=options['chunk_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Updated {written} preference profile(s).'))
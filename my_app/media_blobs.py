@@ -0,0 +1,213 @@
+"""
+Reference counts of the content-addressed media blobs (my_app/storage.py).
+
+Every file stored under blobs/ has a MediaBlob row (written by the storage
+when the bytes are saved) whose `ref_count` is the number of image fields in
+MEDIA_FIELDS holding its name. The signal handlers below (connected in
+my_app/signals.py) keep the count with F() updates as rows are created,
+pointed at another file, cleared or deleted: the previous names are
+snapshotted at load time, as my_app/customer_stats.py does for orders.
+Queryset update()/bulk operations bypass them; `manage.py dedupe_media`
+recounts from the rows.
+
+Releasing the last reference doesn't delete the file at once: an upload of
+the same bytes may be between saving the file and saving its row.
+`manage.py purge_media_blobs` deletes blobs (and their thumbnails) that have
+had no references and no upload for settings.MEDIA_BLOB_PURGE_GRACE seconds.
+"""
+import datetime
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage, storages
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from my_app import image_derivatives
+from my_app.models import Customer, MediaBlob, Member, ProductImage
+from my_app.storage import BLOB_DIR, ContentAddressedStorage, is_blob_name
+
+# Model -> its image fields stored in the content-addressed storage
+MEDIA_FIELDS = {
+    ProductImage: ('image',),
+    Member: ('profile_picture',),
+    Customer: ('profile_picture',),
+}
+
+DEFAULT_PURGE_GRACE = 60 * 60
+PURGE_BATCH_SIZE = 500
+
+SNAPSHOT_ATTR = '_media_blob_names'
+
+
+def register(name, digest, size):
+    """Records that the bytes of blob `name` were (re)uploaded just now (called by the storage)."""
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=name, digest=digest, size=size, last_saved=timezone.now())],
+        update_conflicts=True, unique_fields=['name'], update_fields=['last_saved'],
+    )
+
+
+def _add_reference(name, delta):
+    if is_blob_name(name):
+        MediaBlob.objects.filter(pk=name).update(ref_count=F('ref_count') + delta)
+
+
+def change_reference(old_name, new_name):
+    """Moves one reference from `old_name` to `new_name` (either may be None)."""
+    if old_name == new_name:
+        return
+    with transaction.atomic():
+        if old_name:
+            _add_reference(old_name, -1)
+        if new_name:
+            _add_reference(new_name, 1)
+
+
+# --- Signal handlers (connected in my_app/signals.py) ---
+
+def _names(instance):
+    """{field: stored name or None} of the instance's loaded (not deferred) image fields."""
+    values = instance.__dict__
+    return {
+        field: getattr(values[field], 'name', values[field]) or None
+        for field in MEDIA_FIELDS[type(instance)] if field in values
+    }
+
+
+def remember_names(sender, instance, **kwargs):
+    setattr(instance, SNAPSHOT_ATTR, _names(instance) if instance.pk else {})
+
+
+def capture_previous_names(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk or instance._state.adding:
+        return
+    names = getattr(instance, SNAPSHOT_ATTR, {})
+    missing = [field for field in MEDIA_FIELDS[sender] if field not in names]
+    if missing:  # deferred when the instance was loaded (pre_save and pre_delete)
+        previous = sender.objects.filter(pk=instance.pk).values(*missing).first() or {}
+        names.update({field: previous.get(field) or None for field in missing})
+        setattr(instance, SNAPSHOT_ATTR, names)
+
+
+def files_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = {} if created else getattr(instance, SNAPSHOT_ATTR, {})
+    current = _names(instance)
+    for field, name in current.items():
+        change_reference(previous.get(field), name)
+    setattr(instance, SNAPSHOT_ATTR, {**previous, **current})
+
+
+def files_deleted(sender, instance, **kwargs):
+    names = {**getattr(instance, SNAPSHOT_ATTR, {}), **_names(instance)}
+    for name in names.values():
+        change_reference(name, None)
+
+
+# --- Recounting / importing / purging ---
+
+def referenced_names():
+    """Counter of stored names over every image field in MEDIA_FIELDS (one values_list pass per field)."""
+    counts = Counter()
+    for model, fields in MEDIA_FIELDS.items():
+        for field in fields:
+            names = model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            counts.update(names.order_by().values_list(field, flat=True).iterator(chunk_size=2000))
+    return counts
+
+
+def recount():
+    """Resets every MediaBlob.ref_count from the rows. Returns the number of blobs in use."""
+    by_count = defaultdict(list)
+    for name, count in referenced_names().items():
+        if is_blob_name(name):
+            by_count[count].append(name)
+    with transaction.atomic():
+        MediaBlob.objects.exclude(ref_count=0).update(ref_count=0)
+        for count, names in by_count.items():
+            for start in range(0, len(names), PURGE_BATCH_SIZE):
+                MediaBlob.objects.filter(pk__in=names[start:start + PURGE_BATCH_SIZE]).update(ref_count=count)
+    return sum(len(names) for names in by_count.values())
+
+
+def adopt_legacy_files(stdout=None):
+    """
+    Moves files saved before the content-addressed storage (outside blobs/) into
+    it, points their rows at the blob and deletes the old copy (and its product
+    thumbnails, which are rebuilt). Duplicates collapse into one blob. Returns
+    (files moved, files missing from storage).
+    """
+    storage = storages['default']
+    if not isinstance(storage, ContentAddressedStorage):
+        raise ImproperlyConfigured('The default storage is not my_app.storage.ContentAddressedStorage.')
+    moved = missing = 0
+    rebuild = []
+    for model, fields in MEDIA_FIELDS.items():
+        for field in fields:
+            legacy = (
+                model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+                .exclude(**{f'{field}__startswith': BLOB_DIR + '/'})
+                .order_by().values_list(field, flat=True).distinct()
+            )
+            for old_name in list(legacy):
+                if not storage.exists(old_name):
+                    missing += 1
+                    if stdout is not None:
+                        stdout.write(f'Missing: {old_name}')
+                    continue
+                with storage.open(old_name, 'rb') as f:
+                    new_name = storage.save(old_name, f)
+                changes = {field: new_name}
+                if model is ProductImage:
+                    changes['derivatives_status'] = 'PENDING'
+                    rebuild += model.objects.filter(**{field: old_name}).values_list('pk', flat=True)
+                model.objects.filter(**{field: old_name}).update(**changes)
+                storage.delete(old_name)
+                image_derivatives.delete_derivatives(storage, old_name)
+                moved += 1
+                if stdout is not None:
+                    stdout.write(f'{old_name} -> {new_name}')
+    for image_id in rebuild:
+        image_derivatives.build(image_id)
+    return moved, missing
+
+
+def purge_grace():
+    return getattr(settings, 'MEDIA_BLOB_PURGE_GRACE', DEFAULT_PURGE_GRACE)
+
+
+def purge_unreferenced(grace=None, dry_run=False, stdout=None):
+    """
+    Deletes blobs without references whose bytes weren't uploaded in the last
+    `grace` seconds, with their thumbnails. Returns (blobs, bytes) deleted (or,
+    with `dry_run`, that would be).
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=purge_grace() if grace is None else grace)
+    candidates = MediaBlob.objects.filter(ref_count__lte=0, last_saved__lt=cutoff).order_by('pk')
+    deleted = reclaimed = 0
+    last_name = ''
+    while True:
+        batch = list(candidates.filter(pk__gt=last_name).values_list('pk', 'size')[:PURGE_BATCH_SIZE])
+        if not batch:
+            break
+        last_name = batch[-1][0]
+        for name, size in batch:
+            if not dry_run:
+                # Re-checked per row under a row lock held until the file is gone: it may have been
+                # referenced or re-uploaded since the batch was read, and register() waits for the
+                # lock, so a concurrent upload of the same bytes rewrites the file after we delete it.
+                with transaction.atomic():
+                    if not candidates.select_for_update().filter(pk=name).values_list('pk', flat=True):
+                        continue
+                    default_storage.delete(name)
+                    image_derivatives.delete_derivatives(default_storage, name)
+                    MediaBlob.objects.filter(pk=name).delete()
+            deleted += 1
+            reclaimed += size
+        if stdout is not None:
+            stdout.write(f'{deleted} blob(s), {reclaimed} byte(s)')
+    return deleted, reclaimed
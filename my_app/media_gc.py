@@ -0,0 +1,162 @@
+"""
+Garbage collection of media files no row refers to (`manage.py clean_orphaned_media`).
+
+Deleting a ProductImage, Member or Customer (or replacing its picture) leaves
+the file in MEDIA_ROOT: blobs are only freed by purge_media_blobs once their
+reference count reaches zero, and files uploaded before the content-addressed
+storage (my_app/storage.py), or behind a count that drifted, are never freed.
+This walks the media tree instead and compares it with the database:
+
+  - referenced: every name in ProductImage.image, Member.profile_picture and
+    Customer.profile_picture (media_blobs.referenced_names(), one values_list
+    iteration per field), plus the thumbnail/WebP derivative names of each;
+  - candidates: every file under MEDIA_ROOT, streamed with os.scandir (no
+    full listing is held in memory), skipping files modified in the last
+    settings.MEDIA_BLOB_PURGE_GRACE seconds, which may belong to an upload
+    whose row isn't saved yet.
+
+Orphans are deleted, or moved under settings.MEDIA_QUARANTINE_DIR keeping their
+relative path, in batches; the MediaBlob rows of deleted blobs go with them.
+The referenced set is read once, before a walk that can take a long time on a
+large tree, so every batch is re-checked against the database just before it
+is removed (still_referenced()): files a row started using in the meantime,
+and blobs re-uploaded or counted as referenced since, are kept.
+"""
+import datetime
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from my_app import media_blobs
+from my_app.models import IMAGE_DERIVATIVE_FORMATS, IMAGE_DERIVATIVE_SIZES, MediaBlob, derivative_name
+from my_app.storage import blob_digest, is_blob_name
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def quarantine_dir():
+    return getattr(settings, 'MEDIA_QUARANTINE_DIR', os.path.join(settings.BASE_DIR, 'media_quarantine'))
+
+
+def _with_derivatives(names):
+    paths = set()
+    for name in names:
+        paths.add(name)
+        for size in IMAGE_DERIVATIVE_SIZES:
+            for fmt in IMAGE_DERIVATIVE_FORMATS:
+                paths.add(derivative_name(name, size, fmt))
+    return paths
+
+
+def referenced_paths():
+    """Set of media-relative names in use: the stored images and their derivatives."""
+    return _with_derivatives(media_blobs.referenced_names())
+
+
+def still_referenced(names, grace):
+    """
+    The subset of `names` in use right now: stored in an image field (or a
+    derivative of such a file), or belonging to a blob whose MediaBlob row
+    counts references or was uploaded within the last `grace` seconds.
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=grace)
+    digests = {blob_digest(name) for name in names if is_blob_name(name)}
+    originals = set(names)
+    live_digests = set()
+    if digests:
+        for name, digest, ref_count, last_saved in MediaBlob.objects.filter(digest__in=digests).values_list(
+                'name', 'digest', 'ref_count', 'last_saved'):
+            originals.add(name)  # a derivative's original
+            if ref_count > 0 or last_saved >= cutoff:
+                live_digests.add(digest)
+    in_use = set()
+    for model, fields in media_blobs.MEDIA_FIELDS.items():
+        for field in fields:
+            in_use.update(model.objects.filter(**{f'{field}__in': originals}).values_list(field, flat=True))
+    in_use = _with_derivatives(in_use)
+    return {
+        name for name in names
+        if name in in_use or (is_blob_name(name) and blob_digest(name) in live_digests)
+    }
+
+
+def scan(root):
+    """Yields (media-relative name, bytes, mtime) of every file under `root`, depth first."""
+    pending = [root]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    name = os.path.relpath(entry.path, root).replace(os.sep, '/')
+                    yield name, stat.st_size, stat.st_mtime
+
+
+def orphans(root, referenced, grace):
+    cutoff = time.time() - grace
+    for name, size, mtime in scan(root):
+        if name not in referenced and mtime < cutoff:
+            yield name, size
+
+
+def _remove(root, names, quarantine_root):
+    for name in names:
+        path = os.path.join(root, *name.split('/'))
+        if quarantine_root is None:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        else:
+            target = os.path.join(quarantine_root, *name.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)
+    blobs = [name for name in names if is_blob_name(name)]
+    if blobs:
+        MediaBlob.objects.filter(pk__in=blobs).delete()
+
+
+def collect(dry_run=False, quarantine=False, grace=None, batch_size=DEFAULT_BATCH_SIZE, stdout=None):
+    """
+    Deletes (or quarantines) unreferenced media files in batches of `batch_size`.
+    Returns (files, bytes) removed, or with `dry_run` that would be.
+    """
+    root = settings.MEDIA_ROOT
+    if not os.path.isdir(root):
+        return 0, 0
+    grace = media_blobs.purge_grace() if grace is None else grace
+    quarantine_root = None
+    if quarantine and not dry_run:
+        quarantine_root = os.path.join(quarantine_dir(), timezone.now().strftime('%Y%m%d-%H%M%S'))
+
+    referenced = referenced_paths()
+    files = reclaimed = 0
+    batch = []
+
+    def flush():
+        nonlocal files, reclaimed
+        kept = still_referenced([name for name, _size in batch], grace)
+        removable = [(name, size) for name, size in batch if name not in kept]
+        for name, size in removable:
+            if stdout is not None and dry_run:
+                stdout.write(f'  {name} ({size} bytes)')
+            files += 1
+            reclaimed += size
+        if not dry_run:
+            _remove(root, [name for name, _size in removable], quarantine_root)
+        if stdout is not None:
+            stdout.write(f'{files} file(s), {reclaimed} byte(s)')
+        batch.clear()
+
+    for name, size in orphans(root, referenced, grace):
+        batch.append((name, size))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return files, reclaimed
@@ -0,0 +1,146 @@
+"""
+Serving of uploaded media (MEDIA_URL) for my_app/templates/Views/media_views.py.
+
+settings.MEDIA_SERVE_MODE picks who sends the bytes:
+  - 'django' (default): the worker streams the file (FileResponse), honouring
+    a single `Range: bytes=...` request with a 206 partial response;
+  - 'x-accel-redirect': nginx. The response carries only headers and
+    `X-Accel-Redirect: <MEDIA_ACCEL_REDIRECT_PREFIX><name>`, which must be an
+    `internal` location aliased to MEDIA_ROOT; nginx sends the file (and
+    handles ranges) without holding a worker;
+  - 'x-sendfile': Apache mod_xsendfile / lighttpd, `X-Sendfile: <absolute path>`.
+
+In every mode Django answers conditional requests itself: ETag (from size and
+modification time) and Last-Modified are set, and If-None-Match /
+If-Modified-Since get a 304 before anything is opened. Content-addressed
+originals (my_app/storage.py) never change, so they are cacheable for
+MEDIA_BLOB_CACHE_MAX_AGE and marked immutable; everything else (thumbnails,
+files from before the blob storage) for MEDIA_CACHE_MAX_AGE.
+"""
+import mimetypes
+import os
+import re
+import stat as stat_module
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+from my_app.storage import is_blob_original
+
+SERVE_MODES = ('django', 'x-accel-redirect', 'x-sendfile')
+DEFAULT_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+DEFAULT_CACHE_MAX_AGE = 24 * 60 * 60
+DEFAULT_BLOB_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+STREAM_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def serve_mode():
+    mode = getattr(settings, 'MEDIA_SERVE_MODE', 'django')
+    if mode not in SERVE_MODES:
+        raise ValueError(f'MEDIA_SERVE_MODE must be one of {", ".join(SERVE_MODES)}, not {mode!r}.')
+    return mode
+
+
+def content_type(path):
+    guessed, _encoding = mimetypes.guess_type(path)
+    return guessed or 'application/octet-stream'
+
+
+def etag(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def cache_control(name):
+    if is_blob_original(name):
+        max_age = getattr(settings, 'MEDIA_BLOB_CACHE_MAX_AGE', DEFAULT_BLOB_CACHE_MAX_AGE)
+        return f'public, max-age={max_age}, immutable'
+    return f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', DEFAULT_CACHE_MAX_AGE)}"
+
+
+def offload_header(name, path):
+    """(header, value) handing the file to the front-end server, or None in 'django' mode."""
+    mode = serve_mode()
+    if mode == 'x-accel-redirect':
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', DEFAULT_ACCEL_REDIRECT_PREFIX)
+        return 'X-Accel-Redirect', prefix.rstrip('/') + '/' + quote(name)
+    if mode == 'x-sendfile':
+        return 'X-Sendfile', path
+    return None
+
+
+# --- Byte ranges ---
+
+def if_range_matches(request, stat):
+    """False when an If-Range validator says the client's partial copy is stale (send the whole file)."""
+    validator = request.headers.get('If-Range')
+    if not validator:
+        return True
+    if validator.startswith('"'):
+        return validator == etag(stat)
+    since = parse_http_date_safe(validator)
+    return since is not None and int(stat.st_mtime) <= since
+
+
+def requested_range(header, size):
+    """
+    (start, end) inclusive of a single-range `Range` header, None to send the
+    whole file (no header, several ranges, or syntax we ignore), or False if
+    the range lies outside the file (416).
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:  # suffix: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return False
+    return start, end
+
+
+def read_range(path, start, end):
+    """Yields bytes start..end (inclusive) of the file in STREAM_CHUNK_SIZE chunks."""
+    remaining = end - start + 1
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+def validator_headers(name, stat):
+    return {
+        'ETag': etag(stat),
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': cache_control(name),
+        'Accept-Ranges': 'bytes',
+    }
+
+
+def resolve(root, name):
+    """Absolute path and stat of media file `name`, or None if it isn't a servable file."""
+    if any(part.startswith('.') for part in name.split('/')):  # in-progress uploads, hidden files, '..'
+        return None
+    try:
+        path = safe_join(root, name)
+        stat = os.stat(path)
+    except (SuspiciousFileOperation, FileNotFoundError, NotADirectoryError):
+        return None
+    if not stat_module.S_ISREG(stat.st_mode):
+        return None
+    return path, stat
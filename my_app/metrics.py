@@ -0,0 +1,233 @@
+"""
+Per-view request metrics: SQL query count, time spent in the database, template
+render time, response size and total duration, keyed by the resolved URL name
+(`product_index`, `order_edit`, ...).
+
+RequestMetricsMiddleware (my_app/middleware.py) collects the numbers for each
+request:
+  - queries/DB time through a `connection.execute_wrapper()` installed on every
+    database alias for the duration of the request (works with DEBUG = False);
+  - template render time through the DjangoTemplates backend below, which
+    times the top-level render of each template (includes/extends run inside it,
+    so they are not counted twice; queries run by lazy querysets while rendering
+    count as both DB and render time).
+The values are aggregated into in-memory Prometheus-style histograms and served
+in the Prometheus text format by the `/metrics` view. Each worker process keeps
+its own histograms, so scrape every worker (or run a single one) to see them all.
+
+Query budgets: settings.QUERY_BUDGETS maps a URL name to the maximum number of
+queries the view may run (QUERY_BUDGET_DEFAULT applies to views not listed;
+None disables the check). A request over budget increments
+`fashion_shop_query_budget_exceeded_total` and logs a warning, or raises
+QueryBudgetExceeded when settings.QUERY_BUDGET_RAISE is set (tests of budgeted
+views set it with override_settings), so a view that regresses into N+1
+queries fails its tests.
+
+/metrics is served to staff users, to scrapers sending the bearer token
+settings.METRICS_TOKEN, and to settings.METRICS_ALLOWED_IPS (none by default:
+behind a reverse proxy every request appears to come from 127.0.0.1).
+"""
+import bisect
+import contextvars
+import hmac
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'fashion_shop'
+UNRESOLVED = 'unresolved'  # label for requests that matched no URL pattern (404s)
+
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+DEFAULT_ALLOWED_IPS = ()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per view label (callers hold _lock)."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = f'{PREFIX}_{name}'
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}  # view -> [per-bucket counts (last one is +Inf), sum]
+
+    def observe(self, view, value):
+        series = self._series.get(view)
+        if series is None:
+            series = self._series[view] = [[0] * (len(self.buckets) + 1), 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def reset(self):
+        self._series.clear()
+
+    def lines(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} histogram'
+        for view, (counts, total) in sorted(self._series.items()):
+            label = f'view="{_escape(view)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f'{self.name}_bucket{{{label},le="{_number(bound)}"}} {cumulative}'
+            cumulative += counts[-1]
+            yield f'{self.name}_bucket{{{label},le="+Inf"}} {cumulative}'
+            yield f'{self.name}_sum{{{label}}} {_number(total)}'
+            yield f'{self.name}_count{{{label}}} {cumulative}'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+QUERIES = Histogram('request_queries', 'SQL queries run per request.', QUERY_BUCKETS)
+DB_SECONDS = Histogram('request_db_seconds', 'Time spent executing SQL per request.', SECONDS_BUCKETS)
+TEMPLATE_SECONDS = Histogram('request_template_seconds', 'Template render time per request.', SECONDS_BUCKETS)
+RESPONSE_BYTES = Histogram('response_size_bytes', 'Response body size (non-streaming responses).', BYTES_BUCKETS)
+DURATION_SECONDS = Histogram('request_duration_seconds', 'Total request handling time.', SECONDS_BUCKETS)
+HISTOGRAMS = (QUERIES, DB_SECONDS, TEMPLATE_SECONDS, RESPONSE_BYTES, DURATION_SECONDS)
+
+_budget_exceeded = {}  # view -> count
+_lock = threading.Lock()
+
+
+# --- Per-request collection ---
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def start():
+    """Begins collecting for the current request; pass the result to stop()."""
+    return _current.set(RequestMetrics())
+
+
+def stop(token):
+    request_metrics = _current.get()
+    _current.reset(token)
+    return request_metrics
+
+
+def count_query(execute, sql, params, many, context):
+    """connection.execute_wrapper() hook: counts and times every query of the request."""
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.queries += 1
+        request_metrics.db_seconds += time.perf_counter() - started
+
+
+class _TimedTemplate:
+    """Wraps a backend template to add its render time to the current request."""
+
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        request_metrics = _current.get()
+        if request_metrics is None:
+            return self._template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            request_metrics.template_seconds += time.perf_counter() - started
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The standard Django template backend, with render timing for the request metrics."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+# --- Aggregation ---
+
+def record(view, request_metrics, duration, response_size=None):
+    with _lock:
+        QUERIES.observe(view, request_metrics.queries)
+        DB_SECONDS.observe(view, request_metrics.db_seconds)
+        TEMPLATE_SECONDS.observe(view, request_metrics.template_seconds)
+        DURATION_SECONDS.observe(view, duration)
+        if response_size is not None:
+            RESPONSE_BYTES.observe(view, response_size)
+
+
+def query_budget(view):
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    if view in budgets:
+        return budgets[view]
+    return getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+
+
+def check_budget(view, queries):
+    budget = query_budget(view)
+    if budget is None or queries <= budget:
+        return
+    with _lock:
+        _budget_exceeded[view] = _budget_exceeded.get(view, 0) + 1
+    message = f'{view} ran {queries} SQL queries (budget {budget})'
+    if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def reset():
+    with _lock:
+        for histogram in HISTOGRAMS:
+            histogram.reset()
+        _budget_exceeded.clear()
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        lines = [line for histogram in HISTOGRAMS for line in histogram.lines()]
+        name = f'{PREFIX}_query_budget_exceeded_total'
+        lines.append(f'# HELP {name} Requests that ran more SQL queries than their view budget.')
+        lines.append(f'# TYPE {name} counter')
+        lines.extend(
+            f'{name}{{view="{_escape(view)}"}} {count}' for view, count in sorted(_budget_exceeded.items())
+        )
+    return '\n'.join(lines) + '\n'
+
+
+def can_scrape(request):
+    """Staff users, requests carrying settings.METRICS_TOKEN, and clients from settings.METRICS_ALLOWED_IPS."""
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', DEFAULT_ALLOWED_IPS)
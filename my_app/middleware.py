@@ -0,0 +1,38 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from my_app import metrics
+
+
+class RequestMetricsMiddleware:
+    """
+    Records query count, DB time, template render time, response size and
+    duration per resolved URL name, and enforces the query budgets (see
+    my_app/metrics.py). Listed first in MIDDLEWARE so session/auth queries count.
+    Streaming responses are measured up to the point the response is returned;
+    their body (and any queries it runs while streaming) is not included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = metrics.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.count_query))
+                response = self.get_response(request)
+        finally:
+            request_metrics = metrics.stop(token)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = (match.view_name if match else None) or metrics.UNRESOLVED
+        size = None if response.streaming else len(response.content)
+        metrics.record(view, request_metrics, duration, size)
+        metrics.check_budget(view, request_metrics.queries)
+        return response
@@ -0,0 +1,65 @@
+from django.db import migrations
+
+# Vendor-specific search structures used by my_app/search.py. They are not
+# Django models: PostgreSQL gets a tsvector table with a GIN index, SQLite an
+# FTS5 virtual table. Both get an UPPER(sku) index for exact/prefix SKU lookups.
+
+POSTGRES_FORWARD = [
+    """
+    CREATE TABLE my_app_product_search (
+        product_id integer PRIMARY KEY REFERENCES my_app_product (product_id) ON DELETE CASCADE,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX my_app_product_search_document_idx ON my_app_product_search USING GIN (document)",
+    "CREATE INDEX my_app_variant_sku_search_idx ON my_app_productvariant (UPPER(sku) varchar_pattern_ops)",
+    """
+    INSERT INTO my_app_product_search (product_id, document)
+    SELECT product_id,
+           setweight(to_tsvector('simple', coalesce(product_name, '')), 'A') ||
+           setweight(to_tsvector('simple', coalesce(description, '')), 'B') ||
+           setweight(to_tsvector('simple', coalesce(material, '')), 'C')
+    FROM my_app_product
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS my_app_variant_sku_search_idx",
+    "DROP TABLE IF EXISTS my_app_product_search",
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE my_app_product_fts USING fts5(product_name, description, material)",
+    "CREATE INDEX my_app_variant_sku_search_idx ON my_app_productvariant (UPPER(sku))",
+    """
+    INSERT INTO my_app_product_fts (rowid, product_name, description, material)
+    SELECT product_id, product_name, coalesce(description, ''), coalesce(material, '')
+    FROM my_app_product
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP INDEX IF EXISTS my_app_variant_sku_search_idx",
+    "DROP TABLE IF EXISTS my_app_product_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0008_member_delete_memberprofile'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0009_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('order_count', models.IntegerField(default=0)),
+                ('gross_sales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paid_sales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paid_order_count', models.IntegerField(default=0)),
+                ('pending_count', models.IntegerField(default=0)),
+                ('processing_count', models.IntegerField(default=0)),
+                ('shipped_count', models.IntegerField(default=0)),
+                ('delivered_count', models.IntegerField(default=0)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Daily Sales Rollup',
+                'verbose_name_plural': 'Daily Sales Rollups',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0010_dailysalesrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='registration_date',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_date',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='review_date',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# Expression indexes for the autocomplete prefix lookups in my_app/lookups.py.
+# PostgreSQL needs the pattern opclass for `UPPER(col) LIKE 'TERM%'`; SQLite
+# serves the equivalent range seek from a plain expression index. Variant SKUs
+# are already covered by my_app_variant_sku_search_idx (0009).
+
+INDEXES = [
+    ('my_app_customer_email_upper_idx', 'my_app_customer', 'email'),
+    ('my_app_customer_first_name_upper_idx', 'my_app_customer', 'first_name'),
+    ('my_app_customer_last_name_upper_idx', 'my_app_customer', 'last_name'),
+    ('my_app_product_name_upper_idx', 'my_app_product', 'product_name'),
+]
+
+POSTGRES_FORWARD = [
+    f"CREATE INDEX {name} ON {table} (UPPER({column}) varchar_pattern_ops)"
+    for name, table, column in INDEXES
+]
+
+SQLITE_FORWARD = [
+    f"CREATE INDEX {name} ON {table} (UPPER({column}))"
+    for name, table, column in INDEXES
+]
+
+REVERSE = [f"DROP INDEX IF EXISTS {name}" for name, _table, _column in INDEXES]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0011_export_date_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': REVERSE, 'sqlite': REVERSE}),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:15
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0012_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='customer_email_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='member_email_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['order_status', '-order_date'], name='order_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['payment_status', '-order_date'], name='order_payment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'product_name'], name='product_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(condition=models.Q(('quantity_in_stock__lte', 10)), fields=['quantity_in_stock', 'product'], name='variant_low_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['start_date', 'end_date'], name='promotion_active_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['is_approved', '-review_date'], name='review_approved_date_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0014_customer_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerPreferenceProfile',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='preference_profile', serialize=False, to='my_app.customer')),
+                ('top_categories', models.JSONField(default=list)),
+                ('top_sizes', models.JSONField(default=list)),
+                ('top_colors', models.JSONField(default=list)),
+                ('top_brands', models.JSONField(default=list)),
+                ('gender_segment', models.CharField(blank=True, choices=[('M', 'Men'), ('W', 'Women'), ('U', 'Unisex'), ('K', 'Kids')], default='', max_length=1)),
+                ('items_purchased', models.IntegerField(default=0)),
+                ('last_order_date', models.DateTimeField(blank=True, help_text='Newest order included in the profile', null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Customer Preference Profile',
+                'verbose_name_plural': 'Customer Preference Profiles',
+            },
+        ),
+    ]
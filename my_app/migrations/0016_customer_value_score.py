@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0015_customer_preference_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerValueScore',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='value_score', serialize=False, to='my_app.customer')),
+                ('recency_days', models.IntegerField(help_text='Days since the last order')),
+                ('frequency', models.IntegerField(help_text='Number of orders')),
+                ('monetary', models.DecimalField(decimal_places=2, help_text='Total spent', max_digits=14)),
+                ('recency_score', models.PositiveSmallIntegerField()),
+                ('frequency_score', models.PositiveSmallIntegerField()),
+                ('monetary_score', models.PositiveSmallIntegerField()),
+                ('segment', models.CharField(choices=[('CHAMPION', 'Champion'), ('LOYAL', 'Loyal'), ('NEW', 'New'), ('POTENTIAL', 'Potential'), ('AT_RISK', 'At risk'), ('HIBERNATING', 'Hibernating')], db_index=True, max_length=20)),
+                ('lifetime_value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('scored_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Customer Value Score',
+                'verbose_name_plural': 'Customer Value Scores',
+            },
+        ),
+    ]
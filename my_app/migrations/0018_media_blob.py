@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0017_productimage_derivatives_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('name', models.CharField(help_text='Storage name (blobs/...)', max_length=255, primary_key=True, serialize=False)),
+                ('digest', models.CharField(help_text='SHA-256 of the content', max_length=64)),
+                ('size', models.BigIntegerField(help_text='Bytes')),
+                ('ref_count', models.IntegerField(default=0)),
+                ('last_saved', models.DateTimeField(help_text='Last time these bytes were uploaded')),
+            ],
+            options={
+                'verbose_name': 'Media Blob',
+                'verbose_name_plural': 'Media Blobs',
+                'indexes': [models.Index(fields=['ref_count', 'last_saved'], name='mediablob_unreferenced_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+STATUS_COUNT_FIELDS = {
+    'PENDING': 'pending_count',
+    'PROCESSING': 'processing_count',
+    'SHIPPED': 'shipped_count',
+    'DELIVERED': 'delivered_count',
+    'CANCELLED': 'cancelled_count',
+}
+
+
+def _money(field, **extra):
+    return Coalesce(Sum(field, **extra), Value(Decimal('0.00')),
+                    output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def backfill(apps, schema_editor):
+    """
+    Recomputes DailySalesRollup from the existing orders (as rollups.rebuild()
+    does, against the historical models), replacing the rows counted only since
+    0010 created the table.
+    """
+    Order = apps.get_model('my_app', 'Order')
+    DailySalesRollup = apps.get_model('my_app', 'DailySalesRollup')
+    paid = Q(payment_status='PAID')
+    daily = (
+        Order.objects.annotate(day=TruncDate('order_date'))
+        .values('day')
+        .order_by('day')
+        .annotate(
+            order_count=Count('order_id'),
+            gross_sales=_money('total_amount'),
+            paid_sales=_money('total_amount', filter=paid),
+            paid_order_count=Count('order_id', filter=paid),
+            **{field: Count('order_id', filter=Q(order_status=status))
+               for status, field in STATUS_COUNT_FIELDS.items()},
+        )
+    )
+    DailySalesRollup.objects.all().delete()
+    DailySalesRollup.objects.bulk_create(
+        (DailySalesRollup(date=row.pop('day'), **row) for row in daily.iterator(chunk_size=2000)),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0018_media_blob'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
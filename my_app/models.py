@@ -1,6 +1,11 @@
 # admin_dashboard/models.py
+import os
+
 from django.db import models
-from django.db.models import Sum
+from django.db.models import Sum, Count, Q, OuterRef, Subquery, IntegerField, DecimalField, Value
+from django.db.models.functions import Coalesce, Lower
+from django.urls import reverse
+from django.utils import timezone
 
 # --- CHOICES FOR ENUM-LIKE FIELDS ---
 GENDER_CHOICES = [
@@ -36,8 +41,42 @@ DISCOUNT_TYPE_CHOICES = [
     ('FREE_SHIPPING', 'Free Shipping'),
 ]
 
+# Variants at or below this quantity are flagged as "low stock" across the admin.
+LOW_STOCK_THRESHOLD = 10
+
+
+def flag_is(field, value):
+    """
+    Q for `field = value` on a BooleanField, written as an explicit comparison.
+    Django compiles `flag=True` to a bare `WHERE flag` / `WHERE NOT flag`, which
+    SQLite can't match against an index whose leading column is the flag.
+    """
+    return Q(**{field: Value(bool(value))})
+
 # --- APP MANAGEMENT MODELS ---
 
+class EmailQuerySet(models.QuerySet):
+    def email_iexact(self, email):
+        """
+        Case-insensitive email match. Compares LOWER(email) so the Lower('email')
+        index is used; `email__iexact` compiles to UPPER(...) = UPPER(...) on
+        PostgreSQL and to LIKE on SQLite, neither of which can use it.
+        """
+        return self.alias(email_lower=Lower('email')).filter(email_lower=email.lower())
+
+
+# Square avatar sizes (px) served by the avatar endpoint (see my_app/avatars.py);
+# other requested sizes are rounded up to the next one. profile_picture_url
+# points at AVATAR_DEFAULT_SIZE, twice the largest circle the templates draw.
+AVATAR_SIZES = (64, 128, 256, 512)
+AVATAR_DEFAULT_SIZE = 256
+
+
+def avatar_url(kind, pk, picture, size=AVATAR_DEFAULT_SIZE):
+    from my_app.avatars import avatar_version  # my_app.avatars imports the models
+    return f"{reverse('avatar', args=[kind, pk, size])}?v={avatar_version(picture)}"
+
+
 class Member(models.Model):
     """
     Represents a member who creates/manages the application. This model is
@@ -55,10 +94,15 @@ class Member(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = EmailQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Member"
         verbose_name_plural = "Members"
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(Lower('email'), name='member_email_lower_idx'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
@@ -66,13 +110,18 @@ class Member(models.Model):
     @property
     def profile_picture_url(self):
         """
-        Returns the URL of the profile picture, or a default image if none is set.
+        Returns the URL of the resized profile picture (see avatar_url), or a
+        default image if none is set.
         """
-        if self.profile_picture and hasattr(self.profile_picture, 'url'):
-            return self.profile_picture.url
+        if self.profile_picture:
+            return self.avatar_url()
         # Provide a path to a default image if no profile picture is uploaded
         return "/static/images/default_member_profile.png"
 
+    def avatar_url(self, size=AVATAR_DEFAULT_SIZE):
+        """URL of the profile picture cropped and resized to a `size` px square."""
+        return avatar_url('member', self.pk, self.profile_picture, size)
+
 # --- E-COMMERCE MODELS ---
 
 class Brand(models.Model):
@@ -109,6 +158,43 @@ class Category(models.Model):
     def __str__(self):
         return self.category_name
 
+class ProductQuerySet(models.QuerySet):
+    def active(self, is_active=True):
+        """Active (or inactive) products; served by product_active_name_idx."""
+        return self.filter(flag_is('is_active', is_active))
+
+    def with_stock_summary(self, low_stock_threshold=LOW_STOCK_THRESHOLD):
+        """
+        Annotates each product with its variant stock summary so list/detail pages
+        don't run a SUM and a COUNT per row:
+          - stock_total: sum of quantity_in_stock over all variants (0 if none)
+          - variant_count: number of variants
+          - low_stock_variant_count: variants at or below the low-stock threshold
+          - has_low_stock: True if any variant is low on stock
+        Correlated subqueries are used instead of a JOIN so the annotations stay
+        correct when the queryset is also filtered through `variants` (e.g. SKU search).
+        """
+        variants = ProductVariant.objects.filter(product=OuterRef('pk')).order_by().values('product')
+
+        def variant_subquery(aggregate, extra_filter=None):
+            qs = variants.filter(extra_filter) if extra_filter is not None else variants
+            return Coalesce(
+                Subquery(qs.annotate(value=aggregate).values('value'), output_field=IntegerField()),
+                Value(0),
+            )
+
+        low_stock_filter = Q(quantity_in_stock__lte=low_stock_threshold)
+        return self.annotate(
+            stock_total=variant_subquery(Sum('quantity_in_stock')),
+            variant_count=variant_subquery(Count('variant_id')),
+            low_stock_variant_count=variant_subquery(Count('variant_id'), low_stock_filter),
+        ).annotate(
+            has_low_stock=models.ExpressionWrapper(
+                Q(low_stock_variant_count__gt=0), output_field=models.BooleanField()
+            ),
+        )
+
+
 class Product(models.Model):
     product_id = models.AutoField(primary_key=True)
     product_name = models.CharField(max_length=255)
@@ -119,21 +205,34 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     material = models.CharField(max_length=100, blank=True, null=True)
     care_instructions = models.TextField(blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Product"
         verbose_name_plural = "Products"
         ordering = ['-created_at', 'product_name']
+        indexes = [
+            # Product list filtered by status and sorted by name
+            models.Index(fields=['is_active', 'product_name'], name='product_active_name_idx'),
+        ]
 
     def __str__(self):
         return self.product_name
 
     @property
     def total_stock(self):
-        """Calculates the total quantity in stock across all variants of this product."""
+        """
+        Total quantity in stock across all variants of this product.
+        Uses the `stock_total` annotation from ProductQuerySet.with_stock_summary() when
+        present, otherwise falls back to an aggregate query.
+        """
+        annotated = getattr(self, 'stock_total', None)
+        if annotated is not None:
+            return annotated
         return self.variants.aggregate(total_quantity=Sum('quantity_in_stock'))['total_quantity'] or 0
 
 
@@ -150,10 +249,36 @@ class ProductVariant(models.Model):
         verbose_name_plural = "Product Variants"
         unique_together = ('product', 'color', 'size')
         ordering = ['product__product_name', 'color', 'size']
+        indexes = [
+            # Low-stock alerts only ever look at the few variants at or below the threshold
+            models.Index(fields=['quantity_in_stock', 'product'], name='variant_low_stock_idx',
+                         condition=Q(quantity_in_stock__lte=LOW_STOCK_THRESHOLD)),
+        ]
 
     def __str__(self):
         return f"{self.product.product_name} - {self.color} - {self.size} ({self.sku})"
 
+# Resized copies generated for every ProductImage (see my_app/image_derivatives.py):
+# name -> (width, height, crop). Cropped sizes are filled exactly, the others fit inside.
+IMAGE_DERIVATIVE_SIZES = {
+    'thumb': (320, 320, True),
+    'large': (1200, 1200, False),
+}
+IMAGE_DERIVATIVE_FORMATS = ('jpg', 'webp')
+
+DERIVATIVE_STATUS_CHOICES = [
+    ('PENDING', 'Pending'),
+    ('READY', 'Ready'),
+    ('FAILED', 'Failed'),
+]
+
+
+def derivative_name(name, size, fmt):
+    """Storage name of a derivative, next to the original: products/shirt.jpg -> products/shirt.thumb.webp."""
+    root, _ext = os.path.splitext(name)
+    return f"{root}.{size}.{fmt}"
+
+
 class ProductImage(models.Model):
     image_id = models.AutoField(primary_key=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
@@ -169,6 +294,10 @@ class ProductImage(models.Model):
     alt_text = models.CharField(max_length=255, blank=True, null=True)
     is_thumbnail = models.BooleanField(default=False, help_text="Designates if this is the primary thumbnail image for the product/variant.")
     display_order = models.IntegerField(default=0)
+    derivatives_status = models.CharField(
+        max_length=10, choices=DERIVATIVE_STATUS_CHOICES, default='PENDING',
+        help_text="State of the generated thumbnail/WebP copies of `image`"
+    )
 
     class Meta:
         verbose_name = "Product Image"
@@ -186,6 +315,32 @@ class ProductImage(models.Model):
         # Provide a path to a default image if no product image is uploaded
         return "/static/images/default_product.png"
 
+    @property
+    def derivatives_ready(self):
+        return bool(self.image) and self.derivatives_status == 'READY'
+
+    def derivative_url(self, size, fmt='jpg'):
+        """URL of a generated copy of the image; the original (see image_url) until it is ready."""
+        if not self.derivatives_ready:
+            return self.image_url
+        return self.image.storage.url(derivative_name(self.image.name, size, fmt))
+
+    @property
+    def thumbnail_url(self):
+        return self.derivative_url('thumb')
+
+    @property
+    def thumbnail_webp_url(self):
+        return self.derivative_url('thumb', 'webp')
+
+    @property
+    def large_url(self):
+        return self.derivative_url('large')
+
+    @property
+    def large_webp_url(self):
+        return self.derivative_url('large', 'webp')
+
 
 class Customer(models.Model):
     customer_id = models.AutoField(primary_key=True)
@@ -194,27 +349,36 @@ class Customer(models.Model):
     email = models.EmailField(max_length=255, unique=True)
     password_hash = models.CharField(max_length=255, help_text="Hashed password for security")
     phone_number = models.CharField(max_length=20, blank=True, null=True)
-    registration_date = models.DateTimeField(auto_now_add=True)
+    registration_date = models.DateTimeField(auto_now_add=True, db_index=True)
     last_login = models.DateTimeField(null=True, blank=True)
     profile_picture = models.ImageField(upload_to='customer_profiles/', null=True, blank=True)
     notes = models.TextField(blank=True, null=True, help_text="Internal notes about the customer")
 
+    objects = EmailQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Customer"
         verbose_name_plural = "Customers"
         ordering = ['-registration_date']
+        indexes = [
+            models.Index(Lower('email'), name='customer_email_lower_idx'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
 
     @property
     def profile_picture_url(self):
-        """Returns the URL of the customer's profile picture, or a default image if none is set."""
-        if self.profile_picture and hasattr(self.profile_picture, 'url'):
-            return self.profile_picture.url
+        """Returns the URL of the customer's resized profile picture, or a default image if none is set."""
+        if self.profile_picture:
+            return self.avatar_url()
         # Provide a path to a default image if no profile picture is uploaded
         return "/static/images/default_profile.png"
 
+    def avatar_url(self, size=AVATAR_DEFAULT_SIZE):
+        """URL of the profile picture cropped and resized to a `size` px square."""
+        return avatar_url('customer', self.pk, self.profile_picture, size)
+
 
 class Address(models.Model):
     address_id = models.AutoField(primary_key=True)
@@ -236,10 +400,42 @@ class Address(models.Model):
     def __str__(self):
         return f"{self.customer.email} - {self.address_line1}, {self.city}"
 
+class OrderQuerySet(models.QuerySet):
+    def with_line_summary(self):
+        """
+        Annotates each order for history tables, instead of an `items.count` query per row:
+          - item_count: number of order lines
+          - item_quantity: total quantity over all lines
+          - discount_total: sum of the applied promotion discounts (0 if none)
+        Correlated subqueries, as in ProductQuerySet.with_stock_summary(), so the
+        two one-to-many relations don't multiply each other's rows.
+        """
+        items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        discounts = AppliedPromotion.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        return self.annotate(
+            item_count=Coalesce(
+                Subquery(items.annotate(value=Count('order_item_id')).values('value'), output_field=IntegerField()),
+                Value(0),
+            ),
+            item_quantity=Coalesce(
+                Subquery(items.annotate(value=Sum('quantity')).values('value'), output_field=IntegerField()),
+                Value(0),
+            ),
+            discount_total=Coalesce(
+                Subquery(
+                    discounts.annotate(value=Sum('discount_applied')).values('value'),
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                ),
+                Value(0),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
+
 class Order(models.Model):
     order_id = models.AutoField(primary_key=True)
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, null=True, related_name='orders')
-    order_date = models.DateTimeField(auto_now_add=True)
+    order_date = models.DateTimeField(auto_now_add=True, db_index=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     shipping_address = models.ForeignKey(
         Address,
@@ -260,10 +456,19 @@ class Order(models.Model):
     shipping_method = models.CharField(max_length=100, blank=True, null=True)
     tracking_number = models.CharField(max_length=100, blank=True, null=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Order"
         verbose_name_plural = "Orders"
         ordering = ['-order_date']
+        indexes = [
+            # Customer order history (newest first) and per-customer stats
+            models.Index(fields=['customer', '-order_date'], name='order_customer_date_idx'),
+            # Status filters on the order list, KPIs and exports, newest first / by date window
+            models.Index(fields=['order_status', '-order_date'], name='order_status_date_idx'),
+            models.Index(fields=['payment_status', '-order_date'], name='order_payment_date_idx'),
+        ]
 
     def __str__(self):
         # Corrected f-string for Order __str__
@@ -315,24 +520,51 @@ class CartItem(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.variant.product.product_name} ({self.variant.sku}) in Cart #{self.cart.cart_id}"
 
+class ReviewQuerySet(models.QuerySet):
+    def approved(self, is_approved=True):
+        """Approved (or pending) reviews; served by review_approved_date_idx."""
+        return self.filter(flag_is('is_approved', is_approved))
+
+
 class Review(models.Model):
     review_id = models.AutoField(primary_key=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, null=True, related_name='reviews')
     rating = models.IntegerField(choices=[(i, str(i)) for i in range(1, 6)], help_text="Rating from 1 to 5 stars")
     review_text = models.TextField(blank=True, null=True)
-    review_date = models.DateTimeField(auto_now_add=True)
+    review_date = models.DateTimeField(auto_now_add=True, db_index=True)
     is_approved = models.BooleanField(default=False, help_text="Whether the review has been approved by an admin")
 
+    objects = ReviewQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Review"
         verbose_name_plural = "Reviews"
         unique_together = ('product', 'customer')
         ordering = ['-review_date']
+        indexes = [
+            # Moderation queue: approved/pending reviews, newest first
+            models.Index(fields=['is_approved', '-review_date'], name='review_approved_date_idx'),
+        ]
 
     def __str__(self):
         return f"Review for {self.product.product_name} by {self.customer.email if self.customer else 'Anonymous'} - {self.rating} stars"
 
+class PromotionQuerySet(models.QuerySet):
+    def running(self, at=None):
+        """Enabled promotions whose [start_date, end_date] window contains `at` (default: now)."""
+        at = at or timezone.now()
+        return self.filter(is_active=True, start_date__lte=at, end_date__gte=at)
+
+    def upcoming(self, at=None):
+        at = at or timezone.now()
+        return self.filter(is_active=True, start_date__gt=at)
+
+    def expired(self, at=None):
+        at = at or timezone.now()
+        return self.filter(is_active=True, end_date__lt=at)
+
+
 class Promotion(models.Model):
     promotion_id = models.AutoField(primary_key=True)
     promo_code = models.CharField(max_length=50, unique=True)
@@ -346,10 +578,17 @@ class Promotion(models.Model):
     per_customer_limit = models.IntegerField(blank=True, null=True, help_text="Number of times a single customer can use this promo")
     is_active = models.BooleanField(default=True)
 
+    objects = PromotionQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Promotion"
         verbose_name_plural = "Promotions"
         ordering = ['-start_date']
+        indexes = [
+            # Running promotions: enabled and start_date <= now <= end_date
+            models.Index(fields=['start_date', 'end_date'], name='promotion_active_window_idx',
+                         condition=Q(is_active=True)),
+        ]
 
     def __str__(self):
         return f"{self.promo_code} ({self.discount_type}: {self.discount_value})"
@@ -385,3 +624,159 @@ class Wishlist(models.Model):
     def __str__(self):
         # Corrected f-string syntax for Wishlist __str__
         return f"{self.customer.email}'s Wishlist: {self.variant.product.product_name} ({self.variant.sku})"
+
+
+# --- REPORTING MODELS ---
+
+class DailySalesRollup(models.Model):
+    """
+    Per-day order totals, maintained incrementally from Order saves/deletes
+    (see my_app/rollups.py) so sales KPIs cost O(days) instead of O(orders).
+    Days are local dates (settings.TIME_ZONE) of Order.order_date.
+    Rebuild from history with `python manage.py rebuild_sales_rollup`.
+    """
+    date = models.DateField(primary_key=True)
+    order_count = models.IntegerField(default=0)
+    gross_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid_order_count = models.IntegerField(default=0)
+    pending_count = models.IntegerField(default=0)
+    processing_count = models.IntegerField(default=0)
+    shipped_count = models.IntegerField(default=0)
+    delivered_count = models.IntegerField(default=0)
+    cancelled_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Daily Sales Rollup"
+        verbose_name_plural = "Daily Sales Rollups"
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date}: {self.order_count} orders, ${self.gross_sales}"
+
+
+class CustomerStats(models.Model):
+    """
+    Order totals of one customer, maintained incrementally from Order
+    saves/deletes (see my_app/customer_stats.py) so the customer page of a
+    customer with thousands of orders doesn't aggregate their whole history.
+    Only kept for customers with at least settings.CUSTOMER_STATS_MIN_ORDERS
+    orders; rebuild with `python manage.py rebuild_customer_stats`.
+    """
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    order_count = models.IntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_order_date = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Customer Stats"
+        verbose_name_plural = "Customer Stats"
+
+    def __str__(self):
+        return f"Customer #{self.customer_id}: {self.order_count} orders, ${self.total_spent}"
+
+
+class CustomerPreferenceProfile(models.Model):
+    """
+    A customer's favourite categories, sizes, colors and brands (most purchased
+    first) and gender segment, computed in batch from their order lines by
+    my_app/preferences.py (`python manage.py update_preference_profiles`).
+    The customer detail page only reads this row.
+    """
+    customer = models.OneToOneField(
+        Customer, on_delete=models.CASCADE, primary_key=True, related_name='preference_profile'
+    )
+    top_categories = models.JSONField(default=list)
+    top_sizes = models.JSONField(default=list)
+    top_colors = models.JSONField(default=list)
+    top_brands = models.JSONField(default=list)
+    gender_segment = models.CharField(max_length=1, choices=GENDER_CHOICES, blank=True, default='')
+    items_purchased = models.IntegerField(default=0)
+    last_order_date = models.DateTimeField(null=True, blank=True, help_text="Newest order included in the profile")
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Customer Preference Profile"
+        verbose_name_plural = "Customer Preference Profiles"
+
+    def __str__(self):
+        return f"Customer #{self.customer_id}: {self.summary() or 'no purchases'}"
+
+    def summary(self):
+        """One-line description for the customer page, e.g. "Dresses, Casual Wear, Size M"."""
+        parts = self.top_categories[:2]
+        if self.top_sizes:
+            parts.append(f"Size {self.top_sizes[0]}")
+        return ', '.join(parts)
+
+
+RFM_SEGMENT_CHOICES = [
+    ('CHAMPION', 'Champion'),
+    ('LOYAL', 'Loyal'),
+    ('NEW', 'New'),
+    ('POTENTIAL', 'Potential'),
+    ('AT_RISK', 'At risk'),
+    ('HIBERNATING', 'Hibernating'),
+]
+
+
+class CustomerValueScore(models.Model):
+    """
+    Recency/frequency/monetary quintile scores (1-5, 5 = best), the resulting
+    segment and an estimated lifetime value for every customer with orders.
+    Recomputed for all customers at once by `python manage.py score_customers`
+    (my_app/rfm.py).
+    """
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name='value_score')
+    recency_days = models.IntegerField(help_text="Days since the last order")
+    frequency = models.IntegerField(help_text="Number of orders")
+    monetary = models.DecimalField(max_digits=14, decimal_places=2, help_text="Total spent")
+    recency_score = models.PositiveSmallIntegerField()
+    frequency_score = models.PositiveSmallIntegerField()
+    monetary_score = models.PositiveSmallIntegerField()
+    segment = models.CharField(max_length=20, choices=RFM_SEGMENT_CHOICES, db_index=True)
+    lifetime_value = models.DecimalField(max_digits=14, decimal_places=2)
+    scored_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Customer Value Score"
+        verbose_name_plural = "Customer Value Scores"
+
+    def __str__(self):
+        return (f"Customer #{self.customer_id}: R{self.recency_score}F{self.frequency_score}M{self.monetary_score} "
+                f"{self.segment}")
+
+    @property
+    def rfm_code(self):
+        return f"{self.recency_score}{self.frequency_score}{self.monetary_score}"
+
+    @property
+    def is_premium(self):
+        """Champions and the top spending quintile."""
+        return self.segment == 'CHAMPION' or self.monetary_score == 5
+
+
+class MediaBlob(models.Model):
+    """
+    A file of the content-addressed media storage (my_app/storage.py) and the
+    number of ProductImage/Member/Customer image fields pointing at it,
+    maintained by my_app/media_blobs.py. Blobs left at zero references are
+    deleted by `python manage.py purge_media_blobs`.
+    """
+    name = models.CharField(max_length=255, primary_key=True, help_text="Storage name (blobs/...)")
+    digest = models.CharField(max_length=64, help_text="SHA-256 of the content")
+    size = models.BigIntegerField(help_text="Bytes")
+    ref_count = models.IntegerField(default=0)
+    last_saved = models.DateTimeField(help_text="Last time these bytes were uploaded")
+
+    class Meta:
+        verbose_name = "Media Blob"
+        verbose_name_plural = "Media Blobs"
+        indexes = [
+            models.Index(fields=['ref_count', 'last_saved'], name='mediablob_unreferenced_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} reference(s))"
@@ -15,6 +15,10 @@ from my_app.templates.Views import (
     promotions_views,
     reviews_views,
     members_views,  # Import the members_views module
+    exports_views,
+    lookups_views,
+    metrics_views,
+    avatars_views,
 )
 
 urlpatterns = [
@@ -40,6 +44,7 @@ urlpatterns = [
     path("product/index", products_views.index, name='product_index'),
     path("product/add/", products_views.show, name='product_show'), # 'show' typically implies detail, 'add' usually maps to 'create'
     path("product/create/", products_views.create, name='product_create'),
+    path("product/import/", products_views.import_catalog, name='product_import'),
     path("product/<int:pk>/delete/", products_views.delete_product, name='product_delete'),
     path("product/<int:pk>/edit/", products_views.edit, name='product_edit'),
     path("product/<int:pk>/update/", products_views.update_product, name='product_update'),
@@ -48,6 +53,7 @@ urlpatterns = [
     # Inventory URLs
     path('inventory/', inventory_views.index, name='inventory_index'),
     path('inventory/create/', inventory_views.create_variant, name='inventory_create_variant'),
+    path('inventory/variant-matrix/', inventory_views.variant_matrix, name='inventory_variant_matrix'),
     path('inventory/<int:pk>/edit/', inventory_views.edit_variant, name='inventory_edit_variant'),
     path('inventory/<int:pk>/delete/', inventory_views.delete_variant, name='inventory_delete_variant'),
 
@@ -93,4 +99,19 @@ urlpatterns = [
     path('members/<int:pk>/edit/', members_views.edit_member, name='member_edit'),
     path('members/<int:pk>/delete/', members_views.delete_member, name='member_delete'),
     path('members/<int:pk>/view/', members_views.view_member, name='member_detail'),
+
+    # Lookup URLs (JSON autocomplete for the order, review and inventory forms)
+    path('lookups/customers/', lookups_views.customers, name='lookup_customers'),
+    path('lookups/addresses/', lookups_views.addresses, name='lookup_addresses'),
+    path('lookups/products/', lookups_views.products, name='lookup_products'),
+    path('lookups/variants/', lookups_views.variants, name='lookup_variants'),
+
+    # Export URLs (streamed CSV downloads)
+    path('exports/<str:name>/', exports_views.export, name='export'),
+
+    # Prometheus scrape endpoint (per-view query/latency histograms)
+    path('metrics', metrics_views.metrics_view, name='metrics'),
+
+    # Resized profile pictures (Member/Customer.profile_picture_url)
+    path('avatars/<str:kind>/<int:pk>/<int:size>/', avatars_views.avatar, name='avatar'),
 ]
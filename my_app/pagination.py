@@ -0,0 +1,262 @@
+"""
+Keyset (cursor) pagination shared by the admin index views.
+
+Instead of OFFSET/LIMIT, every page is fetched with a "seek" condition on the
+sort keys of the last row of the previous page, e.g. for orders:
+
+    WHERE (order_date < :d) OR (order_date = :d AND order_id < :id)
+    ORDER BY order_date DESC, order_id DESC
+    LIMIT 26
+
+so page 5,000 costs the same as page 1. The primary key is always appended to
+the ordering as a tiebreaker, which gives a stable total order even when the
+visible sort column (e.g. product_name) has duplicates.
+
+Usage in a view:
+
+    page = paginate(request, Order.objects.all(), sort_options=ORDER_SORT_OPTIONS)
+    context = {'orders': page.object_list, 'page': page}
+
+and `{% include "pages/pagination.html" %}` in the template.
+
+Note: sort keys must be NOT NULL columns (all default model orderings are).
+"""
+import base64
+import binascii
+import datetime
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+
+DEFAULT_PER_PAGE = 25
+MAX_PER_PAGE = 200
+
+# Query-string parameters owned by the paginator (never carried over to other links).
+CURSOR_PARAMS = ('after', 'before')
+SORT_PARAM = 'sort'
+PER_PAGE_PARAM = 'per_page'
+
+
+def _flip(key):
+    return key[1:] if key.startswith('-') else '-' + key
+
+
+def _resolve_field(queryset, path):
+    """
+    Follows a `product__product_name` style path to the final model field, or
+    returns the output field of an annotation (e.g. a search rank).
+    """
+    if path in queryset.query.annotations:
+        return queryset.query.annotations[path].output_field
+    model = queryset.model
+    field = None
+    for part in path.split('__'):
+        if part == 'pk':
+            field = model._meta.pk
+        else:
+            field = model._meta.get_field(part)
+        if field.is_relation and field.related_model is not None:
+            model = field.related_model
+    return field
+
+
+def normalize_ordering(model, ordering=None):
+    """
+    Returns the ordering used for seeking: the given ordering (or the model's
+    Meta.ordering) with the primary key appended as a unique tiebreaker. The
+    tiebreaker follows the direction of the last key so a single composite
+    index can be scanned in one direction.
+    """
+    ordering = list(ordering or model._meta.ordering)
+    pk_name = model._meta.pk.name
+    if not any(key.lstrip('-') in (pk_name, 'pk') for key in ordering):
+        direction = '-' if ordering and ordering[-1].startswith('-') else ''
+        ordering.append(direction + pk_name)
+    return ordering
+
+
+def seek_filter(ordering, values):
+    """
+    Builds the keyset condition "row comes strictly after `values` in `ordering`",
+    expanded as (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... so it works for mixed
+    ASC/DESC orderings on every backend.
+    """
+    clauses = []
+    for i, key in enumerate(ordering):
+        path = key.lstrip('-')
+        lookup = 'lt' if key.startswith('-') else 'gt'
+        clause = Q(**{f'{path}__{lookup}': values[i]})
+        for prev_key, prev_value in zip(ordering[:i], values[:i]):
+            clause &= Q(**{prev_key.lstrip('-'): prev_value})
+        clauses.append(clause)
+    return reduce(or_, clauses)
+
+
+def _cursor_value(value):
+    # Full-precision isoformat: DjangoJSONEncoder truncates microseconds, which
+    # would make rows sharing a millisecond fall between two pages.
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (int, float, str, bool)) or value is None:
+        return value
+    return str(value)  # Decimal, UUID, ...
+
+
+def encode_cursor(sort, values):
+    payload = json.dumps({'s': sort, 'v': [_cursor_value(v) for v in values]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns (sort, raw values) or None for a malformed cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return payload['s'], list(payload['v'])
+    except (binascii.Error, ValueError, UnicodeDecodeError, KeyError, TypeError):
+        return None
+
+
+class KeysetPage:
+    """
+    One page of results plus the cursors needed to move forwards/backwards.
+    There is deliberately no page number or total count: both require a full
+    COUNT(*) over the filtered table.
+    """
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor,
+                 sort, sort_options, per_page, params):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.sort = sort
+        self.sort_options = sort_options or {}
+        self.per_page = per_page
+        self._params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        # A page with no rows is still a page: `{% if page %}` must keep the sort controls.
+        return True
+
+    def _query(self, **extra):
+        params = self._params.copy()
+        for key in CURSOR_PARAMS:
+            params.pop(key, None)
+        for key, value in extra.items():
+            params[key] = value
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query(after=self.next_cursor) if self.has_next else ''
+
+    @property
+    def previous_query(self):
+        return self._query(before=self.previous_cursor) if self.has_previous else ''
+
+    @property
+    def first_query(self):
+        return self._query()
+
+    @property
+    def preserved_params(self):
+        """Filter parameters to carry over as hidden inputs when the sort changes."""
+        return [
+            (key, value)
+            for key, values in self._params.lists()
+            if key not in CURSOR_PARAMS and key != SORT_PARAM
+            for value in values
+        ]
+
+    @property
+    def sort_choices(self):
+        return [(key, label, key == self.sort) for key, (label, _ordering) in self.sort_options.items()]
+
+
+def _parse_per_page(request, default):
+    try:
+        per_page = int(request.GET.get(PER_PAGE_PARAM, default))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+
+def paginate(request, queryset, sort_options=None, default_sort=None, per_page=DEFAULT_PER_PAGE):
+    """
+    Returns a KeysetPage for `queryset` driven by the request's GET parameters:
+      - sort:     one of the keys of `sort_options` (whitelisted server-side sorting)
+      - after:    cursor of the last row of the previous page (go forward)
+      - before:   cursor of the first row of the next page (go back)
+      - per_page: page size, clamped to MAX_PER_PAGE
+
+    `sort_options` maps a public key to (label, ordering list). When the request
+    has no (valid) sort, `default_sort` is used, and without sort options the
+    model's Meta.ordering.
+    """
+    model = queryset.model
+    sort_options = sort_options or {}
+    sort = request.GET.get(SORT_PARAM)
+    if sort not in sort_options:
+        sort = default_sort if default_sort in sort_options else None
+    ordering = normalize_ordering(model, sort_options[sort][1] if sort else None)
+    per_page = _parse_per_page(request, per_page)
+
+    key_paths = [key.lstrip('-') for key in ordering]
+    key_fields = [_resolve_field(queryset, path) for path in key_paths]
+    aliases = [f'keyset_value_{i}' for i in range(len(ordering))]
+    queryset = queryset.annotate(**{alias: F(path) for alias, path in zip(aliases, key_paths)})
+
+    # --- Decode the cursor (an invalid/stale cursor simply restarts at the first page) ---
+    direction, values = None, None
+    for param in CURSOR_PARAMS:
+        cursor = request.GET.get(param)
+        if not cursor:
+            continue
+        decoded = decode_cursor(cursor)
+        if decoded and decoded[0] == sort and len(decoded[1]) == len(ordering):
+            try:
+                values = [field.to_python(raw) for field, raw in zip(key_fields, decoded[1])]
+                direction = param
+            except (ValidationError, FieldDoesNotExist):
+                values = None
+        break
+
+    if direction == 'before':
+        seek_ordering = [_flip(key) for key in ordering]
+        rows = list(queryset.filter(seek_filter(seek_ordering, values)).order_by(*seek_ordering)[:per_page + 1])
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if direction == 'after':
+            queryset = queryset.filter(seek_filter(ordering, values))
+        rows = list(queryset.order_by(*ordering)[:per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = direction == 'after'
+
+    def cursor_for(row):
+        return encode_cursor(sort, [getattr(row, alias) for alias in aliases])
+
+    return KeysetPage(
+        object_list=rows,
+        has_next=has_next and bool(rows),
+        has_previous=has_previous and bool(rows),
+        next_cursor=cursor_for(rows[-1]) if rows else None,
+        previous_cursor=cursor_for(rows[0]) if rows else None,
+        sort=sort,
+        sort_options=sort_options,
+        per_page=per_page,
+        params=request.GET,
+    )
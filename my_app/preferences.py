@@ -0,0 +1,125 @@
+"""
+Batch computation of CustomerPreferenceProfile rows from purchase history.
+
+For each chunk of customers a single grouped query walks OrderItem ->
+ProductVariant -> Product and sums the purchased quantity per (customer,
+category, brand, gender, size, color). The per-dimension rankings are folded
+from those groups in Python and the chunk's profiles are replaced in one
+transaction. Cancelled orders don't count.
+
+A full run (`update_preference_profiles --full`) walks every customer with
+orders. An incremental (nightly) run only recomputes customers without a
+profile or with an order newer than the newest one their profile includes
+(one pass over the (customer, order_date) index). Edits to the lines of orders
+already included are only picked up by a full run.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F, Max, Q, Sum
+
+from my_app.models import CustomerPreferenceProfile, Order, OrderItem
+
+TOP_N = 3
+DEFAULT_CHUNK_SIZE = 500
+
+# Profile field -> OrderItem path of the value it ranks.
+DIMENSIONS = {
+    'top_categories': 'variant__product__category__category_name',
+    'top_brands': 'variant__product__brand__brand_name',
+    'top_sizes': 'variant__size',
+    'top_colors': 'variant__color',
+    'gender_segment': 'variant__product__gender',
+}
+
+
+def _ranked(counter, limit):
+    """Values by descending quantity (ties by value, for stable results), blanks dropped."""
+    ranked = sorted(((value, quantity) for value, quantity in counter.items() if value), key=lambda x: (-x[1], x[0]))
+    return [value for value, _quantity in ranked[:limit]]
+
+
+def compute_profiles(customer_ids):
+    """
+    Unsaved CustomerPreferenceProfile instances for `customer_ids`: one grouped
+    query over their order lines, plus one for their newest order date.
+    """
+    groups = (
+        OrderItem.objects.filter(order__customer_id__in=customer_ids, variant__isnull=False)
+        .exclude(order__order_status='CANCELLED')
+        .values('order__customer_id', *DIMENSIONS.values())
+        .annotate(quantity=Sum('quantity'))
+        .order_by()
+    )
+    tallies = defaultdict(lambda: {field: Counter() for field in DIMENSIONS})
+    for group in groups:
+        customer_id = group['order__customer_id']
+        for field, path in DIMENSIONS.items():
+            tallies[customer_id][field][group[path]] += group['quantity']
+    # Over all orders (cancelled or without lines too), so incremental runs skip them.
+    last_orders = dict(
+        Order.objects.filter(customer_id__in=customer_ids).order_by()
+        .values('customer_id').annotate(newest=Max('order_date')).values_list('customer_id', 'newest')
+    )
+
+    profiles = []
+    for customer_id in customer_ids:
+        tally = tallies.get(customer_id)
+        if tally is None:  # no (non-cancelled) order lines: an empty profile
+            profiles.append(CustomerPreferenceProfile(customer_id=customer_id,
+                                                      last_order_date=last_orders.get(customer_id)))
+            continue
+        gender = _ranked(tally['gender_segment'], 1)
+        profiles.append(CustomerPreferenceProfile(
+            customer_id=customer_id,
+            top_categories=_ranked(tally['top_categories'], TOP_N),
+            top_brands=_ranked(tally['top_brands'], TOP_N),
+            top_sizes=_ranked(tally['top_sizes'], TOP_N),
+            top_colors=_ranked(tally['top_colors'], TOP_N),
+            gender_segment=gender[0] if gender else '',
+            items_purchased=sum(tally['gender_segment'].values()),
+            last_order_date=last_orders.get(customer_id),
+        ))
+    return profiles
+
+
+def _store(profiles):
+    with transaction.atomic():
+        CustomerPreferenceProfile.objects.filter(customer_id__in=[p.customer_id for p in profiles]).delete()
+        CustomerPreferenceProfile.objects.bulk_create(profiles)
+
+
+def changed_customers():
+    """Ids of customers with orders but no profile, or with an order newer than their profile's newest."""
+    orders = Order.objects.filter(customer__isnull=False).filter(
+        Q(customer__preference_profile__isnull=True)
+        | Q(order_date__gt=F('customer__preference_profile__last_order_date'))
+    )
+    return sorted(set(orders.order_by().values_list('customer_id', flat=True)))
+
+
+def update(full=False, chunk_size=DEFAULT_CHUNK_SIZE, stdout=None):
+    """
+    Recomputes the profiles of every customer with orders (`full`) or only of
+    changed_customers(), `chunk_size` customers per query and transaction.
+    Returns the number of profiles written.
+    """
+    if full:
+        customer_ids = sorted(set(
+            Order.objects.filter(customer__isnull=False).order_by().values_list('customer_id', flat=True)
+        ))
+        with transaction.atomic():
+            # Customers whose orders are all gone don't keep a stale profile.
+            customers_with_orders = Order.objects.filter(customer__isnull=False).values('customer_id')
+            CustomerPreferenceProfile.objects.exclude(customer_id__in=customers_with_orders).delete()
+    else:
+        customer_ids = changed_customers()
+
+    written = 0
+    for start in range(0, len(customer_ids), chunk_size):
+        chunk = customer_ids[start:start + chunk_size]
+        _store(compute_profiles(chunk))
+        written += len(chunk)
+        if stdout is not None:
+            stdout.write(f'{written}/{len(customer_ids)} customer(s)')
+    return written
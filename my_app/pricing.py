@@ -0,0 +1,123 @@
+"""
+Order pricing service: maintains `Order.total_amount`.
+
+    total_amount = max(sum(quantity * price_at_purchase) - sum(discount_applied), 0)
+
+Line changes are applied as a delta in one `UPDATE ... SET total_amount =
+total_amount + %s`, so editing one line of an order with hundreds of items
+doesn't load any of the other lines. A full recompute (recalculate_order) is
+one DB-side `Sum(F('quantity') * F('price_at_purchase'))` plus a re-evaluation
+of the order's AppliedPromotion discounts; it is used when the order has
+promotions, since percentage and minimum-amount discounts depend on the
+subtotal and can't be updated by a plain delta.
+
+These are queryset updates, which bypass the Order signals, so the daily sales
+rollup and the customer stats are adjusted explicitly (record_total_delta) and
+the dashboard cache is invalidated on commit.
+Call inside the same `transaction.atomic()` block as the OrderItem change.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from my_app import customer_stats, dashboard_cache, rollups
+from my_app.models import AppliedPromotion, Order, OrderItem
+
+CENT = Decimal('0.01')
+
+
+def line_total(quantity, price):
+    return (Decimal(quantity) * Decimal(price)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def items_subtotal(order):
+    """Sum of quantity * price_at_purchase over the order's items, computed by the database."""
+    amount = ExpressionWrapper(F('quantity') * F('price_at_purchase'),
+                               output_field=DecimalField(max_digits=14, decimal_places=2))
+    subtotal = OrderItem.objects.filter(order=order).aggregate(
+        subtotal=Coalesce(Sum(amount), Value(Decimal('0.00')),
+                          output_field=DecimalField(max_digits=14, decimal_places=2))
+    )['subtotal']
+    return Decimal(subtotal).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def discount_for(promotion, subtotal):
+    """Discount a promotion grants on `subtotal` (never more than the subtotal)."""
+    if promotion.min_order_amount is not None and subtotal < promotion.min_order_amount:
+        return Decimal('0.00')
+    if promotion.discount_type == 'PERCENTAGE':
+        discount = subtotal * promotion.discount_value / Decimal('100')
+    elif promotion.discount_type == 'FIXED_AMOUNT':
+        discount = promotion.discount_value
+    else:  # FREE_SHIPPING: orders carry no shipping charge in total_amount
+        discount = Decimal('0.00')
+    return min(discount, subtotal).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _store_total(order, new_total):
+    """Writes `new_total` and moves the rollup by the difference to the stored total."""
+    current = Order.objects.select_for_update().filter(pk=order.pk).values_list('total_amount', flat=True).get()
+    delta = new_total - current
+    if delta:
+        Order.objects.filter(pk=order.pk).update(total_amount=new_total)
+        order.total_amount = current  # the rollup moves from the stored total, not a stale in-memory one
+        rollups.record_total_delta(order, delta)
+        customer_stats.record_total_delta(order, delta)
+        dashboard_cache.invalidate_on_commit()
+    order.total_amount = new_total
+    return new_total
+
+
+def recalculate_order(order):
+    """
+    Full recompute: subtotal from the database, refreshed promotion discounts,
+    then the total. Returns the new total.
+    """
+    with transaction.atomic():
+        subtotal = items_subtotal(order)
+        applied = list(AppliedPromotion.objects.filter(order=order).select_related('promotion'))
+        changed = []
+        for applied_promotion in applied:
+            discount = discount_for(applied_promotion.promotion, subtotal)
+            if discount != applied_promotion.discount_applied:
+                applied_promotion.discount_applied = discount
+                changed.append(applied_promotion)
+        if changed:
+            AppliedPromotion.objects.bulk_update(changed, ['discount_applied'])
+        total_discount = sum((a.discount_applied for a in applied), Decimal('0.00'))
+        return _store_total(order, max(subtotal - total_discount, Decimal('0.00')))
+
+
+def apply_line_change(order, old_amount=Decimal('0.00'), new_amount=Decimal('0.00')):
+    """
+    Updates the total for one changed line (old/new quantity * price, 0 for an
+    added/removed line). Uses an F() delta unless the order has promotions.
+    """
+    delta = Decimal(new_amount) - Decimal(old_amount)
+    if not delta:
+        return order.total_amount
+    if AppliedPromotion.objects.filter(order=order).exists():
+        return recalculate_order(order)
+    Order.objects.filter(pk=order.pk).update(total_amount=F('total_amount') + delta)
+    rollups.record_total_delta(order, delta)
+    customer_stats.record_total_delta(order, delta)
+    dashboard_cache.invalidate_on_commit()
+    order.total_amount = (order.total_amount or Decimal('0.00')) + delta
+    return order.total_amount
+
+
+def apply_promotion(order, promotion):
+    """Attaches `promotion` to the order (or refreshes it) and re-prices the order."""
+    with transaction.atomic():
+        AppliedPromotion.objects.get_or_create(
+            order=order, promotion=promotion, defaults={'discount_applied': Decimal('0.00')}
+        )
+        return recalculate_order(order)
+
+
+def remove_promotion(order, promotion):
+    with transaction.atomic():
+        AppliedPromotion.objects.filter(order=order, promotion=promotion).delete()
+        return recalculate_order(order)
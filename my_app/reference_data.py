@@ -0,0 +1,127 @@
+"""
+Process-wide cache of the small reference tables used by every product form:
+Category and Brand (dropdown options and pk lookups) and the gender choices.
+
+Each worker process keeps one in-memory snapshot of both tables. The snapshot
+is tagged with a version token stored in Django's cache (settings.CACHES), and
+each read compares the local tag with the cached one, which is a single cache
+get and no SQL. A post_save/post_delete on Category or Brand (see
+my_app/signals.py) replaces the token once the transaction commits. With a
+cache shared by all workers (Redis, Memcached, FileBasedCache, database) every
+process then reloads its snapshot (two queries) on its next read.
+
+With a per-process cache (the default LocMemCache) only the process that saved
+the row sees the new token, so a snapshot is also reloaded once it is older
+than settings.REFERENCE_DATA_MAX_AGE seconds: other workers lag by at most
+that long. In the meantime get_category()/get_brand() fall back to the
+database for a pk missing from the snapshot, so a just-created row is never
+rejected as invalid.
+
+The cached model instances are shared between requests, so treat them as
+read-only. Re-fetch a row with the ORM before modifying it.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from my_app.models import Brand, Category, GENDER_CHOICES
+
+VERSION_KEY = 'reference_data:version'
+DEFAULT_MAX_AGE = 60
+
+GENDER_CODES = frozenset(code for code, _label in GENDER_CHOICES)
+
+
+class _Snapshot:
+    def __init__(self, version):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.categories = list(Category.objects.order_by('category_name'))
+        self.brands = list(Brand.objects.order_by('brand_name'))
+        self.categories_by_pk = {category.pk: category for category in self.categories}
+        self.brands_by_pk = {brand.pk: brand for brand in self.brands}
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'REFERENCE_DATA_CACHE_ALIAS', 'default')]
+
+
+def _current_version():
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # First use or evicted: publish a fresh token so no process keeps a
+        # snapshot taken before the eviction.
+        cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _is_current(snapshot, version):
+    if snapshot is None or snapshot.version != version:
+        return False
+    max_age = getattr(settings, 'REFERENCE_DATA_MAX_AGE', DEFAULT_MAX_AGE)
+    return max_age is None or time.monotonic() - snapshot.loaded_at < max_age
+
+
+def _get_snapshot():
+    global _snapshot
+    version = _current_version()
+    snapshot = _snapshot
+    if _is_current(snapshot, version):
+        return snapshot
+    with _lock:
+        if not _is_current(_snapshot, version):
+            _snapshot = _Snapshot(version)
+        return _snapshot
+
+
+def categories():
+    """All categories ordered by name."""
+    return _get_snapshot().categories
+
+
+def brands():
+    """All brands ordered by name."""
+    return _get_snapshot().brands
+
+
+def _lookup(model, mapping, pk):
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    found = mapping.get(pk)
+    if found is None:  # created since this process's snapshot (see module docstring)
+        found = model.objects.filter(pk=pk).first()
+    return found
+
+
+def get_category(pk):
+    """The Category with primary key `pk` (int or form string), or None."""
+    return _lookup(Category, _get_snapshot().categories_by_pk, pk)
+
+
+def get_brand(pk):
+    """The Brand with primary key `pk` (int or form string), or None."""
+    return _lookup(Brand, _get_snapshot().brands_by_pk, pk)
+
+
+def invalidate():
+    """Makes every process sharing the cache reload its snapshot on the next read."""
+    _cache().set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_on_commit(sender=None, raw=False, **kwargs):
+    """Signal handler: invalidates once the surrounding transaction has committed."""
+    if raw:
+        return
+    transaction.on_commit(invalidate)
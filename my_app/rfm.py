@@ -0,0 +1,236 @@
+"""
+RFM segmentation and lifetime-value scoring of all customers (CustomerValueScore).
+
+Orders are read as (customer_id, order timestamp, total) NumPy arrays, in
+chunks of `chunk_size` orders by primary key. The database returns epoch
+seconds and floats (EpochSeconds, Cast), so no Python datetime/Decimal objects
+are built per order. Per-customer order count, spend, first and last order are
+accumulated into arrays indexed by customer_id with bincount/minimum.at/maximum.at.
+Scoring then runs as whole-array operations, with no per-customer queries:
+  - recency/frequency/monetary scores: quintiles 1-5 (5 = most recent, most
+    orders, highest spend) by rank; equal values share a score;
+  - segment: from the recency score and the mean of the frequency and
+    monetary scores (see SEGMENT_RULES);
+  - lifetime_value: spend so far plus the expected spend over LTV_HORIZON_YEARS.
+    The expected spend is average order value x historical order rate x the
+    probability the customer is still active, exp(-recency / usual gap
+    between their orders).
+
+NumPy is an optional dependency (`pip install numpy`). Only the batch job
+needs it; pages read the stored scores.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import FloatField, Func, Max
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from my_app.models import Customer, CustomerValueScore, Order
+
+try:
+    import numpy as np
+except ImportError:  # optional: score_customers reports it
+    np = None
+
+DEFAULT_CHUNK_SIZE = 100_000
+WRITE_BATCH_SIZE = 5_000
+LTV_HORIZON_YEARS = 3
+MIN_TENURE_DAYS = 90  # floor for the order-rate estimate of recently acquired customers
+SECONDS_PER_DAY = 86_400
+DAYS_PER_YEAR = 365.25
+
+# (segment, condition) in priority order, on recency score r, frequency/monetary
+# mean fm and order count n; customers matching none are POTENTIAL.
+SEGMENT_RULES = (
+    ('CHAMPION', lambda r, fm, n: (r >= 4) & (fm >= 4)),
+    ('LOYAL', lambda r, fm, n: (r >= 3) & (fm >= 3)),
+    ('NEW', lambda r, fm, n: (r >= 4) & (n == 1)),
+    ('AT_RISK', lambda r, fm, n: (r <= 2) & (fm >= 3)),
+    ('HIBERNATING', lambda r, fm, n: r <= 2),
+)
+DEFAULT_SEGMENT = 'POTENTIAL'
+
+
+class NumPyUnavailable(Exception):
+    pass
+
+
+def is_available():
+    return np is not None
+
+
+class EpochSeconds(Func):
+    """Seconds since 1970-01-01 UTC of a datetime expression, computed by the database."""
+    output_field = FloatField()
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)'
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # Django stores UTC datetimes as text on SQLite; 2440587.5 is the Julian day of the epoch.
+        return self.as_sql(compiler, connection, template='((julianday(%(expressions)s) - 2440587.5) * 86400.0)',
+                           **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='UNIX_TIMESTAMP(%(expressions)s)', **extra_context)
+
+
+# --- Loading ---
+
+def order_arrays(chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields (customer_ids, epoch seconds, totals) arrays for chunks of the orders that have a customer."""
+    orders = (
+        Order.objects.filter(customer__isnull=False)
+        .annotate(timestamp=EpochSeconds('order_date'), amount=Cast('total_amount', FloatField()))
+        .order_by('pk')
+    )
+    last_pk = 0
+    while True:
+        rows = list(orders.filter(pk__gt=last_pk).values_list('pk', 'customer_id', 'timestamp', 'amount')[:chunk_size])
+        if not rows:
+            return
+        data = np.array(rows, dtype=np.float64)
+        last_pk = int(data[-1, 0])
+        yield data[:, 1].astype(np.int64), data[:, 2], np.nan_to_num(data[:, 3])
+
+
+class CustomerTotals:
+    """Per-customer order count, spend and first/last order time, indexed by customer_id."""
+
+    def __init__(self, size):
+        self.count = np.zeros(size, dtype=np.int64)
+        self.spent = np.zeros(size)
+        self.first = np.full(size, np.inf)
+        self.last = np.full(size, -np.inf)
+
+    def _grow(self, size):
+        extra = size - len(self.count)
+        self.count = np.concatenate([self.count, np.zeros(extra, dtype=np.int64)])
+        self.spent = np.concatenate([self.spent, np.zeros(extra)])
+        self.first = np.concatenate([self.first, np.full(extra, np.inf)])
+        self.last = np.concatenate([self.last, np.full(extra, -np.inf)])
+
+    def add(self, customer_ids, timestamps, amounts):
+        size = int(customer_ids.max()) + 1
+        if size > len(self.count):  # customers created since the arrays were sized
+            self._grow(size)
+        size = len(self.count)
+        self.count += np.bincount(customer_ids, minlength=size)
+        self.spent += np.bincount(customer_ids, weights=amounts, minlength=size)
+        np.minimum.at(self.first, customer_ids, timestamps)
+        np.maximum.at(self.last, customer_ids, timestamps)
+
+
+def load_totals(chunk_size=DEFAULT_CHUNK_SIZE):
+    totals = CustomerTotals((Customer.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0) + 1)
+    for chunk in order_arrays(chunk_size):
+        totals.add(*chunk)
+    return totals
+
+
+# --- Scoring ---
+
+def quintile_scores(values):
+    """
+    1-5 by quintile of `values` (higher value, higher score). Equal values share
+    the score of their middle rank, so a tie doesn't all land in the bottom quintile.
+    """
+    if not len(values):
+        return np.zeros(0, dtype=np.int64)
+    ordered = np.sort(values)
+    middle_rank = (np.searchsorted(ordered, values, side='left') + np.searchsorted(ordered, values, side='right')) / 2
+    return np.clip(np.ceil(middle_rank / len(values) * 5), 1, 5).astype(np.int64)
+
+
+def segments(recency_score, frequency_score, monetary_score, frequency):
+    fm = (frequency_score + monetary_score) / 2
+    conditions = [rule(recency_score, fm, frequency) for _segment, rule in SEGMENT_RULES]
+    return np.select(conditions, [segment for segment, _rule in SEGMENT_RULES], default=DEFAULT_SEGMENT)
+
+
+def score(totals, now):
+    """
+    Dict of equal-length arrays (customer_id, recency_days, frequency, monetary,
+    the three scores, segment, lifetime_value) for every customer with orders.
+    """
+    customer_ids = np.flatnonzero(totals.count)
+    frequency = totals.count[customer_ids]
+    monetary = totals.spent[customer_ids]
+    now_ts = now.timestamp()
+    recency_days = np.maximum(now_ts - totals.last[customer_ids], 0) / SECONDS_PER_DAY
+    tenure_days = np.maximum((now_ts - totals.first[customer_ids]) / SECONDS_PER_DAY, MIN_TENURE_DAYS)
+
+    recency_score = quintile_scores(-recency_days)
+    frequency_score = quintile_scores(frequency)
+    monetary_score = quintile_scores(monetary)
+
+    average_order = monetary / frequency
+    orders_per_year = frequency / tenure_days * DAYS_PER_YEAR
+    usual_gap_days = tenure_days / frequency
+    p_active = np.exp(-recency_days / usual_gap_days)
+    lifetime_value = monetary + average_order * orders_per_year * LTV_HORIZON_YEARS * p_active
+
+    return {
+        'customer_id': customer_ids,
+        'recency_days': np.floor(recency_days).astype(np.int64),
+        'frequency': frequency,
+        'monetary': monetary,
+        'recency_score': recency_score,
+        'frequency_score': frequency_score,
+        'monetary_score': monetary_score,
+        'segment': segments(recency_score, frequency_score, monetary_score, frequency),
+        'lifetime_value': lifetime_value,
+    }
+
+
+# --- Storing ---
+
+COLUMNS = (
+    'customer_id', 'recency_days', 'frequency', 'monetary', 'recency_score', 'frequency_score',
+    'monetary_score', 'segment', 'lifetime_value',
+)
+
+
+def _money(value):
+    return Decimal(f'{value:.2f}')
+
+
+def _rows(scores, start, stop, scored_at):
+    columns = [scores[name][start:stop].tolist() for name in COLUMNS]
+    return [
+        (customer_id, recency_days, frequency, _money(monetary), r, f, m, segment, _money(lifetime_value), scored_at)
+        for customer_id, recency_days, frequency, monetary, r, f, m, segment, lifetime_value in zip(*columns)
+    ]
+
+
+def _insert(cursor, rows):
+    """
+    Plain executemany INSERT: at a million customers, building a model instance
+    per row for bulk_create costs more than the whole scoring.
+    """
+    meta = CustomerValueScore._meta
+    names = [meta.get_field(name).column for name in (*COLUMNS, 'scored_at')]
+    names = ', '.join(connection.ops.quote_name(name) for name in names)
+    placeholders = ', '.join(['%s'] * (len(COLUMNS) + 1))
+    cursor.executemany(f"INSERT INTO {connection.ops.quote_name(meta.db_table)} ({names}) VALUES ({placeholders})",
+                       rows)
+
+
+def score_customers(chunk_size=DEFAULT_CHUNK_SIZE, now=None, stdout=None):
+    """
+    Recomputes CustomerValueScore for every customer with orders and replaces
+    the table's rows in one transaction (readers keep the previous scores until it
+    commits). Returns the number of customers scored.
+    """
+    if np is None:
+        raise NumPyUnavailable('Customer scoring requires NumPy (pip install numpy).')
+    now = now or timezone.now()
+    scores = score(load_totals(chunk_size), now)
+    total = len(scores['customer_id'])
+    if stdout is not None:
+        stdout.write(f'Scored {total} customer(s), writing...')
+    scored_at = connection.ops.adapt_datetimefield_value(now)
+    with transaction.atomic(), connection.cursor() as cursor:
+        CustomerValueScore.objects.all().delete()
+        for start in range(0, total, WRITE_BATCH_SIZE):
+            _insert(cursor, _rows(scores, start, start + WRITE_BATCH_SIZE, scored_at))
+    return total
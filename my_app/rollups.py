@@ -0,0 +1,230 @@
+"""
+Incremental maintenance of DailySalesRollup.
+
+Every Order save/delete is turned into a signed "contribution" to the rollup
+row of its local order date (order count, gross/paid sales, per-status counts)
+and applied with a single F() UPDATE. An edit subtracts the order's previous
+contribution and adds the new one, so status/payment/total changes and even
+date changes move the numbers between the right days.
+
+The previous contribution is captured when the Order is loaded (post_init)
+without touching deferred fields; when it isn't available the row is re-read
+from the database before saving. Code paths that change orders through
+`QuerySet.update()` bypass signals and must call apply_order_change() or
+record_total_delta() themselves (or rebuild the rollup).
+
+Migration 0019 fills the rollup from the existing orders; `manage.py
+rebuild_sales_rollup` recomputes it after bulk changes.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from my_app.models import DailySalesRollup, Order
+
+# Order fields that determine the rollup contribution.
+TRACKED_FIELDS = ('order_date', 'total_amount', 'order_status', 'payment_status')
+
+STATUS_COUNT_FIELDS = {
+    'PENDING': 'pending_count',
+    'PROCESSING': 'processing_count',
+    'SHIPPED': 'shipped_count',
+    'DELIVERED': 'delivered_count',
+    'CANCELLED': 'cancelled_count',
+}
+
+SNAPSHOT_ATTR = '_rollup_snapshot'
+
+
+def day_start(day):
+    """Aware datetime of local midnight at the start of `day`."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def snapshot(order):
+    """Tracked field values of an Order, or None if any of them is deferred/unset."""
+    values = order.__dict__
+    if any(name not in values for name in TRACKED_FIELDS) or values.get('order_date') is None:
+        return None
+    return tuple(values[name] for name in TRACKED_FIELDS)
+
+
+def contribution(state):
+    """Maps an Order snapshot to (local date, {rollup field: delta})."""
+    order_date, total_amount, order_status, payment_status = state
+    total_amount = Decimal(total_amount or 0)
+    deltas = {'order_count': 1, 'gross_sales': total_amount}
+    if payment_status == 'PAID':
+        deltas['paid_sales'] = total_amount
+        deltas['paid_order_count'] = 1
+    status_field = STATUS_COUNT_FIELDS.get(order_status)
+    if status_field:
+        deltas[status_field] = 1
+    return timezone.localdate(order_date), deltas
+
+
+def _apply(day, deltas):
+    """
+    Adds the signed `deltas` to the row of `day`. A day without a row (its orders
+    predate the rollup, or it was never rebuilt) is computed from its orders
+    instead, which already reflect the change: applying the delta to a fresh
+    zero row would undercount it, or drive it negative on an edit or delete.
+    """
+    if not deltas:
+        return
+    changes = {field: F(field) + value for field, value in deltas.items()}
+    if DailySalesRollup.objects.filter(date=day).update(**changes, updated_at=timezone.now()):
+        return
+    totals = next(iter(daily_totals(day, day + timedelta(days=1))), None)
+    if totals is None:
+        return
+    totals.pop('day')
+    _row, created = DailySalesRollup.objects.get_or_create(date=day, defaults=totals)
+    if not created:  # written meanwhile by a transaction that couldn't see this change
+        DailySalesRollup.objects.filter(date=day).update(**changes, updated_at=timezone.now())
+
+
+def apply_order_change(old_state, new_state):
+    """Moves an order's contribution from `old_state` to `new_state` (either may be None)."""
+    if old_state == new_state:
+        return
+    # Net deltas per day: one update per day, so a day rebuilt from its orders isn't adjusted twice.
+    changes = defaultdict(dict)
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if state is not None:
+            day, deltas = contribution(state)
+            for field, value in deltas.items():
+                changes[day][field] = changes[day].get(field, 0) + sign * value
+    with transaction.atomic():
+        for day, deltas in changes.items():
+            _apply(day, {field: value for field, value in deltas.items() if value})
+
+
+def record_total_delta(order, amount_delta):
+    """
+    Applies a change of `order.total_amount` made with a queryset UPDATE (no
+    signals) and keeps the instance's snapshot in step.
+    """
+    state = snapshot(order)
+    if state is None or not amount_delta:
+        return
+    day, _deltas = contribution(state)
+    deltas = {'gross_sales': amount_delta}
+    if state[3] == 'PAID':
+        deltas['paid_sales'] = amount_delta
+    _apply(day, deltas)
+    order_date, total_amount, order_status, payment_status = state
+    setattr(order, SNAPSHOT_ATTR, (order_date, Decimal(total_amount or 0) + amount_delta, order_status, payment_status))
+
+
+# --- Signal handlers (connected in my_app/signals.py) ---
+
+def remember_order_state(sender, instance, **kwargs):
+    setattr(instance, SNAPSHOT_ATTR, snapshot(instance) if instance.pk else None)
+
+
+def capture_previous_state(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk or getattr(instance, SNAPSHOT_ATTR, None) is not None:
+        return
+    # Loaded with deferred fields (or constructed by hand): read the stored row once.
+    previous = Order.objects.filter(pk=instance.pk).values_list(*TRACKED_FIELDS).first()
+    setattr(instance, SNAPSHOT_ATTR, tuple(previous) if previous else None)
+
+
+def order_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_state = snapshot(instance)
+    if new_state is None:  # saved with update_fields on a partially loaded row
+        instance.refresh_from_db(fields=TRACKED_FIELDS)
+        new_state = snapshot(instance)
+    old_state = None if created else getattr(instance, SNAPSHOT_ATTR, None)
+    apply_order_change(old_state, new_state)
+    setattr(instance, SNAPSHOT_ATTR, new_state)
+
+
+def order_deleted(sender, instance, **kwargs):
+    apply_order_change(getattr(instance, SNAPSHOT_ATTR, None) or snapshot(instance), None)
+
+
+# --- Reading / rebuilding ---
+
+def _money(field):
+    return Coalesce(Sum(field), Value(Decimal('0.00')), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def summarize(start_date=None, end_date=None):
+    """
+    Totals over the half-open date range [start_date, end_date) (open-ended if None),
+    read from the rollup: cost grows with the number of days, not orders.
+    """
+    rows = DailySalesRollup.objects.all()
+    if start_date is not None:
+        rows = rows.filter(date__gte=start_date)
+    if end_date is not None:
+        rows = rows.filter(date__lt=end_date)
+    return rows.aggregate(
+        order_count=Coalesce(Sum('order_count'), 0),
+        gross_sales=_money('gross_sales'),
+        paid_sales=_money('paid_sales'),
+        paid_order_count=Coalesce(Sum('paid_order_count'), 0),
+        **{field: Coalesce(Sum(field), 0) for field in STATUS_COUNT_FIELDS.values()},
+    )
+
+
+def daily_totals(start_day, end_day):
+    """Rollup values (with 'day') of each local day in [start_day, end_day) that has orders, from Order."""
+    paid = Q(payment_status='PAID')
+    return (
+        Order.objects.filter(order_date__gte=day_start(start_day), order_date__lt=day_start(end_day))
+        .annotate(day=TruncDate('order_date'))
+        .values('day')
+        .order_by('day')
+        .annotate(
+            order_count=Count('order_id'),
+            gross_sales=_money('total_amount'),
+            paid_sales=Coalesce(Sum('total_amount', filter=paid), Value(Decimal('0.00')),
+                                output_field=DecimalField(max_digits=14, decimal_places=2)),
+            paid_order_count=Count('order_id', filter=paid),
+            **{field: Count('order_id', filter=Q(order_status=status))
+               for status, field in STATUS_COUNT_FIELDS.items()},
+        )
+    )
+
+
+def rebuild(chunk_days=31, stdout=None):
+    """
+    Recomputes the rollup from Order history, one chunk of `chunk_days` days per
+    transaction, so the job never holds a long lock or the whole table in memory.
+    Returns the number of rollup rows written.
+    """
+    bounds = Order.objects.order_by().aggregate(min_date=Min('order_date'), max_date=Max('order_date'))
+    if bounds['min_date'] is None:
+        DailySalesRollup.objects.all().delete()
+        return 0
+
+    first_day = timezone.localdate(bounds['min_date'])
+    last_day = timezone.localdate(bounds['max_date'])
+    written = 0
+    with transaction.atomic():
+        # Days outside the order history can't have a contribution any more.
+        DailySalesRollup.objects.filter(Q(date__lt=first_day) | Q(date__gt=last_day)).delete()
+
+    chunk_start = first_day
+    while chunk_start <= last_day:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days), last_day + timedelta(days=1))
+        daily = daily_totals(chunk_start, chunk_end)
+        rows = [DailySalesRollup(date=row.pop('day'), **row) for row in daily]
+        with transaction.atomic():
+            DailySalesRollup.objects.filter(date__gte=chunk_start, date__lt=chunk_end).delete()
+            DailySalesRollup.objects.bulk_create(rows)
+        written += len(rows)
+        if stdout is not None:
+            stdout.write(f'{chunk_start} .. {chunk_end - timedelta(days=1)}: {len(rows)} day(s)')
+        chunk_start = chunk_end
+    return written
@@ -0,0 +1,193 @@
+"""
+Product search backend used by the product list (`?q=`).
+
+Replaces the `icontains` OR-join over name/description/variant SKU (a sequential
+scan plus a join fan-out and DISTINCT) with:
+  - PostgreSQL: a weighted tsvector per product in `my_app_product_search`
+    (name = A, description = B, material = C) behind a GIN index.
+  - SQLite: an FTS5 virtual table `my_app_product_fts`, so search can be
+    exercised locally and in tests.
+  - SKUs: exact and prefix matches on UPPER(sku) through the dedicated
+    `my_app_variant_sku_search_idx` index.
+
+The index tables are created by migration 0009 and kept current by the
+Product post_save/post_delete signals (see my_app/signals.py). Code paths that
+bypass signals (bulk_create, queryset.update) should call reindex_products()
+or run `python manage.py rebuild_search_index`.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from my_app.models import Product, ProductVariant
+
+PG_SEARCH_TABLE = 'my_app_product_search'
+FTS_TABLE = 'my_app_product_fts'
+SKU_INDEX_NAME = 'my_app_variant_sku_search_idx'
+TS_CONFIG = 'simple'  # No stemming: product names and brands are mostly proper nouns
+
+# Rank bonus added on top of the text rank so SKU hits sort first.
+SKU_EXACT_BOOST = 100.0
+SKU_PREFIX_BOOST = 10.0
+
+# FTS5 column weights (product_name, description, material), mirroring A/B/C on PostgreSQL.
+FTS_WEIGHTS = (10.0, 4.0, 1.0)
+
+
+def is_supported(vendor=None):
+    return (vendor or connection.vendor) in ('postgresql', 'sqlite')
+
+
+def _terms(query):
+    """Splits the raw `q` into word tokens; punctuation can't break the MATCH/tsquery syntax."""
+    return re.findall(r'\w+', query or '')
+
+
+def _fts_match_expression(terms):
+    # Every term must match; the last term is a prefix so results update while typing.
+    quoted = ['"%s"' % term for term in terms]
+    quoted[-1] += '*'
+    return ' AND '.join(quoted)
+
+
+def _ts_query_expression(terms):
+    return ' & '.join(terms[:-1] + [terms[-1] + ':*'])
+
+
+def _like_prefix(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+# --- Index maintenance ---
+
+def reindex_products(product_ids):
+    """(Re)builds the search document of the given products from their current rows."""
+    product_ids = [int(pk) for pk in product_ids]
+    if not product_ids or not is_supported():
+        return
+    product_table = Product._meta.db_table
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f"""
+                INSERT INTO {PG_SEARCH_TABLE} (product_id, document)
+                SELECT product_id,
+                       setweight(to_tsvector('{TS_CONFIG}', coalesce(product_name, '')), 'A') ||
+                       setweight(to_tsvector('{TS_CONFIG}', coalesce(description, '')), 'B') ||
+                       setweight(to_tsvector('{TS_CONFIG}', coalesce(material, '')), 'C')
+                FROM {product_table}
+                WHERE product_id IN ({placeholders})
+                ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document
+                """,
+                product_ids,
+            )
+        else:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", product_ids)
+            cursor.execute(
+                f"""
+                INSERT INTO {FTS_TABLE} (rowid, product_name, description, material)
+                SELECT product_id, product_name, coalesce(description, ''), coalesce(material, '')
+                FROM {product_table}
+                WHERE product_id IN ({placeholders})
+                """,
+                product_ids,
+            )
+
+
+def remove_products(product_ids):
+    """Drops the search documents of deleted products."""
+    product_ids = [int(pk) for pk in product_ids]
+    if not product_ids or not is_supported():
+        return
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    table, key = (PG_SEARCH_TABLE, 'product_id') if connection.vendor == 'postgresql' else (FTS_TABLE, 'rowid')
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {key} IN ({placeholders})", product_ids)
+
+
+def rebuild_index(chunk_size=2000):
+    """Re-indexes every product in primary-key chunks. Returns the number of products indexed."""
+    total = 0
+    last_pk = 0
+    while True:
+        ids = list(
+            Product.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return total
+        reindex_products(ids)
+        total += len(ids)
+        last_pk = ids[-1]
+
+
+# --- Querying ---
+
+def search_products(queryset, query):
+    """
+    Restricts a Product queryset to products matching `query` and annotates each
+    row with `search_rank` (higher is better): the weighted text rank plus a bonus
+    for exact/prefix SKU matches. Falls back to the previous icontains search on
+    database backends without a search index.
+    """
+    terms = _terms(query)
+    if not terms:
+        return queryset.none().annotate(search_rank=RawSQL('0', [], output_field=FloatField()))
+
+    if not is_supported():
+        return queryset.filter(
+            Q(product_name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(variants__sku__icontains=query)
+        ).distinct().annotate(search_rank=RawSQL('0', [], output_field=FloatField()))
+
+    product_ref = f'{Product._meta.db_table}.product_id'
+    variant_table = ProductVariant._meta.db_table
+    sku = query.strip().upper()
+
+    if connection.vendor == 'postgresql':
+        ts_query = _ts_query_expression(terms)
+        text_ids_sql = (
+            f"SELECT product_id FROM {PG_SEARCH_TABLE} "
+            f"WHERE document @@ to_tsquery('{TS_CONFIG}', %s)"
+        )
+        text_rank_sql = (
+            f"SELECT ts_rank(document, to_tsquery('{TS_CONFIG}', %s)) FROM {PG_SEARCH_TABLE} "
+            f"WHERE product_id = {product_ref} AND document @@ to_tsquery('{TS_CONFIG}', %s)"
+        )
+        text_rank_params = [ts_query, ts_query]
+        sku_match_sql = "UPPER(sku) LIKE %s"  # served by UPPER(sku) varchar_pattern_ops
+        sku_match_params = [_like_prefix(sku)]
+    else:
+        match = _fts_match_expression(terms)
+        weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+        text_ids_sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        # bm25() is "lower is better" and negative, so negate it.
+        text_rank_sql = (
+            f"SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = {product_ref}"
+        )
+        text_rank_params = [match]
+        # Range seek on the UPPER(sku) expression index (BINARY collation) instead of LIKE.
+        sku_match_sql = "UPPER(sku) >= %s AND UPPER(sku) < %s"
+        sku_match_params = [sku, sku + '\U0010ffff']
+        ts_query = match
+
+    sku_ids_sql = f"SELECT product_id FROM {variant_table} WHERE {sku_match_sql}"
+    sku_rank_sql = (
+        f"SELECT MAX(CASE WHEN UPPER(sku) = %s THEN {SKU_EXACT_BOOST} ELSE {SKU_PREFIX_BOOST} END) "
+        f"FROM {variant_table} WHERE product_id = {product_ref} AND {sku_match_sql}"
+    )
+
+    return queryset.filter(
+        Q(pk__in=RawSQL(text_ids_sql, [ts_query])) |
+        Q(pk__in=RawSQL(sku_ids_sql, sku_match_params))
+    ).annotate(
+        search_rank=RawSQL(
+            f"COALESCE(({text_rank_sql}), 0) + COALESCE(({sku_rank_sql}), 0)",
+            text_rank_params + [sku] + sku_match_params,
+            output_field=FloatField(),
+        )
+    )
@@ -0,0 +1,75 @@
+"""
+Model signal handlers for my_app. Connected in MyAppConfig.ready().
+"""
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from my_app import customer_stats, dashboard_cache, image_derivatives, media_blobs, reference_data, rollups, search
+from my_app.models import Brand, Category, Order, Product, ProductImage, ProductVariant, Review
+
+
+# --- Product search index ---
+
+@receiver(post_save, sender=Product, dispatch_uid='product_search_reindex')
+def reindex_product_on_save(sender, instance, raw=False, **kwargs):
+    """Keeps the product's full-text search document in sync with its row."""
+    if raw:  # loaddata: the index is rebuilt separately
+        return
+    search.reindex_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product, dispatch_uid='product_search_remove')
+def remove_product_from_search(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+# --- Daily sales rollup (see my_app/rollups.py) ---
+
+post_init.connect(rollups.remember_order_state, sender=Order, dispatch_uid='order_rollup_remember')
+pre_save.connect(rollups.capture_previous_state, sender=Order, dispatch_uid='order_rollup_capture')
+post_save.connect(rollups.order_saved, sender=Order, dispatch_uid='order_rollup_saved')
+post_delete.connect(rollups.order_deleted, sender=Order, dispatch_uid='order_rollup_deleted')
+
+
+# --- Per-customer order totals (see my_app/customer_stats.py) ---
+
+post_init.connect(customer_stats.remember_order_state, sender=Order, dispatch_uid='order_customer_stats_remember')
+pre_save.connect(customer_stats.capture_previous_state, sender=Order, dispatch_uid='order_customer_stats_capture')
+post_save.connect(customer_stats.order_saved, sender=Order, dispatch_uid='order_customer_stats_saved')
+post_delete.connect(customer_stats.order_deleted, sender=Order, dispatch_uid='order_customer_stats_deleted')
+
+
+# --- Product image thumbnails/WebP copies (see my_app/image_derivatives.py) ---
+
+post_init.connect(image_derivatives.remember_image, sender=ProductImage, dispatch_uid='product_image_remember')
+post_save.connect(image_derivatives.image_saved, sender=ProductImage, dispatch_uid='product_image_derivatives')
+post_delete.connect(image_derivatives.image_deleted, sender=ProductImage, dispatch_uid='product_image_derivatives_delete')
+
+# --- Media blob reference counts (see my_app/media_blobs.py) ---
+
+for _model in media_blobs.MEDIA_FIELDS:
+    post_init.connect(media_blobs.remember_names, sender=_model, dispatch_uid=f'media_blobs_remember_{_model.__name__}')
+    pre_save.connect(media_blobs.capture_previous_names, sender=_model,
+                     dispatch_uid=f'media_blobs_capture_{_model.__name__}')
+    pre_delete.connect(media_blobs.capture_previous_names, sender=_model,
+                       dispatch_uid=f'media_blobs_capture_delete_{_model.__name__}')
+    post_save.connect(media_blobs.files_saved, sender=_model, dispatch_uid=f'media_blobs_saved_{_model.__name__}')
+    post_delete.connect(media_blobs.files_deleted, sender=_model, dispatch_uid=f'media_blobs_deleted_{_model.__name__}')
+
+# --- Dashboard cache invalidation (see my_app/dashboard_cache.py) ---
+
+# Review is included because views.dashboard lists recent reviews.
+for _model in (Order, ProductVariant, Product, Category, Review):
+    post_save.connect(dashboard_cache.invalidate_on_commit, sender=_model,
+                      dispatch_uid=f'dashboard_cache_saved_{_model.__name__}')
+    post_delete.connect(dashboard_cache.invalidate_on_commit, sender=_model,
+                        dispatch_uid=f'dashboard_cache_deleted_{_model.__name__}')
+
+
+# --- Category/Brand reference data (see my_app/reference_data.py) ---
+
+for _model in (Category, Brand):
+    post_save.connect(reference_data.invalidate_on_commit, sender=_model,
+                      dispatch_uid=f'reference_data_saved_{_model.__name__}')
+    post_delete.connect(reference_data.invalidate_on_commit, sender=_model,
+                        dispatch_uid=f'reference_data_deleted_{_model.__name__}')
@@ -0,0 +1,120 @@
+"""
+Content-addressed file storage for uploaded images (settings.STORAGES['default']).
+
+An uploaded file is streamed to a temporary file under MEDIA_ROOT/blobs while
+being hashed, then renamed to blobs/<aa>/<bb>/<sha256><ext>, where <ext> is the
+upload's lower-cased extension. If that blob already exists the copy is
+discarded, so identical uploads (the same photo under several names, a product
+image uploaded again on every edit) share one file, whatever model and
+upload_to they came from. The name only ever refers to those bytes, which is
+what lets media be served with immutable cache headers.
+
+The upload_to directories (products/, member_profiles/, ...) now only matter
+for files saved before this storage was enabled; `manage.py dedupe_media`
+moves those into blobs. Files saved under blobs/ (the thumbnails written by
+my_app/image_derivatives.py next to their original) are stored under their
+given name, and save_exact() stores a file under exactly the name it is given
+wherever it goes: the thumbnails of an original saved before the blobs
+(products/shirt.jpg -> products/shirt.thumb.jpg) must sit next to it, not be
+hashed into blobs/. Which model rows use a blob is counted in MediaBlob rows (see
+my_app/media_blobs.py).
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+
+BLOB_DIR = 'blobs'
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+# An original: blobs/aa/bb/<sha256><ext> (not a derivative such as <sha256>.thumb.webp).
+BLOB_ORIGINAL_RE = re.compile(rf'^{BLOB_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{64}}(\.[A-Za-z0-9]+)?$')
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(BLOB_DIR + '/')
+
+
+def is_blob_original(name):
+    """True for the name of uploaded bytes, which never changes content."""
+    return bool(BLOB_ORIGINAL_RE.match(name or ''))
+
+
+def blob_name(digest, ext):
+    return f"{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}"
+
+
+def blob_digest(name):
+    """Content digest of a blob or of one of its derivatives (blobs/aa/bb/<sha256>.thumb.webp)."""
+    return name.rsplit('/', 1)[-1].split('.', 1)[0]
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        if is_blob_name(name):
+            return super().get_available_name(name, max_length)
+        return name  # replaced by the content's name in _save; no need to probe for a free one
+
+    def _save(self, name, content):
+        if is_blob_name(name):
+            return super()._save(name, content)
+
+        blob_root = self.path(BLOB_DIR)
+        os.makedirs(blob_root, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=blob_root, prefix='.upload-')  # same filesystem: rename is atomic
+        try:
+            sha, size = hashlib.sha256(), 0
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks(HASH_CHUNK_SIZE):
+                    sha.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            name = blob_name(sha.hexdigest(), os.path.splitext(name)[1])
+
+            # Register before deciding whether the bytes are already stored: register() waits for
+            # a purge holding the blob's row and refreshes last_saved, so once it returns the blob
+            # can't be purged for the grace period, and an existing file is checked afterwards.
+            from my_app import media_blobs  # models aren't importable when the storage is first configured
+            media_blobs.register(name, sha.hexdigest(), size)
+
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.unlink(temp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.replace(temp_path, full_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return name
+
+    def save_exact(self, name, content):
+        """
+        Stores `content` under `name` itself, replacing any file there, without
+        content addressing or a MediaBlob row. Returns `name`.
+        """
+        validate_file_name(name, allow_relative_path=True)
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')  # readers never see a partial file
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks(HASH_CHUNK_SIZE):
+                    f.write(chunk)
+            os.replace(temp_path, full_path)
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return name
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404, redirect
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views.decorators.http import require_GET
+
+from my_app import avatars
+
+DEFAULT_MAX_AGE = 365 * 24 * 60 * 60
+UNVERSIONED_MAX_AGE = 5 * 60
+
+
+@require_GET
+def avatar(request, kind, pk, size):
+    """
+    The member's or customer's profile picture as a square of `size` px (see
+    my_app/avatars.py): WebP to browsers that accept it, JPEG otherwise.
+    Requests carrying the current `v` (as profile_picture_url does) are cached
+    for good by the browser; anything else only briefly.
+    """
+    model = avatars.AVATAR_MODELS.get(kind)
+    if model is None:
+        raise Http404('Unknown avatar kind')
+    owner = get_object_or_404(model.objects.only('pk', 'profile_picture'), pk=pk)
+    if not owner.profile_picture:
+        return redirect(owner.profile_picture_url)  # the default image
+
+    size = avatars.snap_size(size)
+    fmt = avatars.preferred_format(request)
+    try:
+        path, digest = avatars.get_avatar(owner.profile_picture, size, fmt)
+    except OSError:
+        raise Http404('Profile picture unavailable')
+
+    etag = f'"{digest[:20]}-{size}.{fmt}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(open(path, 'rb'), content_type=avatars.CONTENT_TYPES[fmt])
+    response['ETag'] = etag
+    if request.GET.get('v') == digest[:avatars.VERSION_LENGTH]:  # the token avatars.avatar_version() gives
+        max_age = getattr(settings, 'AVATAR_CACHE_MAX_AGE', DEFAULT_MAX_AGE)
+        response['Cache-Control'] = f'public, max-age={max_age}, immutable'
+    else:
+        response['Cache-Control'] = f'public, max-age={UNVERSIONED_MAX_AGE}'
+    patch_vary_headers(response, ('Accept',))
+    return response
@@ -5,15 +5,23 @@ from django.core.exceptions import ValidationError
 from django.db import IntegrityError
 
 from my_app.models import Brand  # Import your Brand model
+from my_app.pagination import paginate
+
+# Server-side sort options for the brand list: key -> (label, ordering)
+BRAND_SORT_OPTIONS = {
+    'name': ('Name (A-Z)', ['brand_name']),  # Brand.Meta.ordering
+    '-name': ('Name (Z-A)', ['-brand_name']),
+}
 
 
 def index(request):
     """
-    Renders the brand listing page, displaying all brands.
+    Renders the brand listing page, one keyset-paginated page of brands at a time.
     """
-    brands = Brand.objects.all().order_by('brand_name')
+    page = paginate(request, Brand.objects.all(), sort_options=BRAND_SORT_OPTIONS, default_sort='name')
     context = {
-        'brands': brands
+        'brands': page.object_list,
+        'page': page,
     }
     return render(request, "pages/brands/index.html", context)
 
@@ -8,18 +8,26 @@ from django.contrib import messages
 # --- MODELS IMPORTS ---
 # Explicitly import Category from my_app.models
 from my_app.models import Category
+from my_app.pagination import paginate
 
 
 # --- END MODELS IMPORTS ---
 
+# Server-side sort options for the category list: key -> (label, ordering)
+CATEGORY_SORT_OPTIONS = {
+    'name': ('Name (A-Z)', ['category_name']),  # Category.Meta.ordering
+    '-name': ('Name (Z-A)', ['-category_name']),
+}
+
 
 def index(request):
     """
-    Renders the categories listing page, displaying all categories.
+    Renders the categories listing page, one keyset-paginated page of categories at a time.
     """
-    categories = Category.objects.all().order_by('category_name')
+    page = paginate(request, Category.objects.all(), sort_options=CATEGORY_SORT_OPTIONS, default_sort='name')
     context = {
-        'categories': categories
+        'categories': page.object_list,
+        'page': page,
     }
     return render(request, "pages/categories/index.html", context)
 
@@ -4,23 +4,43 @@ from django.views.decorators.http import require_POST
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
 from django.utils import timezone  # For last_login
-from django.db.models import Sum, Avg, Max  # For calculating order statistics
-from decimal import Decimal  # NEW: Import Decimal for financial calculations
 
 # --- MODELS IMPORTS ---
 from my_app.models import Customer, Address, Order  # Assuming these models exist
+from my_app import customer_stats
+from my_app.pagination import paginate
 
 
 # --- END MODELS IMPORTS ---
 
+# Server-side sort options for the customer list: key -> (label, ordering)
+CUSTOMER_SORT_OPTIONS = {
+    'newest': ('Newest first', ['-registration_date']),  # Customer.Meta.ordering
+    'oldest': ('Oldest first', ['registration_date']),
+    'email': ('Email (A-Z)', ['email']),
+    'name': ('Last name (A-Z)', ['last_name', 'first_name']),
+}
+
+# Sort options for the order history on the customer detail page
+CUSTOMER_ORDER_SORT_OPTIONS = {
+    'newest': ('Newest first', ['-order_date']),  # order_customer_date_idx
+    'oldest': ('Oldest first', ['order_date']),
+    '-total': ('Total (high to low)', ['-total_amount']),
+}
+
+
+# Premium rule for customers not scored yet by `manage.py score_customers` (lifetime spend)
+PREMIUM_SPEND_THRESHOLD = 1000
+
 
 def index(request):
     """
-    Renders the customer listing page, displaying all customers.
+    Renders the customer listing page, one keyset-paginated page of customers at a time.
     """
-    customers = Customer.objects.all().order_by('-registration_date')
+    page = paginate(request, Customer.objects.all(), sort_options=CUSTOMER_SORT_OPTIONS, default_sort='newest')
     context = {
-        'customers': customers
+        'customers': page.object_list,
+        'page': page,
     }
     return render(request, "pages/customers/index.html", context)
 
@@ -46,7 +66,7 @@ def create_customer(request):
             errors['last_name'] = 'Last name is required.'
         if not email:
             errors['email'] = 'Email is required.'
-        elif Customer.objects.filter(email__iexact=email).exists():
+        elif Customer.objects.email_iexact(email).exists():
             errors['email'] = f'Customer with email "{email}" already exists.'
         if not password_hash:
             errors['password_hash'] = 'Password hash is required.'  # Reminder: Hash passwords securely!
@@ -126,7 +146,7 @@ def edit_customer(request, pk):
             errors['last_name'] = 'Last name is required.'
         if not email:
             errors['email'] = 'Email is required.'
-        elif Customer.objects.filter(email__iexact=email).exclude(pk=customer.pk).exists():
+        elif Customer.objects.email_iexact(email).exclude(pk=customer.pk).exists():
             errors['email'] = f'Customer with email "{email}" already exists.'
 
         if not errors:
@@ -204,26 +224,35 @@ def view_customer(request, pk):
     """
     Renders the customer detail page, displaying a single customer's information
     and their associated addresses, along with order history and statistics.
+    The statistics come from one aggregate query (or the customer's CustomerStats
+    summary, see my_app/customer_stats.py); the history is keyset-paginated and
+    annotated with item counts and discounts.
     """
-    customer = get_object_or_404(Customer, pk=pk)
+    # The one-to-one summaries (None when missing) come with the customer row
+    customer = get_object_or_404(Customer.objects.select_related('stats', 'preference_profile', 'value_score'), pk=pk)
     addresses = customer.addresses.all()  # Fetch all addresses related to the customer
 
-    # Fetch orders and calculate statistics
-    orders = customer.orders.all().order_by('-order_date')
-    total_orders = orders.count()
-    total_spent = orders.aggregate(Sum('total_amount'))['total_amount__sum'] or Decimal('0.00')
-    average_order = orders.aggregate(Avg('total_amount'))['total_amount__avg'] or Decimal('0.00')
-    last_order = orders.aggregate(Max('order_date'))['order_date__max']
+    stats = customer_stats.for_customer(customer)
+    # Computed in batch by `manage.py update_preference_profiles` (my_app/preferences.py)
+    profile = getattr(customer, 'preference_profile', None)
+    # RFM segment and lifetime value, scored in batch by `manage.py score_customers` (my_app/rfm.py)
+    value_score = getattr(customer, 'value_score', None)
+    orders = customer.orders.with_line_summary()
+    page = paginate(request, orders, sort_options=CUSTOMER_ORDER_SORT_OPTIONS, default_sort='newest')
 
     context = {
         'customer': customer,
         'addresses': addresses,
-        'orders': orders,  # Pass orders for the history table
-        'total_orders': total_orders,
-        'total_spent': total_spent,
-        'average_order': average_order,
-        'last_order': last_order,
-        'is_premium_customer': total_spent >= 1000,  # Example logic for premium customer
-        'shopping_preferences': "Dresses, Casual Wear, Size M",  # Placeholder for now
+        'orders': page.object_list,  # Current page of the order history table
+        'page': page,
+        'total_orders': stats['total_orders'],
+        'total_spent': stats['total_spent'],
+        'average_order': stats['average_order'],
+        'last_order': stats['last_order'],
+        'value_score': value_score,
+        'is_premium_customer': (value_score.is_premium if value_score is not None
+                                else stats['total_spent'] >= PREMIUM_SPEND_THRESHOLD),
+        'preference_profile': profile,
+        'shopping_preferences': profile.summary() if profile else None,
     }
     return render(request, "pages/customers/detail.html", context)
@@ -1,49 +1,26 @@
+from decimal import Decimal
+
 from django.shortcuts import render
-from django.db.models import Sum, F
 from django.utils import timezone
-from datetime import timedelta, date
 
 # --- MODELS IMPORTS ---
-from my_app.models import Order, ProductVariant, Product, Category # Assuming these models exist
+from my_app.models import Order, Product, Category # Assuming these models exist
 # --- END MODELS IMPORTS ---
+from my_app import dashboard_cache
+from my_app.kpis import get_dashboard_kpis, percentage_change
 
+# This dashboard's stock alert counts variants with fewer than 10 in stock
+# (not products at LOW_STOCK_THRESHOLD, as the home dashboard in views.py does).
+LOW_STOCK_BELOW = 10
 
-def dashboard(request):
+
+def build_dashboard_context():
     """
-    Renders the admin dashboard with dynamic data fetched from the database.
-    Includes sales summary, order overview, stock alerts, and recent activities.
-    Also includes total product and category counts.
+    Builds the shared (not per-user) part of the dashboard context:
+    sales summary, order overview, stock alerts, recent activities and counts.
     """
-    today = date.today()
-    thirty_days_ago = today - timedelta(days=30)
-    sixty_days_ago = today - timedelta(days=60)
-
-    # --- Sales Summary ---
-    total_sales_last_30_days = Order.objects.filter(
-        order_date__date__gte=thirty_days_ago
-    ).aggregate(total=Sum('total_amount'))['total'] or 0
-
-    total_sales_prev_30_days = Order.objects.filter(
-        order_date__date__gte=sixty_days_ago,
-        order_date__date__lt=thirty_days_ago
-    ).aggregate(total=Sum('total_amount'))['total'] or 0
-
-    sales_percentage_change = 0
-    if total_sales_prev_30_days > 0:
-        sales_percentage_change = ((total_sales_last_30_days - total_sales_prev_30_days) / total_sales_prev_30_days) * 100
-
-    # --- Orders Overview ---
-    new_orders_today = Order.objects.filter(order_date__date=today).count()
-    pending_orders = Order.objects.filter(order_status='PENDING').count()
-    shipped_orders = Order.objects.filter(order_status='SHIPPED').count()
-
-    # --- Product Stock Alerts ---
-    # Assuming "low stock" is defined as quantity_in_stock less than 10
-    low_stock_products_count = ProductVariant.objects.filter(quantity_in_stock__lt=10).count()
-
-    # --- Total Counts ---
-    total_products_count = Product.objects.count()
-    total_categories_count = Category.objects.count()
+    # --- KPIs: one conditional-aggregation query for all order metrics (see my_app/kpis.py) ---
+    kpis = get_dashboard_kpis(low_stock_threshold=LOW_STOCK_BELOW - 1)
 
     # --- Recent Activity (Simplified for common actions) ---
     # Fetching recent orders and products
@@ -93,21 +70,32 @@ def dashboard(request):
     recent_activities.sort(key=lambda x: x['date'], reverse=True)
     recent_activities = recent_activities[:5] # Limit to top 5 after combining and sorting
 
-    # Retrieve SweetAlert flags from session and remove them
-    login_success = request.session.pop('login_success', False)
-    logged_in_username = request.session.pop('logged_in_username', '')
-
-    context = {
-        'total_sales_last_30_days': total_sales_last_30_days,
-        'sales_percentage_change': sales_percentage_change,
-        'new_orders_today': new_orders_today,
-        'pending_orders': pending_orders,
-        'shipped_orders': shipped_orders,
-        'low_stock_products_count': low_stock_products_count,
-        'total_products_count': total_products_count, # Added total products count
-        'total_categories_count': total_categories_count, # Added total categories count
+    return {
+        'total_sales_last_30_days': kpis['sales_last_30_days'],
+        # No previous sales: 0%, not the +100% of the home dashboard
+        'sales_percentage_change': percentage_change(
+            kpis['sales_last_30_days'], kpis['sales_prev_30_days'], from_zero=Decimal('0.00')
+        ),
+        'new_orders_today': kpis['new_orders_today'],
+        'pending_orders': kpis['pending_orders'],
+        'shipped_orders': kpis['shipped_orders'],
+        'low_stock_products_count': kpis['low_stock_variants_count'],
+        'total_products_count': kpis['total_products_count'], # Added total products count
+        'total_categories_count': kpis['total_categories_count'], # Added total categories count
         'recent_activities': recent_activities,
-        'login_success': login_success, # Pass to template
-        'logged_in_username': logged_in_username, # Pass to template
     }
+
+
+def dashboard(request):
+    """
+    Renders the admin dashboard with dynamic data fetched from the database.
+    Includes sales summary, order overview, stock alerts, and recent activities.
+    Also includes total product and category counts.
+    The shared part of the context is cached (see my_app/dashboard_cache.py).
+    """
+    context = dict(dashboard_cache.get_context('dashboard', build_dashboard_context))
+
+    # Retrieve SweetAlert flags from session and remove them (per user: never cached)
+    context['login_success'] = request.session.pop('login_success', False)
+    context['logged_in_username'] = request.session.pop('logged_in_username', '')
     return render(request, "pages/dashboard.html", context)
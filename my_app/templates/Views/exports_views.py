@@ -0,0 +1,36 @@
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from my_app import exports
+
+
+@login_required
+@require_GET
+def export(request, name):
+    """
+    Streams one of the exports (see my_app/exports.py) as a CSV download.
+    Staff only: the exports hold customer emails and every order.
+
+    Query parameters: `from` / `to` (YYYY-MM-DD, inclusive), `status` and
+    `gzip=1` for a gzip-compressed file.
+    """
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    compress = request.GET.get('gzip') in ('1', 'true', 'yes')
+    try:
+        export_def = exports.get_export(name)
+        queryset = export_def.queryset(
+            date_from=exports.parse_filter_date(request.GET.get('from'), 'from'),
+            date_to=exports.parse_filter_date(request.GET.get('to'), 'to'),
+            status=request.GET.get('status', '').strip().lower() or None,
+        )
+    except exports.ExportError as e:
+        return HttpResponseBadRequest(str(e))
+
+    response = StreamingHttpResponse(
+        exports.iter_bytes(exports.iter_csv(export_def, queryset), compress=compress),
+        content_type='application/gzip' if compress else 'text/csv; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{exports.filename(name, compress)}"'
+    return response
@@ -2,15 +2,27 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.db.models import F
 from django.contrib import messages
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError, transaction  # Import transaction
+from django.db import IntegrityError
 from django.views.decorators.http import require_POST  # Import for delete view
+from django.http import JsonResponse
+import json
 
 # --- MODELS IMPORTS ---
-from my_app.models import ProductVariant, Product, Category, Brand  # Assuming these models exist
+from my_app.models import ProductVariant, Product, Category, Brand, LOW_STOCK_THRESHOLD
+from my_app.pagination import paginate
+from my_app import lookups, variants
 
 
 # --- END MODELS IMPORTS ---
 
+# Server-side sort options for the inventory list: key -> (label, ordering)
+VARIANT_SORT_OPTIONS = {
+    'product': ('Product', ['product__product_name', 'color', 'size']),  # ProductVariant.Meta.ordering
+    'stock': ('Stock (low to high)', ['quantity_in_stock']),
+    '-stock': ('Stock (high to low)', ['-quantity_in_stock']),
+    'sku': ('SKU', ['sku']),
+}
+
 
 def index(request):
     """
@@ -19,60 +31,64 @@ def index(request):
     """
     # Fetch all ProductVariants and prefetch related Product, Category, and Brand
     # This reduces the number of database queries for related data
-    variants = ProductVariant.objects.select_related('product', 'product__category', 'product__brand').order_by(
-        'product__product_name', 'color', 'size')
+    variants = ProductVariant.objects.select_related('product', 'product__category', 'product__brand')
+    page = paginate(request, variants, sort_options=VARIANT_SORT_OPTIONS, default_sort='product')
 
     context = {
-        'variants': variants,
-        'low_stock_threshold': 10,  # Define a threshold for highlighting low stock
+        'variants': page.object_list,
+        'page': page,
+        'low_stock_threshold': LOW_STOCK_THRESHOLD,  # Threshold for highlighting low stock
     }
     return render(request, "pages/inventory/index.html", context)
 
 
+def _parse_ids(values):
+    """Integer ids from a list of strings; None if any of them isn't a number."""
+    try:
+        return [int(value) for value in values]
+    except (TypeError, ValueError):
+        return None
+
+
 def create_variant(request):
     """
-    Handles POST requests to create new product variants based on multiple size selections.
-    Manually validates data and saves variants.
+    Handles POST requests to create new product variants for every selected
+    product x color x size combination (see my_app/variants.py).
+    Manually validates data, then creates all non-conflicting variants in bulk.
     If successful, redirects to the inventory index. If not, re-renders the create page with errors.
     """
-    products = Product.objects.all().order_by('product_name')  # Fetch all products for dropdown
+    # Products are picked through the JSON product lookup (lookups_views), not a full dropdown
 
     # Define size and color options here to pass to the template
-    size_options = ['S', 'M', 'L', 'XL', 'XXL']
-    color_options = ['Red', 'Blue', 'Green', 'Black', 'White', 'Gray']
+    size_options = variants.SIZE_OPTIONS
+    color_options = variants.COLOR_OPTIONS
 
     if request.method == "POST":
-        product_id = request.POST.get("product")
-        color = request.POST.get("color", "").strip()  # Now from a dropdown
+        product_ids = request.POST.getlist("product")  # One or more selected products
+        colors = [c.strip() for c in request.POST.getlist("color") if c.strip()]  # One or more colors
         sizes = request.POST.getlist("size")  # Get list of selected sizes
         quantity_in_stock = request.POST.get("quantity_in_stock", "").strip()
 
         errors = {}
-        selected_product = None
-        variants_to_create = []  # List to hold variant data before saving
-
-        # Manual Validation for Product and Color (needed for SKU generation)
-        if not product_id:
-            errors['product'] = 'Product is required.'
-        else:
-            try:
-                selected_product = Product.objects.get(pk=product_id)
-            except Product.DoesNotExist:
-                errors['product'] = 'Selected product does not exist.'
-
-        if not color:
-            errors['color'] = 'Color cannot be empty.'
-        elif color not in color_options:  # Validate selected color against predefined options
+        conflicts = []
+
+        # Manual Validation for Products, Colors and Sizes (needed for SKU generation)
+        parsed_product_ids = _parse_ids(product_ids)
+        if not product_ids:
+            errors['product'] = 'At least one product is required.'
+        elif parsed_product_ids is None or \
+                variants.existing_product_ids(parsed_product_ids) != set(parsed_product_ids):
+            errors['product'] = 'Selected product does not exist.'
+
+        if not colors:
+            errors['color'] = 'At least one color must be selected.'
+        elif any(c not in color_options for c in colors):  # Validate selected colors against predefined options
             errors['color'] = 'Invalid color selected.'
 
         if not sizes:  # Validate that at least one size is selected
             errors['size'] = 'At least one size must be selected.'
-        else:
-            # Validate each selected size against predefined options
-            for s in sizes:
-                if s not in size_options:
-                    errors['size'] = 'Invalid size(s) selected.'
-                    break  # Stop checking if one invalid size is found
+        elif any(s not in size_options for s in sizes):  # Validate each selected size against predefined options
+            errors['size'] = 'Invalid size(s) selected.'
 
         if not quantity_in_stock:
             errors['quantity_in_stock'] = 'Quantity cannot be empty.'
@@ -84,67 +100,21 @@ def create_variant(request):
             except ValueError:
                 errors['quantity_in_stock'] = 'Quantity must be a valid number.'
 
-        # If initial validations pass, prepare variants and check SKUs
-        if not errors and selected_product and color:
-            for size_item in sizes:
-                # Format product ID to be zero-padded, e.g., 001, 010
-                formatted_product_id = str(selected_product.product_id).zfill(3)
-                # Sanitize color and size for SKU
-                sanitized_color = ''.join(filter(str.isalnum, color)).replace(' ', '')  # Remove spaces too
-                sanitized_size = ''.join(filter(str.isalnum, size_item)).replace(' ', '')  # Remove spaces too
-
-                generated_sku = f"PROD{formatted_product_id}-{sanitized_color}-{sanitized_size}"
-
-                # Check if this specific generated SKU already exists
-                if ProductVariant.objects.filter(sku=generated_sku).exists():
-                    errors[
-                        'sku'] = f'SKU "{generated_sku}" for size {size_item} already exists. Please choose a different color/size combination for this product.'
-                    break  # Stop processing if a duplicate SKU is found
-
-                variants_to_create.append({
-                    'product': selected_product,
-                    'color': color,
-                    'size': size_item,
-                    'sku': generated_sku,
-                    'quantity_in_stock': quantity_in_stock
-                })
-        elif not errors:  # If no errors but product/color are missing, add SKU generation error
-            if not selected_product:
-                errors['sku'] = 'Cannot generate SKU: A valid product must be selected.'
-            if not color:
-                errors['sku'] = (errors.get('sku', '') + ' ' if errors.get(
-                    'sku') else '') + 'Cannot generate SKU: Color cannot be empty.'
-
         if not errors:  # Proceed only if no validation errors so far
             try:
-                with transaction.atomic():  # Ensure all variants are created or none are
-                    for variant_data in variants_to_create:
-                        variant = ProductVariant(
-                            product=variant_data['product'],
-                            color=variant_data['color'],
-                            size=variant_data['size'],
-                            sku=variant_data['sku'],
-                            quantity_in_stock=variant_data['quantity_in_stock']
-                        )
-                        variant.full_clean()  # Run model's clean method for field validation
-                        variant.save()
-                messages.success(request, f'Successfully added {len(variants_to_create)} product variant(s)!')
-                return redirect('inventory_index')
-            except ValidationError as e:
-                # Map Django's ValidationError messages back to the form fields
-                for field, field_errors in e.message_dict.items():
-                    if field == 'sku' and 'sku' not in errors:  # Don't overwrite existing SKU errors
-                        errors['sku'] = field_errors[0]
-                    elif field != 'sku':  # For other fields, just add the error
-                        errors[field] = field_errors[0]
+                result = variants.create_variant_matrix(parsed_product_ids, colors, sizes, quantity_in_stock)
+                conflicts = result.conflict_messages()
+                if result.created:
+                    messages.success(request, f'Successfully added {len(result.created)} product variant(s)!')
+                    if conflicts:
+                        messages.warning(request, f'Skipped {len(conflicts)} existing combination(s): '
+                                                  + '; '.join(conflicts))
+                    return redirect('inventory_index')
+                errors['sku'] = 'All selected color/size combinations already exist for the selected product(s).'
                 messages.error(request, 'Error creating product variant. Please check the form.')
             except IntegrityError as e:
-                # Catch database integrity errors (e.g., unique constraints)
-                if 'unique constraint' in str(e).lower() and 'sku' in str(e).lower():
-                    errors[
-                        'sku'] = 'One or more generated SKUs already exist. Please choose a different color/size combination for the product.'
-                else:
-                    errors['__all__'] = f"An unexpected database error occurred: {str(e)}"
+                # Catch database integrity errors (e.g., a concurrent insert of the same SKU)
+                errors['__all__'] = f"An unexpected database error occurred: {str(e)}"
                 messages.error(request, 'Error creating product variant. Please check the form.')
             except Exception as e:
                 # Catch any other unexpected errors
@@ -153,16 +123,17 @@ def create_variant(request):
 
         # If there are errors, re-render the form with entered data and errors
         context = {
-            'products': products,
+            'selected': {'product': lookups.selection_for(Product, product_ids)},
             'size_options': size_options,  # Pass size options to template
             'color_options': color_options,  # Pass color options to template
             'variant_data': {
-                'product_id': product_id,
-                'color': color,
+                'product_ids': product_ids,  # Pass the list of selected products back
+                'colors': colors,  # Pass the list of selected colors back
                 'size': sizes,  # Pass the list of selected sizes back
                 'sku': errors.get('sku', ''),  # Only pass SKU error if it exists, as it's generated
                 'quantity_in_stock': request.POST.get("quantity_in_stock", "")
             },
+            'conflicts': conflicts,  # Per-cell conflicts ("SKU (color / size): reason")
             'errors': errors,
             'general_error': errors.get('__all__'),
         }
@@ -170,24 +141,93 @@ def create_variant(request):
     else:
         # For GET request, render the empty create form
         context = {
-            'products': products,
+            'selected': {'product': []},
             'size_options': size_options,  # Pass size options to template
             'color_options': color_options,  # Pass color options to template
-            'variant_data': {'size': []},  # Initialize size as an empty list for GET requests
+            'variant_data': {'product_ids': [], 'colors': [], 'size': []},  # Empty selections for GET requests
+            'conflicts': [],
             'errors': {},
             'general_error': None,
         }
         return render(request, "pages/inventory/create_variant.html", context)
 
 
+def _is_integer(value):
+    """True for a JSON integer: bool is an int subclass in Python, but not a valid id or quantity."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+@require_POST
+def variant_matrix(request):
+    """
+    JSON API for bulk variant creation:
+      POST {"products": [ids], "colors": [...], "sizes": [...],
+            "quantity_in_stock": 0, "dry_run": false}
+    Responds with the created variants and the conflicting cells, each with its
+    reason (201 if anything was created, 200 otherwise, 400 on invalid input).
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'errors': {'__all__': 'Request body must be JSON.'}}, status=400)
+
+    if not isinstance(payload, dict):
+        return JsonResponse({'errors': {'__all__': 'Request body must be a JSON object.'}}, status=400)
+
+    errors = {}
+    for field in ('products', 'colors', 'sizes'):
+        if not isinstance(payload.get(field) or [], list):
+            errors[field] = f'"{field}" must be a list.'
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+
+    product_ids = payload.get('products') or []
+    colors = [c.strip() for c in payload.get('colors') or [] if isinstance(c, str) and c.strip()]
+    sizes = [s.strip() for s in payload.get('sizes') or [] if isinstance(s, str) and s.strip()]
+    quantity_in_stock = payload.get('quantity_in_stock', 0)
+
+    if not product_ids:
+        errors['products'] = 'At least one product id is required.'
+    elif not all(_is_integer(pk) for pk in product_ids):
+        errors['products'] = 'Product ids must be integers.'
+    else:
+        missing = set(product_ids) - variants.existing_product_ids(product_ids)
+        if missing:
+            errors['products'] = f'Unknown product id(s): {", ".join(str(pk) for pk in sorted(missing))}.'
+    if len(colors) != len(payload.get('colors') or []):
+        errors['colors'] = 'Colors must be non-empty strings.'
+    elif not colors:
+        errors['colors'] = 'At least one color is required.'
+    elif any(len(c) > 50 for c in colors):
+        errors['colors'] = 'Colors can be at most 50 characters.'
+    if len(sizes) != len(payload.get('sizes') or []):
+        errors['sizes'] = 'Sizes must be non-empty strings.'
+    elif not sizes:
+        errors['sizes'] = 'At least one size is required.'
+    elif any(len(s) > 50 for s in sizes):
+        errors['sizes'] = 'Sizes can be at most 50 characters.'
+    if not _is_integer(quantity_in_stock):
+        errors['quantity_in_stock'] = 'Quantity must be an integer (not a boolean, decimal or string).'
+    elif quantity_in_stock < 0:
+        errors['quantity_in_stock'] = 'Quantity must be a non-negative integer.'
+    if not isinstance(payload.get('dry_run', False), bool):
+        errors['dry_run'] = '"dry_run" must be true or false.'
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+
+    result = variants.create_variant_matrix(
+        product_ids, colors, sizes, quantity_in_stock, dry_run=bool(payload.get('dry_run'))
+    )
+    return JsonResponse(result.as_dict(), status=201 if result.created and not payload.get('dry_run') else 200)
+
+
 def edit_variant(request, pk):
     """
     Handles GET and POST requests for editing an existing product variant.
     """
-    variant = get_object_or_404(ProductVariant, pk=pk)
-    products = Product.objects.all().order_by('product_name')
-    size_options = ['S', 'M', 'L', 'XL', 'XXL']
-    color_options = ['Red', 'Blue', 'Green', 'Black', 'White', 'Gray']
+    variant = get_object_or_404(ProductVariant.objects.select_related('product'), pk=pk)
+    size_options = variants.SIZE_OPTIONS
+    color_options = variants.COLOR_OPTIONS
 
     if request.method == "POST":
         product_id = request.POST.get("product")
@@ -231,10 +271,7 @@ def edit_variant(request, pk):
         generated_sku = ""
         if selected_product and color and size and not errors.get('product') and not errors.get(
                 'color') and not errors.get('size'):
-            formatted_product_id = str(selected_product.product_id).zfill(3)
-            sanitized_color = ''.join(filter(str.isalnum, color)).replace(' ', '')
-            sanitized_size = ''.join(filter(str.isalnum, size)).replace(' ', '')
-            generated_sku = f"PROD{formatted_product_id}-{sanitized_color}-{sanitized_size}"
+            generated_sku = variants.generate_sku(selected_product.product_id, color, size)
 
             # Check if the generated SKU already exists for *other* variants
             if ProductVariant.objects.filter(sku=generated_sku).exclude(pk=variant.pk).exists():
@@ -280,7 +317,7 @@ def edit_variant(request, pk):
 
         context = {
             'variant': variant,  # Pass the original variant object for context
-            'products': products,
+            'selected': {'product': lookups.selection(selected_product)},
             'size_options': size_options,
             'color_options': color_options,
             'variant_data': {  # Data for pre-filling form fields
@@ -298,7 +335,7 @@ def edit_variant(request, pk):
         # GET request: Pre-fill form with existing variant data
         context = {
             'variant': variant,
-            'products': products,
+            'selected': {'product': lookups.selection(variant.product)},
             'size_options': size_options,
             'color_options': color_options,
             'variant_data': {
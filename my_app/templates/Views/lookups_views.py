@@ -0,0 +1,39 @@
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from my_app import lookups
+
+
+# JSON endpoints for the autocomplete fields (pages/lookup_field.html).
+# All take `q` (prefix) and an optional `limit` (capped at lookups.MAX_LIMIT)
+# and return {"results": [{"id", "label", "meta"?, ...}]}.
+
+@require_GET
+def customers(request):
+    results = lookups.search_customers(request.GET.get('q', ''), lookups.clamp_limit(request.GET.get('limit')))
+    return JsonResponse({'results': results})
+
+
+@require_GET
+def addresses(request):
+    """Addresses of the customer given by `customer` (required)."""
+    try:
+        customer_id = int(request.GET.get('customer', ''))
+    except ValueError:
+        return JsonResponse({'results': []})
+    results = lookups.search_addresses(customer_id, request.GET.get('q', ''),
+                                       lookups.clamp_limit(request.GET.get('limit')))
+    return JsonResponse({'results': results})
+
+
+@require_GET
+def products(request):
+    results = lookups.search_products(request.GET.get('q', ''), lookups.clamp_limit(request.GET.get('limit')))
+    return JsonResponse({'results': results})
+
+
+@require_GET
+def variants(request):
+    """Variants by SKU or product name prefix."""
+    results = lookups.search_variants(request.GET.get('q', ''), lookups.clamp_limit(request.GET.get('limit')))
+    return JsonResponse({'results': results})
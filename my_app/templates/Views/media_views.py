@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+
+from my_app import media_serving
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    An uploaded file under MEDIA_ROOT, sent by the worker or handed to the
+    front-end server per settings.MEDIA_SERVE_MODE (see my_app/media_serving.py).
+    """
+    resolved = media_serving.resolve(settings.MEDIA_ROOT, path)
+    if resolved is None:
+        raise Http404('No such media file')
+    full_path, stat = resolved
+    headers = media_serving.validator_headers(path, stat)
+
+    not_modified = get_conditional_response(request, etag=headers['ETag'], last_modified=int(stat.st_mtime))
+    if not_modified is not None:  # 304 (or 412 for a failed If-Match)
+        for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+            not_modified[header] = headers[header]
+        return not_modified
+
+    content_type = media_serving.content_type(full_path)
+    offload = media_serving.offload_header(path, full_path)
+    if offload is not None:
+        response = HttpResponse(content_type=content_type)  # the front-end server sends the body, ranges included
+        response[offload[0]] = offload[1]
+    else:
+        byte_range = None
+        if media_serving.if_range_matches(request, stat):
+            byte_range = media_serving.requested_range(request.headers.get('Range'), stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if byte_range is None:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(media_serving.read_range(full_path, start, end), status=206,
+                                             content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(end - start + 1)
+    for header, value in headers.items():
+        response[header] = value
+    return response
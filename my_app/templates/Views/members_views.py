@@ -13,19 +13,27 @@ import datetime # Import datetime for date parsing
 # If models.py is in the same directory as this views file (less common for app views),
 # then 'from .models import Member' would be used.
 from my_app.models import Member
+from my_app.pagination import paginate
+
+# Server-side sort options for the member list: key -> (label, ordering)
+MEMBER_SORT_OPTIONS = {
+    'joined': ('Date joined', ['created_at']),
+    'name': ('Name (A-Z)', ['last_name', 'first_name']),  # Member.Meta.ordering
+    'email': ('Email (A-Z)', ['email']),
+}
 
 
 # --- LIST VIEW ---
 @login_required
 def index(request):
     """
-    Renders the member listing page, displaying all members.
-    The 'members' queryset is ordered by their creation date.
+    Renders the member listing page, one keyset-paginated page of members at a time.
+    Members are ordered by their creation date unless another sort is requested.
     """
-    # Fetch all Member objects from the database
-    members = Member.objects.all().order_by('created_at')
+    page = paginate(request, Member.objects.all(), sort_options=MEMBER_SORT_OPTIONS, default_sort='joined')
     context = {
-        'members': members
+        'members': page.object_list,
+        'page': page,
     }
     return render(request, "pages/members/index.html", context)
 
@@ -60,7 +68,7 @@ def create_member(request):
 
         if not member_data['email']:
             errors['email'] = 'Email is required.'
-        elif Member.objects.filter(email__iexact=member_data['email']).exists():
+        elif Member.objects.email_iexact(member_data['email']).exists():
             errors['email'] = f'Member with email "{member_data["email"]}" already exists.'
 
         # Validate and parse date_of_birth
@@ -152,7 +160,7 @@ def edit_member(request, pk):
         if not member_data['email']:
             errors['email'] = 'Email is required.'
         # Check for email uniqueness, excluding the current member's own email
-        elif Member.objects.filter(email__iexact=member_data['email']).exclude(pk=member.pk).exists():
+        elif Member.objects.email_iexact(member_data['email']).exclude(pk=member.pk).exists():
             errors['email'] = f'Member with email "{member_data["email"]}" already exists.'
 
         # Validate and parse date_of_birth
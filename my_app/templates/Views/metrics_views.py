@@ -0,0 +1,12 @@
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from my_app import metrics
+
+
+@require_GET
+def metrics_view(request):
+    """Per-view request metrics in the Prometheus text format (see my_app/metrics.py)."""
+    if not metrics.can_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
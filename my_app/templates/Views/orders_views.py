@@ -3,23 +3,60 @@ from django.contrib import messages
 from django.views.decorators.http import require_POST
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F
 from decimal import Decimal, InvalidOperation
 
 # --- MODELS IMPORTS ---
 from my_app.models import Order, Customer, Address, ProductVariant, OrderItem, ORDER_STATUS_CHOICES, \
     PAYMENT_STATUS_CHOICES
+from my_app.pagination import paginate
+from my_app import inventory, lookups, pricing
 
 
 # --- END MODELS IMPORTS ---
 
+# Server-side sort options for the order list: key -> (label, ordering)
+ORDER_SORT_OPTIONS = {
+    'newest': ('Newest first', ['-order_date']),  # Order.Meta.ordering
+    'oldest': ('Oldest first', ['order_date']),
+    '-total': ('Total (high to low)', ['-total_amount']),
+    'total': ('Total (low to high)', ['total_amount']),
+}
+
+
+def _selected(customer=None, shipping_address=None, billing_address=None):
+    """Current values of the order form's lookup fields (see my_app/lookups.py)."""
+    return {
+        'customer': lookups.selection(customer),
+        'shipping_address': lookups.selection(shipping_address),
+        'billing_address': lookups.selection(billing_address),
+    }
+
 
 def index(request):
     """
-    Renders the order listing page, displaying all orders.
+    Renders the order listing page, one keyset-paginated page of orders at a time.
+    Optional `status` / `payment` filters are served by the (status, order_date) indexes.
     """
-    orders = Order.objects.select_related('customer', 'shipping_address', 'billing_address').order_by('-order_date')
+    orders = Order.objects.select_related('customer', 'shipping_address', 'billing_address')
+
+    # --- Filtering Logic ---
+    status = request.GET.get('status')
+    payment = request.GET.get('payment')
+    if status in dict(ORDER_STATUS_CHOICES):
+        orders = orders.filter(order_status=status)
+    if payment in dict(PAYMENT_STATUS_CHOICES):
+        orders = orders.filter(payment_status=payment)
+    # --- End Filtering Logic ---
+
+    page = paginate(request, orders, sort_options=ORDER_SORT_OPTIONS, default_sort='newest')
     context = {
-        'orders': orders
+        'orders': page.object_list,
+        'page': page,
+        'order_status_choices': ORDER_STATUS_CHOICES,
+        'payment_status_choices': PAYMENT_STATUS_CHOICES,
+        'current_status': status,
+        'current_payment': payment,
     }
     return render(request, "pages/orders/index.html", context)
 
@@ -29,10 +66,8 @@ def create_order(request):
     Handles GET and POST requests for creating a new order.
     Focuses on main order details. Redirects to edit page after creation to add items.
     """
-    customers = Customer.objects.all().order_by('first_name', 'last_name')
-    # For addresses, we'll need to filter by customer later, or provide a generic list
-    # For simplicity, initially show all addresses, or handle dynamically with JS
-    addresses = Address.objects.all().order_by('address_line1')
+    # Customers and addresses are picked through the JSON lookups (lookups_views)
+    # instead of rendering every row into the form.
 
     if request.method == "POST":
         customer_id = request.POST.get("customer")
@@ -98,8 +133,7 @@ def create_order(request):
                 errors['__all__'] = f'An unexpected error occurred: {str(e)}'
 
         context = {
-            'customers': customers,
-            'addresses': addresses,  # Pass all addresses for now
+            'selected': _selected(selected_customer, selected_shipping_address, selected_billing_address),
             'order_status_choices': ORDER_STATUS_CHOICES,
             'payment_status_choices': PAYMENT_STATUS_CHOICES,
             'order_data': {
@@ -117,8 +151,7 @@ def create_order(request):
         return render(request, "pages/orders/create.html", context)
     else:
         context = {
-            'customers': customers,
-            'addresses': addresses,
+            'selected': _selected(),
             'order_status_choices': ORDER_STATUS_CHOICES,
             'payment_status_choices': PAYMENT_STATUS_CHOICES,
             'order_data': {},
@@ -134,9 +167,11 @@ def edit_order(request, pk):
     Allows updating main order details and managing order items.
     """
     order = get_object_or_404(Order.objects.select_related('customer', 'shipping_address', 'billing_address'), pk=pk)
-    customers = Customer.objects.all().order_by('first_name', 'last_name')
-    addresses = Address.objects.all().order_by('address_line1')  # All addresses for selection
-    order_items = order.items.select_related('variant__product').all()  # Fetch existing items
+    # Existing items, with each line's subtotal computed by the database
+    order_items = order.items.select_related('variant__product').annotate(
+        line_total=ExpressionWrapper(F('quantity') * F('price_at_purchase'),
+                                     output_field=DecimalField(max_digits=12, decimal_places=2))
+    )
 
     if request.method == "POST":
         customer_id = request.POST.get("customer")
@@ -187,14 +222,24 @@ def edit_order(request, pk):
                 order.shipping_method = shipping_method if shipping_method else None
                 order.tracking_number = tracking_number if tracking_number else None
                 order.full_clean()
-                order.save()
-
-                # Recalculate total_amount after potential item changes (or just save if no items changed here)
-                order.total_amount = sum(item.quantity * item.price_at_purchase for item in order.items.all())
-                order.save()
+                with transaction.atomic():
+                    # Cancelling releases the items' stock; re-opening reserves it again
+                    inventory.change_order_status(order, order_status)
+                    # total_amount is maintained by my_app/pricing.py on item changes; don't
+                    # overwrite it with the value loaded at the start of this request
+                    order.save(update_fields=[
+                        'customer', 'shipping_address', 'billing_address', 'order_status',
+                        'payment_status', 'shipping_method', 'tracking_number',
+                    ])
 
                 messages.success(request, f'Order #{order.order_id} updated successfully!')
                 return redirect('order_edit', pk=order.pk)  # Stay on edit page
+            except inventory.InsufficientStock as e:
+                errors['order_status'] = (
+                    f'Cannot re-open this order: not enough stock left for one of its items '
+                    f'(only {e.available} available).'
+                )
+                messages.error(request, 'Error updating order. Please check the form.')
             except ValidationError as e:
                 for field, field_errors in e.message_dict.items():
                     errors[field] = field_errors[0]
@@ -205,8 +250,7 @@ def edit_order(request, pk):
 
         context = {
             'order': order,
-            'customers': customers,
-            'addresses': addresses,
+            'selected': _selected(selected_customer, selected_shipping_address, selected_billing_address),
             'order_items': order_items,
             'order_status_choices': ORDER_STATUS_CHOICES,
             'payment_status_choices': PAYMENT_STATUS_CHOICES,
@@ -226,8 +270,7 @@ def edit_order(request, pk):
     else:
         context = {
             'order': order,
-            'customers': customers,
-            'addresses': addresses,
+            'selected': _selected(order.customer, order.shipping_address, order.billing_address),
             'order_items': order_items,
             'order_status_choices': ORDER_STATUS_CHOICES,
             'payment_status_choices': PAYMENT_STATUS_CHOICES,
@@ -254,7 +297,9 @@ def delete_order(request, pk):
     try:
         order = get_object_or_404(Order, pk=pk)
         order_id = order.order_id
-        order.delete()
+        with transaction.atomic():
+            inventory.release_order(order)
+            order.delete()
         messages.success(request, f'Order #{order_id} deleted successfully!')
     except Exception as e:
         messages.error(request, f'Error deleting order: {str(e)}')
@@ -266,8 +311,6 @@ def add_order_item(request, order_pk):
     Handles GET and POST requests for adding an item to an existing order.
     """
     order = get_object_or_404(Order, pk=order_pk)
-    product_variants = ProductVariant.objects.select_related('product').order_by('product__product_name', 'color',
-                                                                                 'size')
 
     if request.method == "POST":
         variant_id = request.POST.get("variant")
@@ -280,7 +323,7 @@ def add_order_item(request, order_pk):
             errors['variant'] = 'Product variant is required.'
         else:
             try:
-                selected_variant = ProductVariant.objects.get(pk=variant_id)
+                selected_variant = ProductVariant.objects.select_related('product').get(pk=variant_id)
             except ProductVariant.DoesNotExist:
                 errors['variant'] = 'Selected product variant does not exist.'
 
@@ -299,6 +342,10 @@ def add_order_item(request, order_pk):
         if not errors:
             try:
                 with transaction.atomic():
+                    # Take the stock first: the conditional UPDATE fails instead of overselling
+                    if inventory.order_holds_stock(order):
+                        inventory.reserve(selected_variant.pk, quantity)
+
                     # Check if item already exists in order, update quantity if so
                     order_item, created = OrderItem.objects.get_or_create(
                         order=order,
@@ -309,16 +356,17 @@ def add_order_item(request, order_pk):
                         }
                     )
                     if not created:
-                        order_item.quantity += quantity
-                        order_item.save()
+                        OrderItem.objects.filter(pk=order_item.pk).update(quantity=F('quantity') + quantity)
 
-                    # Update order total amount
-                    order.total_amount = sum(item.quantity * item.price_at_purchase for item in order.items.all())
-                    order.save()
+                    # Update order total amount by the added amount (see my_app/pricing.py)
+                    pricing.apply_line_change(order, new_amount=pricing.line_total(quantity, order_item.price_at_purchase))
 
                     messages.success(request,
                                      f'Item "{selected_variant.sku}" added/updated in Order #{order.order_id}!')
                     return redirect('order_edit', pk=order.pk)
+            except inventory.InsufficientStock as e:
+                errors['quantity'] = f'Not enough stock. Only {e.available} available.'
+                messages.error(request, 'Error adding item. Please check the form.')
             except IntegrityError as e:
                 messages.error(request,
                                f'An item with this variant already exists in the order. Please edit the existing item instead. Error: {str(e)}')
@@ -328,7 +376,7 @@ def add_order_item(request, order_pk):
 
         context = {
             'order': order,
-            'product_variants': product_variants,
+            'selected': {'variant': lookups.selection(selected_variant)},
             'item_data': {
                 'variant_id': variant_id,
                 'quantity': request.POST.get("quantity", "")
@@ -340,7 +388,7 @@ def add_order_item(request, order_pk):
     else:
         context = {
             'order': order,
-            'product_variants': product_variants,
+            'selected': {'variant': []},
             'item_data': {},
             'errors': {},
             'general_error': None,
@@ -354,8 +402,6 @@ def edit_order_item(request, order_pk, item_pk):
     """
     order = get_object_or_404(Order, pk=order_pk)
     order_item = get_object_or_404(OrderItem.objects.select_related('variant__product'), pk=item_pk, order=order)
-    product_variants = ProductVariant.objects.select_related('product').order_by('product__product_name', 'color',
-                                                                                 'size')
 
     if request.method == "POST":
         variant_id = request.POST.get("variant")
@@ -369,7 +415,7 @@ def edit_order_item(request, order_pk, item_pk):
             errors['variant'] = 'Product variant is required.'
         else:
             try:
-                selected_variant = ProductVariant.objects.get(pk=variant_id)
+                selected_variant = ProductVariant.objects.select_related('product').get(pk=variant_id)
             except ProductVariant.DoesNotExist:
                 errors['variant'] = 'Selected product variant does not exist.'
 
@@ -405,19 +451,32 @@ def edit_order_item(request, order_pk, item_pk):
         if not errors:
             try:
                 with transaction.atomic():
+                    # Move the reservation from the stored line to the edited one (only the difference)
+                    holds_stock = inventory.order_holds_stock(order)
+                    previous = OrderItem.objects.select_for_update().get(pk=order_item.pk)
+                    if holds_stock:
+                        inventory.change_reservation(previous.variant_id, previous.quantity,
+                                                     selected_variant.pk, quantity)
+
                     order_item.variant = selected_variant
                     order_item.quantity = quantity
                     order_item.price_at_purchase = price_at_purchase
                     order_item.full_clean()
                     order_item.save()
 
-                    # Update order total amount
-                    order.total_amount = sum(item.quantity * item.price_at_purchase for item in order.items.all())
-                    order.save()
+                    # Update order total amount by the line's difference
+                    pricing.apply_line_change(
+                        order,
+                        old_amount=pricing.line_total(previous.quantity, previous.price_at_purchase),
+                        new_amount=pricing.line_total(quantity, price_at_purchase),
+                    )
 
                     messages.success(request,
                                      f'Item "{order_item.variant.sku}" in Order #{order.order_id} updated successfully!')
                     return redirect('order_edit', pk=order.pk)
+            except inventory.InsufficientStock as e:
+                errors['quantity'] = f'Not enough stock. Only {e.available} more available for {selected_variant.sku}.'
+                messages.error(request, 'Error updating item. Please check the form.')
             except IntegrityError as e:
                 messages.error(request, f'An item with this variant already exists in the order. Error: {str(e)}')
             except Exception as e:
@@ -427,7 +486,7 @@ def edit_order_item(request, order_pk, item_pk):
         context = {
             'order': order,
             'order_item': order_item,
-            'product_variants': product_variants,
+            'selected': {'variant': lookups.selection(selected_variant)},
             'item_data': {
                 'variant_id': variant_id,
                 'quantity': request.POST.get("quantity", ""),
@@ -441,7 +500,7 @@ def edit_order_item(request, order_pk, item_pk):
         context = {
             'order': order,
             'order_item': order_item,
-            'product_variants': product_variants,
+            'selected': {'variant': lookups.selection(order_item.variant)},
             'item_data': {
                 'variant_id': order_item.variant.pk,
                 'quantity': order_item.quantity,
@@ -460,13 +519,20 @@ def delete_order_item(request, order_pk, item_pk):
     """
     try:
         order = get_object_or_404(Order, pk=order_pk)
-        order_item = get_object_or_404(OrderItem, pk=item_pk, order=order)
-        item_sku = order_item.variant.sku  # Get SKU before deleting for message
-        order_item.delete()
-
-        # Update order total amount after item deletion
-        order.total_amount = sum(item.quantity * item.price_at_purchase for item in order.items.all())
-        order.save()
+        with transaction.atomic():
+            # Lock order, then line (same order as edit_order_item) so a concurrent
+            # delete can't release the line's stock twice
+            holds_stock = inventory.order_holds_stock(order)
+            order_item = get_object_or_404(OrderItem.objects.select_for_update(), pk=item_pk, order=order)
+            item_sku = order_item.variant.sku  # Get SKU before deleting for message
+            if holds_stock:
+                inventory.release(order_item.variant_id, order_item.quantity)
+            order_item.delete()
+
+            # Update order total amount after item deletion
+            pricing.apply_line_change(
+                order, old_amount=pricing.line_total(order_item.quantity, order_item.price_at_purchase)
+            )
 
         messages.success(request, f'Item "{item_sku}" deleted from Order #{order.order_id} successfully!')
     except Exception as e:
@@ -1,21 +1,35 @@
+import io
 import json
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponseNotAllowed, HttpResponse
+from django.http import JsonResponse, HttpResponseNotAllowed, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
-from django.db.models import Sum, Prefetch, Q  # Import Q for complex queries
+from django.db.models import Sum, Prefetch
 from decimal import Decimal, InvalidOperation
 from datetime import date
 
 # --- MODELS IMPORTS ---
-from my_app.models import Product, Category, Brand, GENDER_CHOICES, ProductImage, Review  # Added Review
+from my_app.models import Product, GENDER_CHOICES, ProductImage, Review  # Added Review
+from my_app.pagination import paginate
+from my_app.search import search_products
+from my_app import catalog_import, reference_data
 
 
 # --- END MODELS IMPORTS ---
 
+# Server-side sort options for the product list: key -> (label, ordering)
+PRODUCT_SORT_OPTIONS = {
+    'name': ('Name (A-Z)', ['product_name']),
+    '-name': ('Name (Z-A)', ['-product_name']),
+    'newest': ('Newest first', ['-created_at', 'product_name']),  # Product.Meta.ordering
+    'price': ('Price (low to high)', ['price']),
+    '-price': ('Price (high to low)', ['-price']),
+}
+# Only offered while a search query is active (search_rank is annotated by search_products)
+PRODUCT_RELEVANCE_SORT = ('Relevance', ['-search_rank', 'product_name'])
 
-# --- CRUCIAL: Ensure total_stock property is in your Product model in my_app/models.py ---
-# (Same reminder as before, ensure this property and Sum import are in your models.py)
+
+# --- NOTE: total_stock reads the `stock_total` annotation added by Product.objects.with_stock_summary() ---
 
 
 # This view is for listing all products
@@ -23,9 +37,11 @@ def index(request):
     """
     Renders the product list page, displaying all products.
     Pre-fetches the thumbnail image for each product to simplify template logic.
-    Applies filters based on GET parameters.
+    Stock totals and variant counts are annotated in the main query (see
+    ProductQuerySet.with_stock_summary) instead of being queried per row.
+    Applies filters based on GET parameters and paginates with keyset cursors.
     """
-    products_queryset = Product.objects.all().select_related('brand', 'category').prefetch_related(
+    products_queryset = Product.objects.with_stock_summary().select_related('brand', 'category').prefetch_related(
         Prefetch(
             'images',
             queryset=ProductImage.objects.filter(is_thumbnail=True).order_by('display_order')[:1],
@@ -39,12 +55,13 @@ def index(request):
     brand_id = request.GET.get('brand')
     status = request.GET.get('status')
 
+    sort_options = PRODUCT_SORT_OPTIONS
+    default_sort = 'name'
     if search_query:
-        products_queryset = products_queryset.filter(
-            Q(product_name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(variants__sku__icontains=search_query)  # Corrected: Search SKU through variants
-        ).distinct()  # Use distinct to avoid duplicate products if multiple variants match
+        # Ranked full-text search (FTS5/tsvector) plus exact/prefix SKU matches, see my_app/search.py
+        products_queryset = search_products(products_queryset, search_query)
+        sort_options = dict(PRODUCT_SORT_OPTIONS, relevance=PRODUCT_RELEVANCE_SORT)
+        default_sort = 'relevance'
 
     if category_id:
         products_queryset = products_queryset.filter(category_id=category_id)
@@ -54,22 +71,24 @@ def index(request):
 
     if status:
         if status == 'active':
-            products_queryset = products_queryset.filter(is_active=True)
+            products_queryset = products_queryset.active()
         elif status == 'inactive':
-            products_queryset = products_queryset.filter(is_active=False)
+            products_queryset = products_queryset.active(False)
     # --- End Filtering Logic ---
 
-    products = products_queryset.order_by('product_name')
+    page = paginate(request, products_queryset, sort_options=sort_options, default_sort=default_sort)
+    products = page.object_list
 
     for product in products:
         product.thumbnail_image = product.thumbnail_image_object_list[
             0] if product.thumbnail_image_object_list else None
 
-    categories = Category.objects.all().order_by('category_name')
-    brands = Brand.objects.all().order_by('brand_name')
+    categories = reference_data.categories()
+    brands = reference_data.brands()
 
     context = {
         'products': products,
+        'page': page,
         'categories': categories,
         'brands': brands,
         # Pass the current filter values back to the template for pre-selection
@@ -87,8 +106,8 @@ def show(request):
     Renders the product creation form.
     Passes all available Category and Brand objects to the template for dropdowns.
     """
-    categories = Category.objects.all().order_by('category_name')
-    brands = Brand.objects.all().order_by('brand_name')
+    categories = reference_data.categories()
+    brands = reference_data.brands()
     context = {
         'categories': categories,
         'brands': brands,
@@ -138,19 +157,17 @@ def create(request):
 
         brand_obj = None
         if product_data['brand_id']:
-            try:
-                brand_obj = Brand.objects.get(pk=product_data['brand_id'])
-            except Brand.DoesNotExist:
+            brand_obj = reference_data.get_brand(product_data['brand_id'])
+            if brand_obj is None:
                 errors['brand'] = 'Invalid brand selected.'
 
         category_obj = None
         if product_data['category_id']:
-            try:
-                category_obj = Category.objects.get(pk=product_data['category_id'])
-            except Category.DoesNotExist:
+            category_obj = reference_data.get_category(product_data['category_id'])
+            if category_obj is None:
                 errors['category'] = 'Invalid category selected.'
 
-        if product_data['gender'] and product_data['gender'] not in [c[0] for c in GENDER_CHOICES]:
+        if product_data['gender'] and product_data['gender'] not in reference_data.GENDER_CODES:
             errors['gender'] = 'Invalid gender selected.'
         # --- End Manual Validation ---
 
@@ -193,8 +210,8 @@ def create(request):
                 general_error = f'An unexpected error occurred during save: {str(e)}'
 
         # If there are errors, re-render the form with existing data and errors
-        categories = Category.objects.all().order_by('category_name')
-        brands = Brand.objects.all().order_by('brand_name')
+        categories = reference_data.categories()
+        brands = reference_data.brands()
         context = {
             'categories': categories,
             'brands': brands,
@@ -228,15 +245,15 @@ def edit(request, pk):
     """
     Renders the product edit form, pre-filling it with existing data.
     """
-    product = get_object_or_404(Product, pk=pk)
-    categories = Category.objects.all().order_by('category_name')
-    brands = Brand.objects.all().order_by('brand_name')
+    product = get_object_or_404(Product.objects.with_stock_summary(), pk=pk)
+    categories = reference_data.categories()
+    brands = reference_data.brands()
 
     product_data = {
         'product_name': product.product_name,
         'description': product.description,
-        'brand_id': product.brand.pk if product.brand else '',
-        'category_id': product.category.pk if product.category else '',
+        'brand_id': product.brand_id or '',
+        'category_id': product.category_id or '',
         'gender': product.gender,
         'price': product.price,
         'material': product.material,
@@ -299,19 +316,17 @@ def update_product(request, pk):
 
         brand_obj = None
         if product_data['brand_id']:
-            try:
-                brand_obj = Brand.objects.get(pk=product_data['brand_id'])
-            except Brand.DoesNotExist:
+            brand_obj = reference_data.get_brand(product_data['brand_id'])
+            if brand_obj is None:
                 errors['brand'] = 'Invalid brand selected.'
 
         category_obj = None
         if product_data['category_id']:
-            try:
-                category_obj = Category.objects.get(pk=product_data['category_id'])
-            except Category.DoesNotExist:
+            category_obj = reference_data.get_category(product_data['category_id'])
+            if category_obj is None:
                 errors['category'] = 'Invalid category selected.'
 
-        if product_data['gender'] and product_data['gender'] not in [c[0] for c in GENDER_CHOICES]:
+        if product_data['gender'] and product_data['gender'] not in reference_data.GENDER_CODES:
             errors['gender'] = 'Invalid gender selected.'
 
         if not errors:
@@ -356,8 +371,8 @@ def update_product(request, pk):
     else:
         return HttpResponse("Method Not Allowed", status=405)
 
-    categories = Category.objects.all().order_by('category_name')
-    brands = Brand.objects.all().order_by('brand_name')
+    categories = reference_data.categories()
+    brands = reference_data.brands()
     variants = product.variants.all()
     images = product.images.all()
 
@@ -392,3 +407,53 @@ def view_product(request, pk):
         'reviews': reviews,  # NEW: Add reviews to the context
     }
     return render(request, "pages/products/detail.html", context)
+
+
+def import_catalog(request):
+    """
+    GET renders the catalog upload page. POST takes a CSV file (`file`) and
+    imports it with my_app/catalog_import.py, streaming one JSON object per line
+    back to the client as the file is processed:
+      {"type": "error", "line": 12, "message": "..."}
+      {"type": "progress", "rows": 1000, ...}
+      {"type": "done", "rows": 100000, ...}
+    The upload is read from Django's temporary upload file, never fully into memory.
+    """
+    if request.method != 'POST':
+        return render(request, 'pages/products/import.html', {
+            'chunk_size': catalog_import.DEFAULT_CHUNK_SIZE,
+            'columns': catalog_import.KNOWN_COLUMNS,
+        })
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'type': 'error', 'line': None, 'message': 'Please choose a CSV file.'}, status=400)
+    try:
+        chunk_size = max(1, int(request.POST.get('chunk_size') or catalog_import.DEFAULT_CHUNK_SIZE))
+    except ValueError:
+        return JsonResponse({'type': 'error', 'line': None, 'message': 'Invalid chunk size.'}, status=400)
+    create_missing = request.POST.get('create_missing', 'on') == 'on'
+
+    def line(payload):
+        return json.dumps(payload) + '\n'
+
+    def events():
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        importer = catalog_import.iter_import(stream, chunk_size, create_missing)
+        try:
+            while True:
+                try:
+                    event = next(importer)
+                except StopIteration as done:
+                    yield line(dict(type='done', **done.value.as_dict()))
+                    return
+                if event[0] == 'error':
+                    yield line({'type': 'error', 'line': event[1], 'message': event[2]})
+                else:
+                    yield line(dict(type='progress', **event[1].as_dict()))
+        except catalog_import.CatalogRowError as e:  # unusable header
+            yield line({'type': 'error', 'line': None, 'message': str(e)})
+        finally:
+            stream.detach()  # leave closing the upload to Django
+
+    return StreamingHttpResponse(events(), content_type='application/x-ndjson')
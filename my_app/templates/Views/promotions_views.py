@@ -8,18 +8,39 @@ from decimal import Decimal
 
 # --- MODELS IMPORTS ---
 from my_app.models import Promotion, DISCOUNT_TYPE_CHOICES
+from my_app.pagination import paginate
 
 
 # --- END MODELS IMPORTS ---
 
+# Server-side sort options for the promotion list: key -> (label, ordering)
+PROMOTION_SORT_OPTIONS = {
+    'newest': ('Latest start first', ['-start_date']),  # Promotion.Meta.ordering
+    'ending': ('Ending soonest', ['end_date']),
+    'code': ('Promo code (A-Z)', ['promo_code']),
+}
+
 
 def index(request):
     """
-    Renders the promotion listing page, displaying all promotions.
+    Renders the promotion listing page, one keyset-paginated page of promotions at a time.
+    The optional `status` filter uses PromotionQuerySet (partial index on enabled promotions).
     """
-    promotions = Promotion.objects.all().order_by('-start_date')
+    promotions = Promotion.objects.all()
+    status = request.GET.get('status')
+    if status == 'running':
+        promotions = promotions.running()
+    elif status == 'upcoming':
+        promotions = promotions.upcoming()
+    elif status == 'expired':
+        promotions = promotions.expired()
+    elif status == 'disabled':
+        promotions = promotions.filter(is_active=False)
+    page = paginate(request, promotions, sort_options=PROMOTION_SORT_OPTIONS, default_sort='newest')
     context = {
-        'promotions': promotions
+        'promotions': page.object_list,
+        'page': page,
+        'current_status': status,
     }
     return render(request, "pages/promotions/index.html", context)
 
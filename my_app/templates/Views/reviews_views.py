@@ -7,18 +7,38 @@ from django.utils import timezone
 
 # --- MODELS IMPORTS ---
 from my_app.models import Review, Product, Customer
+from my_app.pagination import paginate
+from my_app import lookups
 
 
 # --- END MODELS IMPORTS ---
 
+# Server-side sort options for the review list: key -> (label, ordering)
+REVIEW_SORT_OPTIONS = {
+    'newest': ('Newest first', ['-review_date']),  # Review.Meta.ordering
+    'oldest': ('Oldest first', ['review_date']),
+    '-rating': ('Rating (high to low)', ['-rating', '-review_date']),
+    'rating': ('Rating (low to high)', ['rating', '-review_date']),
+}
+
 
 def index(request):
     """
-    Renders the review listing page, displaying all reviews.
+    Renders the review listing page, one keyset-paginated page of reviews at a time.
+    The optional `status` filter (approved/pending) is served by the
+    (is_approved, review_date) index.
     """
-    reviews = Review.objects.all().order_by('-review_date')
+    reviews = Review.objects.select_related('product', 'customer')
+    status = request.GET.get('status')
+    if status == 'approved':
+        reviews = reviews.approved()
+    elif status == 'pending':
+        reviews = reviews.approved(False)
+    page = paginate(request, reviews, sort_options=REVIEW_SORT_OPTIONS, default_sort='newest')
     context = {
-        'reviews': reviews
+        'reviews': page.object_list,
+        'page': page,
+        'current_status': status,
     }
     return render(request, "pages/reviews/index.html", context)
 
@@ -27,8 +47,6 @@ def create_review(request):
     """
     Handles GET and POST requests for creating a new review.
     """
-    products = Product.objects.all().order_by('product_name')
-    customers = Customer.objects.all().order_by('email')  # Or by name
 
     if request.method == "POST":
         product_id = request.POST.get("product")
@@ -98,8 +116,7 @@ def create_review(request):
                 errors['__all__'] = f'An unexpected error occurred: {str(e)}'
 
         context = {
-            'products': products,
-            'customers': customers,
+            'selected': {'product': lookups.selection(product_obj), 'customer': lookups.selection(customer_obj)},
             'review_data': {
                 'product_id': product_id,
                 'customer_id': customer_id,
@@ -113,8 +130,7 @@ def create_review(request):
         return render(request, "pages/reviews/create.html", context)
     else:
         context = {
-            'products': products,
-            'customers': customers,
+            'selected': {'product': [], 'customer': []},
             'review_data': {
                 'is_approved': False  # Default to not approved for new reviews
             },
@@ -128,9 +144,7 @@ def edit_review(request, pk):
     """
     Handles GET and POST requests for editing an existing review.
     """
-    review = get_object_or_404(Review, pk=pk)
-    products = Product.objects.all().order_by('product_name')
-    customers = Customer.objects.all().order_by('email')
+    review = get_object_or_404(Review.objects.select_related('product', 'customer'), pk=pk)
 
     if request.method == "POST":
         product_id = request.POST.get("product")
@@ -200,8 +214,7 @@ def edit_review(request, pk):
 
         context = {
             'review': review,
-            'products': products,
-            'customers': customers,
+            'selected': {'product': lookups.selection(product_obj), 'customer': lookups.selection(customer_obj)},
             'review_data': {
                 'product_id': product_id,
                 'customer_id': customer_id,
@@ -216,8 +229,7 @@ def edit_review(request, pk):
     else:
         context = {
             'review': review,
-            'products': products,
-            'customers': customers,
+            'selected': {'product': lookups.selection(review.product), 'customer': lookups.selection(review.customer)},
             'review_data': {
                 'product_id': review.product.pk if review.product else '',
                 'customer_id': review.customer.pk if review.customer else '',
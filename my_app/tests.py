@@ -1,3 +1,1102 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, OperationalError, connection, transaction
+from django.db.models import F, Sum
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from my_app import (
+    benchmarks, catalog_import, customer_stats, dashboard_cache, exports, fake_shop, image_derivatives, inventory, kpis,
+    lookups, media_blobs, media_gc, metrics, pagination, preferences, pricing, reference_data, rfm, rollups, search,
+    variants, views,
+)
+from my_app.models import (
+    IMAGE_DERIVATIVE_FORMATS, IMAGE_DERIVATIVE_SIZES, LOW_STOCK_THRESHOLD, Brand, Category, Customer,
+    CustomerPreferenceProfile, CustomerStats, CustomerValueScore, DailySalesRollup, MediaBlob, Member, Order, OrderItem,
+    Product, ProductImage, ProductVariant, Promotion, Review, derivative_name,
+)
+from my_app.storage import blob_digest
+from my_app.templates.Views import dashboard_views
+
+
+def create_variant(quantity_in_stock, sku='TEST-RED-M'):
+    product = Product.objects.create(product_name='Test Shirt', gender='U', price=Decimal('10.00'))
+    return ProductVariant.objects.create(
+        product=product, color='Red', size='M', sku=sku, quantity_in_stock=quantity_in_stock
+    )
+
+
+def stock_of(variant):
+    return ProductVariant.objects.values_list('quantity_in_stock', flat=True).get(pk=variant.pk)
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class StockSummaryTests(TestCase):
+    def setUp(self):
+        self.shirt = create_variant(5, sku='SHIRT-RED-M').product
+        for sku, quantity in (('SHIRT-RED-S', LOW_STOCK_THRESHOLD), ('SHIRT-RED-L', 20)):
+            ProductVariant.objects.create(product=self.shirt, color='Red', size=sku[-1], sku=sku,
+                                          quantity_in_stock=quantity)
+        self.bare = Product.objects.create(product_name='No Variants', gender='U', price=Decimal('5.00'))
+
+    def test_annotations(self):
+        summary = {p.pk: p for p in Product.objects.with_stock_summary()}
+        shirt, bare = summary[self.shirt.pk], summary[self.bare.pk]
+        self.assertEqual((shirt.stock_total, shirt.variant_count, shirt.low_stock_variant_count, shirt.has_low_stock),
+                         (35, 3, 2, True))
+        self.assertEqual((bare.stock_total, bare.variant_count, bare.low_stock_variant_count, bare.has_low_stock),
+                         (0, 0, 0, False))
+        self.assertEqual(Product.objects.get(pk=self.shirt.pk).total_stock, 35)  # unannotated fallback
+
+        strict = Product.objects.with_stock_summary(low_stock_threshold=4).get(pk=self.shirt.pk)
+        self.assertEqual((strict.low_stock_variant_count, strict.has_low_stock), (0, False))
+        # Filtering through the variants join must not multiply the totals.
+        joined = Product.objects.with_stock_summary().filter(variants__sku__startswith='SHIRT-').distinct()
+        self.assertEqual([(p.stock_total, p.variant_count) for p in joined], [(35, 3)])
+
+    def test_pages_show_the_total(self):
+        response = self.client.get(reverse('product_index'))
+        listed = {p.pk: p.stock_total for p in response.context['products']}
+        self.assertEqual(listed, {self.shirt.pk: 35, self.bare.pk: 0})
+        response = self.client.get(reverse('product_view', args=[self.shirt.pk]))
+        self.assertContains(response, 'Total Stock: 35')
+
+
+class InventoryAllocationTests(TestCase):
+    def setUp(self):
+        self.variant = create_variant(5)
+
+    def test_reserve_and_release(self):
+        inventory.reserve(self.variant.pk, 3)
+        self.assertEqual(stock_of(self.variant), 2)
+        inventory.release(self.variant.pk, 3)
+        self.assertEqual(stock_of(self.variant), 5)
+
+    def test_reserve_more_than_available_changes_nothing(self):
+        with self.assertRaises(inventory.InsufficientStock) as raised:
+            inventory.reserve(self.variant.pk, 6)
+        self.assertEqual(raised.exception.available, 5)
+        self.assertEqual(stock_of(self.variant), 5)
+
+    def test_change_reservation_takes_only_the_difference(self):
+        inventory.reserve(self.variant.pk, 2)
+        inventory.change_reservation(self.variant.pk, 2, self.variant.pk, 5)
+        self.assertEqual(stock_of(self.variant), 0)
+        inventory.change_reservation(self.variant.pk, 5, self.variant.pk, 1)
+        self.assertEqual(stock_of(self.variant), 4)
+
+    def test_cancel_and_reopen_order(self):
+        order = Order.objects.create(total_amount=Decimal('0.00'))
+        inventory.reserve(self.variant.pk, 4)
+        OrderItem.objects.create(order=order, variant=self.variant, quantity=4, price_at_purchase=Decimal('10.00'))
+
+        inventory.change_order_status(order, 'CANCELLED')
+        Order.objects.filter(pk=order.pk).update(order_status='CANCELLED')
+        self.assertEqual(stock_of(self.variant), 5)
+
+        inventory.release_order(order)  # cancelled orders hold nothing
+        self.assertEqual(stock_of(self.variant), 5)
+
+        inventory.change_order_status(order, 'PENDING')
+        self.assertEqual(stock_of(self.variant), 1)
+
+
+class VariantMatrixTests(TestCase):
+    def setUp(self):
+        self.existing = create_variant(5, sku='KEEP-RED-M')
+        self.product = self.existing.product
+
+    def test_matrix_skips_conflicting_cells(self):
+        ProductVariant.objects.create(product=self.product, color='Blue', size='S',
+                                      sku=variants.generate_sku(self.product.pk, 'Green', 'S'))
+        colors, sizes = ['Red', 'Green', 'Navy Blue', 'NavyBlue'], ['S', 'M']
+
+        preview = variants.create_variant_matrix([self.product.pk], colors, sizes, dry_run=True)
+        self.assertEqual(ProductVariant.objects.count(), 2)
+        result = variants.create_variant_matrix([self.product.pk], colors, sizes, quantity_in_stock=3)
+
+        self.assertEqual([v.sku for v in result.created], [v.sku for v in preview.created])
+        self.assertEqual(
+            [(c['color'], c['size'], c['reason']) for c in result.conflicts],
+            [('Red', 'M', variants.CONFLICT_VARIANT_EXISTS), ('Green', 'S', variants.CONFLICT_SKU_EXISTS),
+             ('NavyBlue', 'S', variants.CONFLICT_DUPLICATE), ('NavyBlue', 'M', variants.CONFLICT_DUPLICATE)],
+        )
+        self.assertEqual(ProductVariant.objects.filter(product=self.product, quantity_in_stock=3).count(), 4)
+
+    def post(self, payload):
+        return self.client.post(reverse('inventory_variant_matrix'), json.dumps(payload),
+                                content_type='application/json')
+
+    def test_endpoint(self):
+        payload = {'products': [self.product.pk], 'colors': ['Black'], 'sizes': ['S', 'M']}
+        response = self.post(dict(payload, dry_run=True))
+        self.assertEqual((response.status_code, len(response.json()['created'])), (200, 2))
+        response = self.post(payload)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['conflicts'], [])
+        self.assertEqual(self.post(payload).json()['created'], [])
+
+    def test_endpoint_rejects_malformed_payloads(self):
+        valid = {'products': [self.product.pk], 'colors': ['Black'], 'sizes': ['S']}
+        for payload, field in (
+            (['Black'], '__all__'),
+            (dict(valid, products=str(self.product.pk)), 'products'),
+            (dict(valid, products=[True]), 'products'),
+            (dict(valid, products=[float(self.product.pk)]), 'products'),
+            (dict(valid, products=[self.product.pk + 100]), 'products'),
+            (dict(valid, colors='Black'), 'colors'),
+            (dict(valid, sizes=['S', 7]), 'sizes'),
+            (dict(valid, quantity_in_stock=True), 'quantity_in_stock'),
+            (dict(valid, quantity_in_stock=2.5), 'quantity_in_stock'),
+            (dict(valid, quantity_in_stock=-1), 'quantity_in_stock'),
+            (dict(valid, dry_run='no'), 'dry_run'),
+        ):
+            with self.subTest(payload=payload):
+                response = self.post(payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.json()['errors'])
+        self.assertEqual(ProductVariant.objects.count(), 1)
+
+
+class OrderPricingTests(TestCase):
+    def setUp(self):
+        self.variant = create_variant(50)
+        self.order = Order.objects.create(total_amount=Decimal('0.00'))
+
+    def add_line(self, quantity, price):
+        OrderItem.objects.create(order=self.order, variant=self.variant, quantity=quantity, price_at_purchase=price)
+        pricing.apply_line_change(self.order, new_amount=pricing.line_total(quantity, price))
+
+    def stored_total(self):
+        return Order.objects.values_list('total_amount', flat=True).get(pk=self.order.pk)
+
+    def test_line_deltas_match_full_recompute(self):
+        self.add_line(3, Decimal('19.99'))
+        pricing.apply_line_change(self.order, old_amount=Decimal('59.97'), new_amount=Decimal('39.98'))
+        self.assertEqual(self.stored_total(), Decimal('39.98'))
+        OrderItem.objects.filter(order=self.order).update(quantity=2)
+        self.assertEqual(pricing.recalculate_order(self.order), Decimal('39.98'))
+
+    def test_percentage_promotion_follows_subtotal(self):
+        now = timezone.now()
+        promotion = Promotion.objects.create(
+            promo_code='TEN', discount_type='PERCENTAGE', discount_value=Decimal('10'),
+            start_date=now, end_date=now, min_order_amount=Decimal('50.00'),
+        )
+        self.add_line(2, Decimal('20.00'))
+        self.assertEqual(pricing.apply_promotion(self.order, promotion), Decimal('40.00'))  # below minimum
+
+        OrderItem.objects.filter(order=self.order).update(quantity=5)
+        pricing.apply_line_change(self.order, old_amount=Decimal('40.00'), new_amount=Decimal('100.00'))
+        self.assertEqual(self.stored_total(), Decimal('90.00'))
+
+
+@override_settings(DASHBOARD_CACHE_TTL=60, DASHBOARD_CACHE_STALE_TTL=600)
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        dashboard_cache._cache().clear()
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        return {'build': self.builds}
+
+    def context(self):
+        return dashboard_cache.get_context('test', self.build)
+
+    def test_generation_bump_rebuilds(self):
+        self.assertEqual((self.context(), self.context()), ({'build': 1}, {'build': 1}))
+        dashboard_cache.invalidate()
+        self.assertEqual(self.context(), {'build': 2})
+        with patch('my_app.dashboard_cache.time.time', return_value=time.time() + 61):  # past the TTL
+            self.assertEqual(self.context(), {'build': 3})
+
+    def test_stale_entry_is_served_while_another_request_rebuilds(self):
+        self.context()
+        dashboard_cache.invalidate()
+        dashboard_cache._cache().add('dashboard:test:lock', 1)
+        self.assertEqual(self.context(), {'build': 1})
+        self.assertEqual(self.builds, 1)
+
+        dashboard_cache._cache().delete('dashboard:test')  # cold cache: computed, but left to the lock holder
+        self.assertEqual((self.context(), self.context()), ({'build': 2}, {'build': 3}))
+        dashboard_cache._cache().delete('dashboard:test:lock')
+        self.assertEqual((self.context(), self.context()), ({'build': 4}, {'build': 4}))
+
+    def test_price_changes_invalidate_after_commit(self):
+        order = Order.objects.create(total_amount=Decimal('0.00'))
+        self.context()
+        with self.captureOnCommitCallbacks() as callbacks:
+            pricing.apply_line_change(order, new_amount=Decimal('12.00'))
+            self.assertEqual(self.context(), {'build': 1})  # not committed yet
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(self.context(), {'build': 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pricing.recalculate_order(order)  # no items: the total drops to 0
+        self.assertEqual(self.context(), {'build': 3})
+
+
+class ReferenceDataCacheTests(TestCase):
+    def test_reads_hit_memory_until_a_brand_changes(self):
+        brand = Brand.objects.create(brand_name='Zephyr')
+        reference_data.invalidate()
+        self.assertEqual(reference_data.get_brand(str(brand.pk)), brand)
+        with self.assertNumQueries(0):
+            self.assertEqual([b.brand_name for b in reference_data.brands()], ['Zephyr'])
+            self.assertIsNone(reference_data.get_brand('not-a-pk'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Brand.objects.create(brand_name='Aurora')
+        self.assertEqual([b.brand_name for b in reference_data.brands()], ['Aurora', 'Zephyr'])
+
+    def test_change_made_by_another_process_is_seen(self):
+        reference_data.invalidate()
+        reference_data.brands()
+        # bulk_create sends no signal: like a save in a worker whose cache this process doesn't share
+        [brand] = Brand.objects.bulk_create([Brand(brand_name='Nimbus')])
+        self.assertEqual(reference_data.get_brand(brand.pk), brand)  # database fallback for an unknown pk
+        self.assertEqual([b.brand_name for b in reference_data.brands()], [])
+        with override_settings(REFERENCE_DATA_MAX_AGE=0):
+            self.assertEqual([b.brand_name for b in reference_data.brands()], ['Nimbus'])
+
+
+class KeysetPaginationTests(TestCase):
+    SORTS = {'name': ('Name', ['product_name']), '-price': ('Price', ['-price'])}
+
+    def setUp(self):
+        # Duplicate names and prices: the pk tiebreaker must keep every row on exactly one page.
+        for name, price in (('Tee', '10.00'), ('Tee', '20.00'), ('Cap', '10.00'), ('Tee', '10.00'),
+                            ('Bag', '20.00'), ('Tee', '10.00'), ('Hat', '5.00')):
+            Product.objects.create(product_name=name, gender='U', price=Decimal(price))
+
+    def page(self, **params):
+        request = RequestFactory().get('/', {'per_page': 2, **params})
+        return pagination.paginate(request, Product.objects.all(), sort_options=self.SORTS, default_sort='name')
+
+    def test_walks_forwards_and_backwards_through_ties(self):
+        for sort, ordering in (('name', ['product_name', 'product_id']), ('-price', ['-price', '-product_id'])):
+            expected = list(Product.objects.order_by(*ordering).values_list('pk', flat=True))
+            pages, page = [], self.page(sort=sort)
+            while True:
+                pages.append([p.pk for p in page])
+                if not page.has_next:
+                    break
+                page = self.page(sort=sort, after=page.next_cursor)
+            self.assertEqual(sum(pages, []), expected)
+            self.assertEqual([len(p) for p in pages], [2, 2, 2, 1])
+
+            back = []
+            while page.has_previous:
+                page = self.page(sort=sort, before=page.previous_cursor)
+                back.insert(0, [p.pk for p in page])
+            self.assertEqual(back, pages[:-1])
+            self.assertFalse(page.has_previous)
+
+    def test_seek_filter_with_ties(self):
+        ordering = pagination.normalize_ordering(Product, ['product_name'])
+        self.assertEqual(ordering, ['product_name', 'product_id'])
+        tees = list(Product.objects.filter(product_name='Tee').order_by('pk').values_list('pk', flat=True))
+        after = Product.objects.filter(pagination.seek_filter(ordering, ['Tee', tees[1]]))
+        self.assertEqual(sorted(after.values_list('pk', flat=True)), tees[2:])
+
+    def test_cursor_round_trip(self):
+        stamp = datetime.datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc)
+        cursor = pagination.encode_cursor('-price', [stamp, Decimal('19.90'), 7, 'Tee'])
+        sort, values = pagination.decode_cursor(cursor)
+        self.assertEqual(sort, '-price')
+        self.assertEqual(values, [stamp.isoformat(), '19.90', 7, 'Tee'])
+        self.assertEqual(Order._meta.get_field('order_date').to_python(values[0]), stamp)
+        self.assertIsNone(pagination.decode_cursor('not a cursor!'))
+
+    def test_bad_cursor_or_sort_restarts_and_empty_page_is_truthy(self):
+        first = [p.pk for p in self.page()]
+        self.assertEqual([p.pk for p in self.page(after='garbage')], first)
+        stale = self.page(sort='-price').next_cursor  # cursor of another sort
+        self.assertEqual([p.pk for p in self.page(sort='name', after=stale)], first)
+        self.assertEqual([p.pk for p in self.page(sort='bogus')], first)
+
+        request = RequestFactory().get('/')
+        empty = pagination.paginate(request, Product.objects.none(), sort_options=self.SORTS)
+        self.assertEqual(len(empty), 0)
+        self.assertTrue(empty)
+        self.assertFalse(empty.has_next or empty.has_previous)
+        self.assertIn('name="sort"', render_to_string('pages/pagination.html', {'page': empty}))
+
+
+@skipUnless(search.is_supported(), 'needs the PostgreSQL or SQLite search index')
+@override_settings(QUERY_BUDGET_RAISE=True)  # views with an entry in QUERY_BUDGETS fail over budget
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.shirt = Product.objects.create(product_name='Linen Summer Shirt', gender='U', price=Decimal('30.00'),
+                                            description='Light and breathable.')
+        self.coat = Product.objects.create(product_name='Wool Winter Coat', gender='U', price=Decimal('90.00'),
+                                           description='Goes well with a linen scarf.')
+        ProductVariant.objects.create(product=self.shirt, color='Blue', size='M', sku='LNS-BLU-M')
+        ProductVariant.objects.create(product=self.coat, color='Blue', size='M', sku='LNS-BLU')
+
+    def found(self, query):
+        return [p.pk for p in search.search_products(Product.objects.all(), query).order_by('-search_rank', 'pk')]
+
+    def test_token_match(self):
+        self.assertEqual(self.found('summer'), [self.shirt.pk])
+        self.assertEqual(self.found('wool COA'), [self.coat.pk])  # every term, the last one as a prefix
+        self.assertEqual(self.found('"winter" (coat'), [self.coat.pk])  # punctuation is not query syntax
+        self.assertEqual(self.found('summer coat'), [])
+        self.assertEqual(self.found(' !! '), [])
+
+    def test_sku_prefix_match(self):
+        self.assertEqual(self.found('lns-blu-'), [self.shirt.pk])
+        self.assertEqual(set(self.found('LNS-B')), {self.shirt.pk, self.coat.pk})
+
+    def test_ranking(self):
+        # A name match (weight A) outranks a description match (weight B) ...
+        self.assertEqual(self.found('linen'), [self.shirt.pk, self.coat.pk])
+        # ... and an exact SKU outranks a SKU prefix.
+        self.assertEqual(self.found('lns-blu'), [self.coat.pk, self.shirt.pk])
+
+    def test_signals_keep_index_current(self):
+        self.shirt.product_name = 'Cotton Beach Shirt'
+        self.shirt.save()
+        self.assertEqual(self.found('summer'), [])
+        self.assertEqual(self.found('beach'), [self.shirt.pk])
+
+        Product.objects.filter(pk=self.coat.pk).update(product_name='Parka')  # no signals
+        self.assertEqual(self.found('parka'), [])
+        search.rebuild_index()
+        self.assertEqual(self.found('parka'), [self.coat.pk])
+
+        shirt_pk = self.shirt.pk
+        self.shirt.delete()
+        table, key = ((search.PG_SEARCH_TABLE, 'product_id') if connection.vendor == 'postgresql'
+                      else (search.FTS_TABLE, 'rowid'))
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {table} WHERE {key} = %s', [shirt_pk])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_product_list(self):
+        response = self.client.get(reverse('product_index'), {'q': 'linen'})
+        self.assertEqual([p.pk for p in response.context['products']], [self.shirt.pk, self.coat.pk])
+
+
+class LookupTests(TestCase):
+    def test_prefix_matches_are_case_insensitive_and_bounded(self):
+        Customer.objects.bulk_create([
+            Customer(first_name='Ada', last_name=f'Lovelace{i}', email=f'ada{i}@example.com', password_hash='x')
+            for i in range(lookups.MAX_LIMIT + 5)
+        ])
+        Customer.objects.create(first_name='Grace', last_name='Hopper', email='grace@example.com', password_hash='x')
+
+        self.assertEqual(len(lookups.search_customers('ADA', limit=1000)), lookups.MAX_LIMIT)
+        self.assertEqual([c['email'] for c in lookups.search_customers('grace hop')], ['grace@example.com'])
+        self.assertEqual(lookups.search_customers('race'), [])  # prefix only
+        self.assertEqual(lookups.search_customers('  '), [])
+
+    def test_variants_match_sku_or_product_name(self):
+        variant = create_variant(3, sku='PROD001-Red-M')
+        self.assertEqual([v['id'] for v in lookups.search_variants('prod001-r')], [variant.pk])
+        self.assertEqual([v['id'] for v in lookups.search_variants(variant.product.product_name[:4])], [variant.pk])
+
+
+CATALOG_HEADER = 'product_name,brand,category,price,description,sku,color,size,quantity_in_stock\n'
+
+
+class CatalogImportTests(TestCase):
+    def run_import(self, rows, **options):
+        return catalog_import.import_catalog(StringIO(CATALOG_HEADER + rows), **options)
+
+    def test_reimport_updates_instead_of_duplicating(self):
+        feed = 'Tee,Acme,Tops,10.00,Plain,TEE-R-M,Red,M,5\nTee,Acme,Tops,10.00,Plain,TEE-B-M,Blue,M,2\n'
+        result = self.run_import(feed)
+        self.assertEqual((result.products_created, result.variants_created), (1, 2))
+
+        result = self.run_import(feed.replace(',5\n', ',7\n'))
+        self.assertEqual((result.products_unchanged, result.variants_updated, result.variants_unchanged), (1, 1, 1))
+        self.assertEqual(Product.objects.count(), 1)
+        self.assertEqual(ProductVariant.objects.get(sku='TEE-R-M').quantity_in_stock, 7)
+
+    def test_rejected_variant_row_leaves_its_product_alone(self):
+        self.run_import('Tee,Acme,Tops,10.00,Plain,TEE-R-M,Red,M,5\n')
+        errors = []
+        result = self.run_import('Tee,Acme,Tops,12.00,Changed,TEE-OTHER,Red,M,1\n',
+                                 on_error=lambda line, message: errors.append(line))
+        self.assertEqual((result.rejected_rows, errors), (1, [2]))
+        product = Product.objects.get()
+        self.assertEqual((product.description, product.price), ('Plain', Decimal('10.00')))
+        self.assertFalse(ProductVariant.objects.filter(sku='TEE-OTHER').exists())
+
+    def test_failed_chunk_leaves_no_brands_behind(self):
+        with patch('my_app.catalog_import.search.reindex_products', side_effect=DatabaseError('boom')):
+            self.run_import('Tee,Newco,Tops,10.00,,,,,\n')
+        self.assertFalse(Brand.objects.exists() or Category.objects.exists())
+
+        rows = 'Tee,Newco,Tops,10.00,,,,,\nHat,Newco,Tops,8.00,,,,,\n'  # the second chunk creates Newco again
+        with patch('my_app.catalog_import.search.reindex_products', side_effect=[DatabaseError('boom'), None]):
+            result = self.run_import(rows, chunk_size=1)
+        self.assertEqual((result.rejected_rows, result.products_created), (1, 1))
+        self.assertEqual(list(Product.objects.values_list('product_name', 'brand__brand_name')), [('Hat', 'Newco')])
+        self.assertEqual(Brand.objects.count(), 1)
+
+    def test_command_reports_rows_and_errors(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(CATALOG_HEADER + 'Tee,Acme,Tops,10.00,,,,,\nCap,Acme,Tops,free,,,,,\n')
+        self.addCleanup(os.unlink, f.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_catalog', f.name, stdout=out, stderr=err)
+        self.assertIn('Imported 1 of 2 row(s).', out.getvalue())
+        self.assertIn('line 3: Invalid price "free".', err.getvalue())
+
+    def test_prices_that_cannot_be_stored_reject_only_their_row(self):
+        errors = []
+        result = self.run_import(
+            'A,Acme,Tops,NaN,,,,,\nB,Acme,Tops,Infinity,,,,,\nC,Acme,Tops,123456789012.5,,,,,\n'
+            'D,Acme,Tops,9.999,,,,,\nTee,Acme,Tops,10.00,,,,,\n',
+            on_error=lambda line, message: errors.append(line),
+        )
+        self.assertEqual((result.rejected_rows, errors, result.products_created), (4, [2, 3, 4, 5], 1))
+        self.assertEqual(list(Product.objects.values_list('product_name', flat=True)), ['Tee'])
+
+    def test_upload_streams_ndjson_events(self):
+        upload = SimpleUploadedFile('catalog.csv', (CATALOG_HEADER + 'Tee,Acme,Tops,10.00,,,,,\n,,,1,,,,,\n').encode())
+        response = self.client.post(reverse('product_import'), {'file': upload})
+        events = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([event['type'] for event in events], ['error', 'progress', 'done'])
+        self.assertEqual(events[0]['line'], 3)
+        self.assertEqual((events[-1]['rows'], events[-1]['products_created']), (2, 1))
+
+
+class QueryIndexTests(TestCase):
+    """The hot list/filter queries are planned on the indexes added for them (migration 0013)."""
+
+    def assertUsesIndex(self, queryset, index_name):
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Empty test tables make a sequential scan the cheapest plan
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_list_filters_use_indexes(self):
+        now = timezone.now()
+        self.assertUsesIndex(Order.objects.filter(order_status='PENDING').order_by('-order_date'),
+                             'order_status_date_idx')
+        self.assertUsesIndex(Order.objects.filter(payment_status='PAID', order_date__gte=now),
+                             'order_payment_date_idx')
+        self.assertUsesIndex(Review.objects.approved(False).order_by('-review_date'),
+                             'review_approved_date_idx')
+        self.assertUsesIndex(Product.objects.active().order_by('product_name'),
+                             'product_active_name_idx')
+        self.assertUsesIndex(ProductVariant.objects.filter(quantity_in_stock__lte=LOW_STOCK_THRESHOLD),
+                             'variant_low_stock_idx')
+        self.assertUsesIndex(Promotion.objects.running(now), 'promotion_active_window_idx')
+
+    def test_case_insensitive_email_lookups_use_indexes(self):
+        self.assertUsesIndex(Customer.objects.email_iexact('Ann@Example.com'), 'customer_email_lower_idx')
+        self.assertUsesIndex(Member.objects.email_iexact('Ann@Example.com'), 'member_email_lower_idx')
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(first_name='Ann', last_name='A', email='ann@example.com')
+        self.recent = Order.objects.create(customer=customer, total_amount=Decimal('12.50'), payment_status='PAID')
+        self.old = Order.objects.create(total_amount=Decimal('3.00'))
+        Order.objects.filter(pk=self.old.pk).update(order_date=timezone.now() - datetime.timedelta(days=10))
+        self.url = reverse('export', args=['orders'])
+
+    def rows(self, content):
+        return list(csv.reader(content.decode().splitlines()))
+
+    def test_requires_staff(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.client.force_login(User.objects.create_user('clerk', password='x'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_streams_filtered_csv(self):
+        self.client.force_login(User.objects.create_user('admin', password='x', is_staff=True))
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        rows = self.rows(b''.join(response.streaming_content))
+        self.assertEqual(rows[0], exports.EXPORTS['orders'].headers)
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.recent.pk), str(self.old.pk)])
+
+        today = timezone.localdate().isoformat()
+        response = self.client.get(self.url, {'from': today, 'status': 'payment_paid', 'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = self.rows(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual([(row[0], row[5], row[6]) for row in rows[1:]],
+                         [(str(self.recent.pk), 'ann@example.com', '12.50')])
+        self.assertEqual(self.client.get(self.url, {'to': '2026-13-01'}).status_code, 400)
+
+    def test_command(self):
+        output = os.path.join(tempfile.mkdtemp(), 'orders.csv')
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+        day = (timezone.localdate() - datetime.timedelta(days=10)).isoformat()
+        call_command('export_data', 'orders', '--output', output, '--to', day, '--chunk-size', '1', stdout=StringIO())
+        with open(output, 'rb') as f:
+            rows = self.rows(f.read())
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.old.pk)])
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_requests_are_aggregated_per_view(self):
+        self.client.get(reverse('lookup_customers'), {'q': 'a'})
+        self.client.get(reverse('lookup_customers'), {'q': 'b'})
+        self.client.force_login(User.objects.create_user('admin', password='x', is_staff=True))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('fashion_shop_request_queries_count{view="lookup_customers"} 2', body)
+        self.assertIn('fashion_shop_request_queries_sum{view="lookup_customers"} 2', body)
+        self.assertIn('fashion_shop_request_queries_bucket{view="lookup_customers",le="1"} 2', body)
+
+    def test_query_budget(self):
+        with override_settings(QUERY_BUDGETS={'lookup_customers': 0}, QUERY_BUDGET_RAISE=True):
+            with self.assertRaises(metrics.QueryBudgetExceeded):
+                self.client.get(reverse('lookup_customers'), {'q': 'a'})
+        with override_settings(QUERY_BUDGETS={'lookup_customers': 0}, QUERY_BUDGET_RAISE=False):
+            with self.assertLogs('my_app.metrics', 'WARNING'):
+                self.client.get(reverse('lookup_customers'), {'q': 'a'})
+        self.assertIn('fashion_shop_query_budget_exceeded_total{view="lookup_customers"} 2', metrics.render())
+
+    def test_scraping_needs_staff_token_or_listed_ip(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)  # 127.0.0.1, as behind a proxy
+        with override_settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.5']):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.5').status_code, 200)
+        self.client.force_login(User.objects.create_user('clerk', password='x'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+def rollup_rows():
+    return list(DailySalesRollup.objects.order_by('date').values_list(
+        'date', 'order_count', 'gross_sales', 'paid_sales', 'paid_order_count', 'pending_count', 'delivered_count',
+    ))
+
+
+class DailySalesRollupTests(TestCase):
+    def setUp(self):
+        self.orders = [Order.objects.create(total_amount=Decimal(amount)) for amount in ('10.00', '20.00', '5.00')]
+        Order.objects.filter(pk=self.orders[2].pk).update(order_date=timezone.now() - datetime.timedelta(days=3))
+        self.assertEqual(rollups.rebuild(), 2)
+
+    def change_orders(self):
+        paid = Order.objects.get(pk=self.orders[0].pk)
+        paid.payment_status = 'PAID'
+        paid.order_status = 'DELIVERED'
+        paid.save()
+        pricing.apply_line_change(paid, new_amount=Decimal('4.00'))
+        old = Order.objects.get(pk=self.orders[2].pk)
+        old.total_amount = Decimal('7.50')
+        old.save()
+        self.orders[1].delete()
+        Order.objects.create(total_amount=Decimal('1.00'))
+
+    def test_incremental_maintenance_matches_rebuild(self):
+        self.change_orders()
+        incremental = rollup_rows()
+        self.assertEqual(rollups.rebuild(), 2)
+        self.assertEqual(incremental, rollup_rows())
+        self.assertEqual(rollups.summarize()['paid_sales'], Decimal('14.00'))
+        self.assertEqual(rollups.summarize()['gross_sales'], Decimal('22.50'))
+
+    def test_days_without_a_row_are_computed_from_their_orders(self):
+        # As on a database whose orders predate the rollup: edits and deletes must not go negative.
+        DailySalesRollup.objects.all().delete()
+        self.change_orders()
+        incremental = rollup_rows()
+        self.assertEqual(len(incremental), 2)
+        rollups.rebuild()
+        self.assertEqual(incremental, rollup_rows())
+
+    def test_rebuild_drops_days_without_orders(self):
+        self.orders[2].delete()
+        DailySalesRollup.objects.create(date=timezone.localdate() - datetime.timedelta(days=30), order_count=1)
+        self.assertEqual(rollups.rebuild(chunk_days=1), 1)
+        self.assertEqual(rollup_rows(), [(timezone.localdate(), 2, Decimal('30.00'), Decimal('0.00'), 0, 2, 0)])
+
+
+class DashboardKpiTests(TestCase):
+    def setUp(self):
+        for sku, quantity in (('LOW-5', 5), ('LOW-9', 9), ('AT-10', 10), ('OK-11', 11)):
+            create_variant(quantity, sku=sku)
+        Order.objects.create(total_amount=Decimal('10.00'), payment_status='PAID', order_status='SHIPPED')
+        Order.objects.create(total_amount=Decimal('20.00'))
+
+    def test_kpis(self):
+        values = kpis.get_dashboard_kpis()
+        self.assertEqual(
+            {key: values[key] for key in ('sales_last_30_days', 'paid_sales_last_30_days', 'new_orders_today',
+                                          'pending_orders', 'shipped_orders', 'low_stock_variants_count',
+                                          'low_stock_products_count', 'total_products_count')},
+            {'sales_last_30_days': Decimal('30.00'), 'paid_sales_last_30_days': Decimal('10.00'),
+             'new_orders_today': 2, 'pending_orders': 1, 'shipped_orders': 1, 'low_stock_variants_count': 3,
+             'low_stock_products_count': 3, 'total_products_count': 4},
+        )
+        self.assertEqual(kpis.get_order_kpis(), kpis.get_order_kpis_from_orders())
+
+    def test_dashboards_keep_their_definitions(self):
+        # /dashboard/: gross sales, variants with fewer than 10 in stock, 0% without previous sales
+        context = dashboard_views.build_dashboard_context()
+        self.assertEqual((context['total_sales_last_30_days'], context['sales_percentage_change'],
+                          context['low_stock_products_count']), (Decimal('30.00'), Decimal('0.00'), 2))
+        # home dashboard: paid sales, active products at LOW_STOCK_THRESHOLD, +100% when growing from zero
+        context = views.build_dashboard_context()
+        self.assertEqual((context['total_sales_last_30_days'], context['sales_percentage_change'],
+                          context['low_stock_products_count']), (Decimal('10.00'), Decimal('100.00'), 3))
+
+
+@override_settings(CUSTOMER_STATS_MIN_ORDERS=2, QUERY_BUDGET_RAISE=True)
+class CustomerStatsTests(TestCase):
+    def setUp(self):
+        self.alice = Customer.objects.create(first_name='Alice', last_name='A', email='alice@example.com')
+        self.bob = Customer.objects.create(first_name='Bob', last_name='B', email='bob@example.com')
+        self.orders = [Order.objects.create(customer=customer, total_amount=Decimal('10.00'))
+                       for customer in (self.alice, self.alice, self.bob, self.bob)]
+
+    def assertStatsMatchHistory(self, customer):
+        row = CustomerStats.objects.get(pk=customer.pk)
+        totals = customer_stats.aggregate(customer)
+        self.assertEqual((row.order_count, row.total_spent, row.last_order_date),
+                         (totals['total_orders'], totals['total_spent'], totals['last_order']))
+
+    def test_summary_follows_order_changes(self):
+        self.assertEqual(customer_stats.for_customer(self.alice)['total_orders'], 2)
+        customer_stats.for_customer(self.bob)
+        order = self.orders[1]
+        order.total_amount = Decimal('25.00')
+        order.save()
+        order.customer = self.bob
+        order.save()
+        pricing.apply_line_change(order, new_amount=Decimal('5.00'))
+        self.orders[3].delete()
+        for customer in (self.alice, self.bob):
+            self.assertStatsMatchHistory(customer)
+        self.assertEqual(customer_stats.for_customer(self.bob)['total_spent'], Decimal('40.00'))
+
+    def test_detail_page(self):
+        response = self.client.get(reverse('customer_detail', args=[self.alice.pk]), {'per_page': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_orders'], 2)
+        self.assertEqual(len(response.context['orders']), 1)
+        self.assertTrue(response.context['page'].has_next)
+        self.assertEqual(response.context['orders'][0].item_count, 0)
+
+
+class PreferenceProfileTests(TestCase):
+    def test_profiles_rank_purchases_and_update_incrementally(self):
+        customer = Customer.objects.create(first_name='Alice', last_name='A', email='alice@example.com')
+        dresses = Category.objects.create(category_name='Dresses')
+        shirt, dress = create_variant(50), create_variant(50, sku='TEST-DRESS-S')
+        Product.objects.filter(pk=dress.product_id).update(category=dresses, gender='W')
+        dress.size = 'S'
+        dress.save()
+        order = Order.objects.create(customer=customer, total_amount=Decimal('0.00'))
+        OrderItem.objects.create(order=order, variant=dress, quantity=3, price_at_purchase=Decimal('10.00'))
+        OrderItem.objects.create(order=order, variant=shirt, quantity=1, price_at_purchase=Decimal('10.00'))
+
+        self.assertEqual(preferences.update(full=True), 1)
+        profile = CustomerPreferenceProfile.objects.get(customer=customer)
+        self.assertEqual(profile.top_categories, ['Dresses'])
+        self.assertEqual(profile.top_sizes, ['S', 'M'])
+        self.assertEqual((profile.gender_segment, profile.items_purchased), ('W', 4))
+        self.assertEqual(profile.summary(), 'Dresses, Size S')
+        self.assertEqual(preferences.update(), 0)
+
+        Order.objects.create(customer=customer, total_amount=Decimal('0.00'))
+        self.assertEqual(preferences.changed_customers(), [customer.pk])
+
+
+@skipUnless(rfm.is_available(), 'NumPy is not installed')
+@override_settings(QUERY_BUDGET_RAISE=True)
+class CustomerValueScoreTests(TestCase):
+    def test_quintiles_share_scores_on_ties(self):
+        self.assertEqual(rfm.quintile_scores(rfm.np.arange(10)).tolist(), [1, 1, 2, 2, 3, 3, 4, 4, 5, 5])
+        self.assertEqual(rfm.quintile_scores(rfm.np.array([1, 1, 1, 1, 9])).tolist(), [2, 2, 2, 2, 5])
+
+    def test_scores_are_written_for_customers_with_orders(self):
+        for i, amount in enumerate(('20.00', '200.00', '2000.00')):
+            customer = Customer.objects.create(first_name='C', last_name=str(i), email=f'c{i}@example.com')
+            for _ in range(i + 1):
+                Order.objects.create(customer=customer, total_amount=Decimal(amount))
+        Customer.objects.create(first_name='No', last_name='Orders', email='none@example.com')
+
+        now = timezone.now() + datetime.timedelta(days=10)
+        self.assertEqual(rfm.score_customers(chunk_size=2, now=now), 3)
+        best = CustomerValueScore.objects.get(customer__email='c2@example.com')
+        self.assertEqual((best.frequency, best.monetary, best.recency_days), (3, Decimal('6000.00'), 10))
+        self.assertEqual((best.frequency_score, best.monetary_score, best.segment), (5, 5, 'CHAMPION'))
+        self.assertTrue(best.is_premium)
+        self.assertGreater(best.lifetime_value, best.monetary)
+
+    def test_premium_badge_falls_back_to_spend_until_scored(self):
+        customer = Customer.objects.create(first_name='Big', last_name='Spender', email='big@example.com')
+        Order.objects.create(customer=customer, total_amount=Decimal('1500.00'))
+        url = reverse('customer_detail', args=[customer.pk])
+        self.assertTrue(self.client.get(url).context['is_premium_customer'])
+
+        CustomerValueScore.objects.create(customer=customer, recency_days=400, frequency=1,
+                                          monetary=Decimal('1500.00'), recency_score=1, frequency_score=1,
+                                          monetary_score=3, segment='HIBERNATING', lifetime_value=Decimal('0.00'),
+                                          scored_at=timezone.now())
+        self.assertFalse(self.client.get(url).context['is_premium_customer'])
+
+
+def image_upload(name, size, fmt='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (180, 40, 40)).save(buffer, fmt)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class TempMediaMixin:
+    """
+    Points MEDIA_ROOT (self.media_root), and any other directory setting listed in
+    `temp_dir_settings`, at a fresh temporary directory for each test.
+    """
+    temp_dir_settings = ('MEDIA_ROOT',)
+
+    def setUp(self):
+        super().setUp()
+        dirs = {setting: tempfile.mkdtemp() for setting in self.temp_dir_settings}
+        for path in dirs.values():
+            self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        overrides = override_settings(**dirs)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.media_root = dirs['MEDIA_ROOT']
+
+
+@override_settings(IMAGE_DERIVATIVES_BACKGROUND=False)
+class ProductImageDerivativeTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(product_name='Test Shirt', gender='U', price=Decimal('10.00'))
+
+    def test_derivatives_are_generated_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProductImage.objects.create(product=self.product, image=image_upload('shirt.jpg', (2000, 1000)))
+            self.assertEqual(image.thumbnail_url, image.image_url)  # pending: the original
+
+        image.refresh_from_db()
+        self.assertEqual(image.derivatives_status, 'READY')
+        thumbnail = derivative_name(image.image.name, 'thumb', 'webp')
+        self.assertTrue(image.thumbnail_webp_url.endswith(thumbnail))
+        with image.image.storage.open(derivative_name(image.image.name, 'thumb', 'jpg')) as f:
+            self.assertEqual(Image.open(f).size, (320, 320))
+        with image.image.storage.open(derivative_name(image.image.name, 'large', 'webp')) as f:
+            self.assertEqual(Image.open(f).size, (1200, 600))
+
+    def test_derivatives_of_a_legacy_original_sit_next_to_it(self):
+        os.makedirs(os.path.join(self.media_root, 'products'))
+        with open(os.path.join(self.media_root, 'products', 'shirt.jpg'), 'wb') as f:
+            f.write(image_upload('shirt.jpg', (800, 400)).read())
+        image = ProductImage.objects.create(product=self.product, image='products/shirt.jpg')  # saved before the blobs
+
+        self.assertEqual(image_derivatives.build(image.pk), 'READY')
+        for size in IMAGE_DERIVATIVE_SIZES:
+            for fmt in IMAGE_DERIVATIVE_FORMATS:
+                self.assertTrue(default_storage.exists(f'products/shirt.{size}.{fmt}'))
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'blobs')))
+
+    def test_unreadable_upload_is_marked_failed(self):
+        with self.assertLogs('my_app.image_derivatives', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+            image = ProductImage.objects.create(
+                product=self.product, image=SimpleUploadedFile('broken.jpg', b'not an image')
+            )
+        image.refresh_from_db()
+        self.assertEqual(image.derivatives_status, 'FAILED')
+        self.assertEqual(image.thumbnail_url, image.image_url)
+
+
+class ContentAddressedStorageTests(TempMediaMixin, TestCase):
+    def ref_count(self, name):
+        return MediaBlob.objects.values_list('ref_count', flat=True).get(pk=name)
+
+    def test_identical_uploads_share_one_counted_blob(self):
+        member = Member.objects.create(first_name='Ada', last_name='L', email='ada@example.com',
+                                       profile_picture=image_upload('download.png', (40, 40), 'PNG'))
+        customer = Customer.objects.create(first_name='Ada', last_name='L', email='ada@example.com',
+                                           profile_picture=image_upload('download_eUSB8g1.png', (40, 40), 'PNG'))
+        name = member.profile_picture.name
+        self.assertEqual(customer.profile_picture.name, name)
+        self.assertTrue(name.startswith('blobs/') and name.endswith('.png'))
+        self.assertEqual(self.ref_count(name), 2)
+
+        member.profile_picture = None
+        member.save()
+        Customer.objects.only('pk').get(pk=customer.pk).delete()  # deferred field: read back before release
+        self.assertEqual(self.ref_count(name), 0)
+
+        self.assertEqual(media_blobs.purge_unreferenced(), (0, 0))  # within the grace period
+        deleted, reclaimed = media_blobs.purge_unreferenced(grace=-1)
+        self.assertEqual(deleted, 1)
+        self.assertGreater(reclaimed, 0)
+        self.assertFalse(member.profile_picture.storage.exists(name))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_upload_racing_a_purge_keeps_its_bytes(self):
+        name = default_storage.save('first.png', ContentFile(b'same bytes'))
+        register = media_blobs.register
+
+        def purge_then_register(*args):  # the purge wins the row lock just before the upload registers
+            media_blobs.purge_unreferenced(grace=-1)
+            register(*args)
+
+        with patch('my_app.media_blobs.register', side_effect=purge_then_register):
+            self.assertEqual(default_storage.save('again.png', ContentFile(b'same bytes')), name)
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(pk=name).ref_count, 0)
+        self.assertEqual(media_blobs.purge_unreferenced(), (0, 0))  # just uploaded: within the grace period
+
+
+@override_settings(IMAGE_DERIVATIVES_BACKGROUND=False)
+class OrphanedMediaTests(TempMediaMixin, TestCase):
+    def test_only_unreferenced_files_are_removed(self):
+        product = Product.objects.create(product_name='Test Shirt', gender='U', price=Decimal('10.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            kept = ProductImage.objects.create(product=product, image=image_upload('kept.jpg', (400, 400)))
+            dropped = ProductImage.objects.create(product=product, image=image_upload('old.png', (400, 400), 'PNG'))
+        dropped.delete()  # its blob and thumbnails stay on disk
+        legacy = os.path.join(self.media_root, 'member_profiles', 'gone.jpg')
+        os.makedirs(os.path.dirname(legacy))
+        with open(legacy, 'wb') as f:
+            f.write(b'x' * 10)
+        storage = kept.image.storage
+        before = {name for name, _size, _mtime in media_gc.scan(self.media_root)}
+
+        files, reclaimed = media_gc.collect(dry_run=True, grace=-60)
+        self.assertEqual(files, 6)  # legacy file, dropped blob and its 4 thumbnails
+        self.assertEqual({name for name, _size, _mtime in media_gc.scan(self.media_root)}, before)
+
+        self.assertEqual(media_gc.collect(grace=-60, batch_size=2), (files, reclaimed))
+        remaining = {name for name, _size, _mtime in media_gc.scan(self.media_root)}
+        self.assertEqual(remaining, {kept.image.name} | {
+            derivative_name(kept.image.name, size, fmt) for size in ('thumb', 'large') for fmt in ('jpg', 'webp')
+        })
+        self.assertTrue(storage.exists(kept.image.name))
+        self.assertEqual(list(MediaBlob.objects.values_list('pk', flat=True)), [kept.image.name])
+        self.assertEqual(media_gc.collect(grace=-60), (0, 0))
+
+    def test_files_referenced_during_the_walk_are_kept(self):
+        product = Product.objects.create(product_name='Test Shirt', gender='U', price=Decimal('10.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProductImage.objects.create(product=product, image=image_upload('new.jpg', (400, 400)))
+        MediaBlob.objects.update(ref_count=0)  # a drifted count: the image field still protects it
+        before = {name for name, _size, _mtime in media_gc.scan(self.media_root)}
+        self.assertEqual(len(before), 5)
+
+        # As if the referenced set had been read before the row was saved.
+        with patch('my_app.media_gc.referenced_paths', return_value=set()):
+            self.assertEqual(media_gc.collect(dry_run=True, grace=-60), (0, 0))
+            self.assertEqual(media_gc.collect(grace=-60, batch_size=2), (0, 0))
+        self.assertEqual({name for name, _size, _mtime in media_gc.scan(self.media_root)}, before)
+
+        ProductImage.objects.filter(pk=image.pk).delete()  # no signals: the blob keeps a reference count
+        MediaBlob.objects.update(ref_count=1)
+        self.assertEqual(media_gc.collect(grace=-60)[0], 0)
+        MediaBlob.objects.update(ref_count=0)
+        self.assertEqual(media_gc.collect(grace=-60)[0], 5)
+
+
+class MediaServingTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        member = Member.objects.create(first_name='Ada', last_name='L', email='ada@example.com',
+                                       profile_picture=image_upload('ada.jpg', (64, 64)))
+        self.url = member.profile_picture.url
+        with member.profile_picture.open('rb') as f:
+            self.content = f.read()
+
+    def test_full_partial_and_conditional_responses(self):
+        response = self.client.get(self.url)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])  # a content-addressed blob
+
+        partial = self.client.get(self.url, HTTP_RANGE='bytes=2-9')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(b''.join(partial.streaming_content), self.content[2:10])
+        self.assertEqual(partial['Content-Range'], f'bytes 2-9/{len(self.content)}')
+        stale = self.client.get(self.url, HTTP_RANGE='bytes=2-9', HTTP_IF_RANGE='"other"')
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-').status_code, 416)
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+
+    @override_settings(MEDIA_SERVE_MODE='x-accel-redirect', MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_offloads_to_front_end_server(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.url[len('/media/'):])
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+
+class AvatarTests(TempMediaMixin, TestCase):
+    temp_dir_settings = ('MEDIA_ROOT', 'AVATAR_CACHE_DIR')
+
+    def test_resized_on_first_request_then_served_from_disk(self):
+        customer = Customer.objects.create(first_name='Ada', last_name='L', email='ada@example.com',
+                                           profile_picture=image_upload('ada.jpg', (900, 600)))
+        url = customer.profile_picture_url
+
+        response = self.client.get(url, HTTP_ACCEPT='image/webp,*/*')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(Image.open(BytesIO(b''.join(response.streaming_content))).size, (256, 256))
+
+        with patch('my_app.avatars.render', side_effect=AssertionError('rendered again')):
+            response = self.client.get(url, HTTP_ACCEPT='image/webp,*/*', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+            response = self.client.get(url, HTTP_ACCEPT='image/webp,*/*')
+            self.assertEqual(response.status_code, 200)  # from the disk cache
+
+        response = self.client.get(customer.avatar_url(100))  # no WebP in Accept, snapped to 128
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(Image.open(BytesIO(b''.join(response.streaming_content))).size, (128, 128))
+
+    def test_version_follows_the_content(self):
+        customer = Customer.objects.create(first_name='Ada', last_name='L', email='ada@example.com',
+                                           profile_picture=image_upload('ada.jpg', (300, 300)))
+        self.assertIn('?v=' + blob_digest(customer.profile_picture.name)[:12], customer.profile_picture_url)
+
+        # A file from before the blob storage, overwritten in place under the same name.
+        path = os.path.join(settings.MEDIA_ROOT, 'customer_profiles', 'ada.jpg')
+        os.makedirs(os.path.dirname(path))
+        Image.new('RGB', (300, 300), 'red').save(path, 'JPEG')
+        Customer.objects.filter(pk=customer.pk).update(profile_picture='customer_profiles/ada.jpg')
+        customer.refresh_from_db()
+        old_url = customer.profile_picture_url
+        Image.new('RGB', (300, 300), 'blue').save(path, 'JPEG')
+        os.utime(path, (time.time() + 5, time.time() + 5))
+        new_url = customer.profile_picture_url
+        self.assertNotEqual(old_url, new_url)
+        self.assertIn('immutable', self.client.get(new_url)['Cache-Control'])
+        self.assertNotIn('immutable', self.client.get(old_url)['Cache-Control'])
+
+    def test_without_picture_redirects_to_default(self):
+        member = Member.objects.create(first_name='Ada', last_name='L', email='ada@example.com')
+        response = self.client.get(reverse('avatar', args=['member', member.pk, 256]))
+        self.assertRedirects(response, member.profile_picture_url, fetch_redirect_response=False)
+
+
+class FakeShopTests(TestCase):
+    def test_generation_is_deterministic_and_consistent(self):
+        options = dict(products=30, customers=40, orders=150, days=90, seed=7, end_date=datetime.date(2026, 1, 31))
+        counts = fake_shop.generate(**options)
+        self.assertEqual(counts['Order'], 150)
+        self.assertEqual(Product.objects.count(), 30)
+        self.assertFalse(Order.objects.filter(order_date__lt=F('customer__registration_date')).exists())
+        self.assertEqual(DailySalesRollup.objects.aggregate(total=Sum('order_count'))['total'], 150)
+        order = Order.objects.filter(applied_promotions__isnull=True).order_by('pk').first()
+        self.assertEqual(order.total_amount, pricing.items_subtotal(order))
+        first_run = list(OrderItem.objects.order_by('pk').values_list('order_id', 'variant__sku', 'quantity'))
+
+        fake_shop.flush()
+        fake_shop.generate(**options)
+        self.assertEqual(list(OrderItem.objects.order_by('pk').values_list('order_id', 'variant__sku', 'quantity')),
+                         first_run)
+
+
+class BenchmarkReportTests(TestCase):
+    def report(self, p95_ms, queries):
+        route = {'p95_ms': p95_ms, 'queries': {'max': queries}, 'statuses': {'200': 10}}
+        return {'scales': {'tiny': {'routes': {'dashboard': route}}}}
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmarks.percentile(values, 50), 50)
+        self.assertEqual(benchmarks.percentile(values, 99), 99)
+        self.assertEqual(benchmarks.percentile([7], 95), 7)
+
+    def test_budgets_and_comparison(self):
+        budgets = {'dashboard': {'p95_ms': 100, 'max_queries': 5}}
+        self.assertEqual(benchmarks.check_budgets(self.report(90, 5), budgets), [])
+        self.assertEqual(len(benchmarks.check_budgets(self.report(120, 6), budgets)), 2)
+        self.assertEqual(benchmarks.compare(self.report(100, 5), self.report(105, 5)), [])
+        self.assertEqual(len(benchmarks.compare(self.report(100, 5), self.report(150, 7))), 2)
+
+
+class ConcurrentReservationStressTest(TransactionTestCase):
+    """
+    Many threads race to take single units of one variant. Every successful
+    reservation must be backed by stock: no oversell, no lost updates.
+    """
+    THREADS = 16
+    ATTEMPTS_PER_THREAD = 25
+    INITIAL_STOCK = 100
+
+    def test_no_oversell_under_contention(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('threads need a shared database (PostgreSQL or a file-based SQLite test database)')
+        variant = create_variant(self.INITIAL_STOCK)
+        successes = []
+        failures = []
+        start_barrier = threading.Barrier(self.THREADS)
+
+        def worker():
+            reserved = rejected = 0
+            try:
+                start_barrier.wait()
+                for _ in range(self.ATTEMPTS_PER_THREAD):
+                    while True:
+                        try:
+                            with transaction.atomic():
+                                inventory.reserve(variant.pk, 1)
+                            reserved += 1
+                            break
+                        except inventory.InsufficientStock:
+                            rejected += 1
+                            break
+                        except OperationalError:  # lock timeout/deadlock: the attempt is retried
+                            continue
+            finally:
+                successes.append(reserved)
+                failures.append(rejected)
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        attempts = self.THREADS * self.ATTEMPTS_PER_THREAD
+        print(
+            f'\nStock reservation stress: {attempts} attempts by {self.THREADS} threads in {elapsed:.3f}s '
+            f'({attempts / elapsed:.0f} reservations/s), {sum(successes)} reserved, {sum(failures)} rejected'
+        )
+        self.assertEqual(sum(successes), self.INITIAL_STOCK)
+        self.assertEqual(stock_of(variant), 0)
@@ -0,0 +1,153 @@
+"""
+Bulk creation of product variants as a matrix of products x colors x sizes.
+
+Creating a season's range (e.g. 5 colors x 8 sizes for dozens of products)
+used to cost one `sku=...).exists()` query, one full_clean() and one INSERT per
+variant. create_variant_matrix() instead:
+  1. generates every cell and its SKU in Python,
+  2. finds all clashing rows in ONE query (`sku__in` plus the
+     (product, color, size) unique_together),
+  3. inserts the remaining cells with `bulk_create` in one transaction,
+and reports every cell it could not create with the reason.
+
+bulk_create bypasses model signals, so the dashboard cache is invalidated
+explicitly. SKUs are not part of the product search documents (they are
+matched on ProductVariant directly), so no reindexing is needed.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from my_app import dashboard_cache
+from my_app.models import Product, ProductVariant
+
+# Options offered by the inventory forms.
+SIZE_OPTIONS = ['S', 'M', 'L', 'XL', 'XXL']
+COLOR_OPTIONS = ['Red', 'Blue', 'Green', 'Black', 'White', 'Gray']
+
+# Reasons reported for cells that were not created.
+CONFLICT_SKU_EXISTS = 'sku_exists'
+CONFLICT_VARIANT_EXISTS = 'variant_exists'
+CONFLICT_DUPLICATE = 'duplicate_in_request'
+
+CONFLICT_MESSAGES = {
+    CONFLICT_SKU_EXISTS: 'SKU already exists',
+    CONFLICT_VARIANT_EXISTS: 'this product already has this color/size',
+    CONFLICT_DUPLICATE: 'generates the same SKU as another cell',
+}
+
+BULK_BATCH_SIZE = 500
+
+
+def generate_sku(product_id, color, size):
+    """PROD<zero-padded product id>-<color>-<size>, keeping only alphanumerics."""
+    sanitized_color = ''.join(filter(str.isalnum, color))
+    sanitized_size = ''.join(filter(str.isalnum, size))
+    return f"PROD{str(product_id).zfill(3)}-{sanitized_color}-{sanitized_size}"
+
+
+class MatrixResult:
+    """Outcome of create_variant_matrix(): created variants and per-cell conflicts."""
+
+    def __init__(self, created, conflicts):
+        self.created = created
+        # [{'product_id', 'color', 'size', 'sku', 'reason'}], in matrix order
+        self.conflicts = conflicts
+
+    def conflict_messages(self):
+        return [
+            f"{conflict['sku']} ({conflict['color']} / {conflict['size']}): {CONFLICT_MESSAGES[conflict['reason']]}"
+            for conflict in self.conflicts
+        ]
+
+    def as_dict(self):
+        return {
+            'created': [
+                {'variant_id': v.pk, 'product_id': v.product_id, 'color': v.color, 'size': v.size,
+                 'sku': v.sku, 'quantity_in_stock': v.quantity_in_stock}
+                for v in self.created
+            ],
+            'conflicts': self.conflicts,
+        }
+
+
+def _plan(product_ids, colors, sizes):
+    """All cells of the matrix with their generated SKU, in product/color/size order."""
+    return [
+        {'product_id': product_id, 'color': color, 'size': size, 'sku': generate_sku(product_id, color, size)}
+        for product_id in product_ids
+        for color in colors
+        for size in sizes
+    ]
+
+
+def _find_conflicts(cells):
+    """Returns {cell index: reason} using a single query for the whole matrix."""
+    conflicts = {}
+    seen_skus = set()
+    for index, cell in enumerate(cells):
+        if cell['sku'] in seen_skus:
+            conflicts[index] = CONFLICT_DUPLICATE
+        seen_skus.add(cell['sku'])
+
+    existing = ProductVariant.objects.filter(
+        Q(sku__in=seen_skus) |
+        Q(product_id__in={c['product_id'] for c in cells},
+          color__in={c['color'] for c in cells},
+          size__in={c['size'] for c in cells})
+    ).values_list('sku', 'product_id', 'color', 'size')
+    existing_skus = set()
+    existing_cells = set()
+    for sku, product_id, color, size in existing:
+        existing_skus.add(sku)
+        existing_cells.add((product_id, color, size))
+
+    for index, cell in enumerate(cells):
+        if index in conflicts:
+            continue
+        if cell['sku'] in existing_skus:
+            conflicts[index] = CONFLICT_SKU_EXISTS
+        elif (cell['product_id'], cell['color'], cell['size']) in existing_cells:
+            conflicts[index] = CONFLICT_VARIANT_EXISTS
+    return conflicts
+
+
+def create_variant_matrix(product_ids, colors, sizes, quantity_in_stock=0, dry_run=False):
+    """
+    Creates one variant per (product, color, size) that doesn't clash with an
+    existing variant. Returns a MatrixResult; with `dry_run` nothing is written
+    and `created` holds the unsaved variants that would be created.
+    """
+    product_ids = list(dict.fromkeys(int(pk) for pk in product_ids))
+    colors = list(dict.fromkeys(colors))
+    sizes = list(dict.fromkeys(sizes))
+    cells = _plan(product_ids, colors, sizes)
+
+    # A concurrent request may insert one of our SKUs between the check and the
+    # insert; re-check once and insert whatever is still free.
+    for attempt in range(2):
+        conflicts = _find_conflicts(cells)
+        variants = [
+            ProductVariant(product_id=cell['product_id'], color=cell['color'], size=cell['size'],
+                           sku=cell['sku'], quantity_in_stock=quantity_in_stock)
+            for index, cell in enumerate(cells) if index not in conflicts
+        ]
+        if dry_run or not variants:
+            break
+        try:
+            with transaction.atomic():
+                variants = ProductVariant.objects.bulk_create(variants, batch_size=BULK_BATCH_SIZE)
+            transaction.on_commit(dashboard_cache.invalidate)
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+
+    return MatrixResult(
+        created=variants,
+        conflicts=[dict(cells[index], reason=reason) for index, reason in sorted(conflicts.items())],
+    )
+
+
+def existing_product_ids(product_ids):
+    """The subset of `product_ids` that exist (one query)."""
+    return set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
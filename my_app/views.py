@@ -9,16 +9,16 @@ from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ValidationError
 
 # --- Existing imports for dashboard and other views ---
-from django.db.models import Sum, Q, F, Count
-from django.utils import timezone
-from datetime import timedelta
-from decimal import Decimal, InvalidOperation
+from django.db.models import Q, F, Count
+from decimal import InvalidOperation
 
 # Ensure these models are correctly defined in your my_app/models.py
 from my_app.models import (
-    Product, ProductVariant, Order, OrderItem, Customer, Category, Brand, Promotion, Review,
+    ProductVariant, Order, OrderItem, Customer, Brand, Promotion, Review,
     GENDER_CHOICES, DISCOUNT_TYPE_CHOICES, ORDER_STATUS_CHOICES, PAYMENT_STATUS_CHOICES
 )
+from my_app import dashboard_cache
+from my_app.kpis import get_dashboard_kpis
 
 
 # --- End Existing imports ---
@@ -30,54 +30,13 @@ def home(request):
     return render(request, "index.html")
 
 
-# Dashboard view
-@login_required
-def dashboard(request):
+def build_dashboard_context():
     """
-    Renders the admin dashboard with various key performance indicators (KPIs).
-    Calculates sales summaries, order statistics, stock alerts, and total counts.
+    Builds the shared (not per-user) part of the dashboard context: sales
+    summaries, order statistics, stock alerts, total counts and recent activity.
     """
-    if not request.user.is_authenticated:
-        messages.error(request, "Please log in to access the dashboard.")
-        return redirect('login')
-
-    today = timezone.localdate()
-    now = timezone.now()
-
-    end_date_30_days = now
-    start_date_30_days = now - timedelta(days=30)
-
-    total_sales_last_30_days = Order.objects.filter(
-        order_date__range=(start_date_30_days, end_date_30_days),
-        payment_status='PAID'
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-
-    start_date_prev_30_days = start_date_30_days - timedelta(days=30)
-    total_sales_prev_30_days = Order.objects.filter(
-        order_date__range=(start_date_prev_30_days, start_date_30_days),
-        payment_status='PAID'
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-
-    sales_percentage_change = Decimal('0.00')
-    if total_sales_prev_30_days > 0:
-        sales_percentage_change = ((
-                                               total_sales_last_30_days - total_sales_prev_30_days) / total_sales_prev_30_days) * 100
-    elif total_sales_last_30_days > 0:
-        sales_percentage_change = Decimal('100.00')
-
-    new_orders_today = Order.objects.filter(order_date__date=today).count()
-    pending_orders = Order.objects.filter(order_status='PENDING').count()
-    shipped_orders = Order.objects.filter(order_status='SHIPPED').count()
-
-    LOW_STOCK_THRESHOLD = 10
-
-    low_stock_products_count = Product.objects.filter(
-        variants__quantity_in_stock__lte=LOW_STOCK_THRESHOLD,
-        is_active=True
-    ).distinct().count()
-
-    total_products_count = Product.objects.count()
-    total_categories_count = Category.objects.count()
+    # One conditional-aggregation query for all order metrics (see my_app/kpis.py)
+    kpis = get_dashboard_kpis()
 
     recent_orders = Order.objects.all().order_by('-order_date')[:5]
     recent_reviews = Review.objects.all().order_by('-review_date')[:5]
@@ -96,18 +55,33 @@ def dashboard(request):
     recent_activities.sort(key=lambda x: x['date'], reverse=True)
     recent_activities = recent_activities[:5]
 
-    context = {
-        'total_sales_last_30_days': total_sales_last_30_days,
-        'sales_percentage_change': sales_percentage_change,
-        'new_orders_today': new_orders_today,
-        'pending_orders': pending_orders,
-        'shipped_orders': shipped_orders,
-        'low_stock_products_count': low_stock_products_count,
-        'total_products_count': total_products_count,
-        'total_categories_count': total_categories_count,
+    return {
+        'total_sales_last_30_days': kpis['paid_sales_last_30_days'],
+        'sales_percentage_change': kpis['paid_sales_percentage_change'],
+        'new_orders_today': kpis['new_orders_today'],
+        'pending_orders': kpis['pending_orders'],
+        'shipped_orders': kpis['shipped_orders'],
+        'low_stock_products_count': kpis['low_stock_products_count'],
+        'total_products_count': kpis['total_products_count'],
+        'total_categories_count': kpis['total_categories_count'],
         'recent_activities': recent_activities,
     }
 
+
+# Dashboard view
+@login_required
+def dashboard(request):
+    """
+    Renders the admin dashboard with various key performance indicators (KPIs).
+    Calculates sales summaries, order statistics, stock alerts, and total counts.
+    The shared part of the context is cached (see my_app/dashboard_cache.py).
+    """
+    if not request.user.is_authenticated:
+        messages.error(request, "Please log in to access the dashboard.")
+        return redirect('login')
+
+    context = dict(dashboard_cache.get_context('paid_dashboard', build_dashboard_context))
+
     # Retrieve SweetAlert flags from session and remove them ONLY here
     login_success = request.session.pop('login_success', False)
     logged_in_username = request.session.pop('logged_in_username', '')